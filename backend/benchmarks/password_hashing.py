@@ -0,0 +1,80 @@
+"""
+Login latency per bcrypt cost, and the highest cost that keeps p95 under a target.
+
+    python -m benchmarks.password_hashing [--target-p95-ms 250] [--min-rounds 10] [--max-rounds 14]
+                                          [--workers N] [--concurrency N] [--samples 40]
+
+Each cost runs `samples` verifies through a process pool of `workers` processes (the same shape
+as core.password_hashing), `concurrency` at a time. Latency is measured from submit to result,
+so with concurrency above workers it includes the time spent queued, like a burst of logins.
+Run it on the production hardware and set PASSWORD_BCRYPT_ROUNDS to the recommendation; existing
+hashes move to the new cost as their users log in.
+"""
+import argparse
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from core.config import settings
+from core.password_hashing import check_password, hash_password
+
+
+def _percentile(latencies: List[float], p: int) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def measure(pool: ProcessPoolExecutor, rounds: int, concurrency: int, samples: int) -> Dict[str, float]:
+    hashed = hash_password("correct horse battery staple", rounds)
+    latencies: List[float] = []
+    remaining = samples
+    while remaining > 0:
+        batch = min(concurrency, remaining)
+        started = time.perf_counter()
+        futures = [pool.submit(check_password, "correct horse battery staple", hashed) for _ in range(batch)]
+        for future in futures:
+            future.add_done_callback(lambda _, s=started: latencies.append((time.perf_counter() - s) * 1000))
+        wait(futures)
+        remaining -= batch
+    return {
+        "p50": _percentile(latencies, 50),
+        "p95": _percentile(latencies, 95),
+        "max": max(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-p95-ms", type=float, default=250.0)
+    parser.add_argument("--min-rounds", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    parser.add_argument("--workers", type=int, default=max(1, settings.PASSWORD_HASH_WORKERS))
+    parser.add_argument("--concurrency", type=int, default=None, help="defaults to --workers")
+    parser.add_argument("--samples", type=int, default=40)
+    args = parser.parse_args()
+    concurrency = args.concurrency or args.workers
+
+    print(f"workers={args.workers} concurrency={concurrency} samples={args.samples}")
+    print(f"{'rounds':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    best: Optional[int] = None
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Start the workers and import bcrypt in them so the first cost doesn't pay for it
+        wait([pool.submit(hash_password, "warm-up", 4) for _ in range(args.workers)])
+        for rounds in range(args.min_rounds, args.max_rounds + 1):
+            result = measure(pool, rounds, concurrency, args.samples)
+            print(f"{rounds:>6} {result['p50']:>9.1f} {result['p95']:>9.1f} {result['max']:>9.1f}")
+            if result["p95"] > args.target_p95_ms:
+                # Each extra round doubles the cost; higher ones can only be slower
+                break
+            best = rounds
+
+    if best is None:
+        print(f"\nNo cost from {args.min_rounds} meets p95 <= {args.target_p95_ms:g} ms; add workers or lower --min-rounds")
+    else:
+        print(f"\nPASSWORD_BCRYPT_ROUNDS={best}  (highest cost with p95 <= {args.target_p95_ms:g} ms; now {settings.PASSWORD_BCRYPT_ROUNDS})")
+
+
+if __name__ == "__main__":
+    main()
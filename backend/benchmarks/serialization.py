@@ -0,0 +1,139 @@
+"""
+Per-endpoint response serialization cost: FastAPI's default path vs core.serialization.
+
+    python -m benchmarks.serialization [--repeat 200]
+
+"default" reproduces what FastAPI does for a response_model route: validate the returned object
+against the model, convert it to JSON-compatible Python, then json.dumps it. "fast" is what
+fast_response() does: a single orjson pass over the object the endpoint already built.
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from pydantic import TypeAdapter
+
+from core.serialization import dumps
+from schemas.save_game import ContinueGameResponse, SaveGameResponse, UserProgressResponse
+from schemas.story import CompleteStoryNodeResponse, CompleteStoryResponse, StoryNodeWindowResponse
+
+
+def _node(node_id: int, depth: int, max_depth: int) -> CompleteStoryNodeResponse:
+    is_ending = depth == max_depth
+    children = [] if is_ending else [
+        {"text": f"Option {i} from node {node_id}", "node_id": node_id * 2 + i} for i in (0, 1)
+    ]
+    return CompleteStoryNodeResponse(
+        id=node_id,
+        content=f"Scene {node_id}: " + "The corridor stretches into darkness. " * 8,
+        image_prompt_1="/static/user_1/story_1/node_1_1_abcdef12.png",
+        image_prompt_2="/static/user_1/story_1/node_1_2_abcdef12.png",
+        is_ending=is_ending,
+        is_winning_ending=is_ending and node_id % 3 == 0,
+        options=children,
+    )
+
+
+def _tree(max_depth: int = 5) -> Dict[int, CompleteStoryNodeResponse]:
+    nodes = {}
+    frontier = [(1, 0)]
+    while frontier:
+        node_id, depth = frontier.pop()
+        nodes[node_id] = _node(node_id, depth, max_depth)
+        if depth < max_depth:
+            frontier.extend((node_id * 2 + i, depth + 1) for i in (0, 1))
+    return nodes
+
+
+def _save(save_id: int) -> SaveGameResponse:
+    now = datetime.utcnow()
+    return SaveGameResponse(
+        id=save_id,
+        user_id=1,
+        story_id=save_id % 7,
+        save_name=f"Save {save_id}",
+        current_node_id=17,
+        choices_made=[
+            {"node_id": i, "option_text": f"Option {i}", "next_node_id": i + 1, "timestamp": now.isoformat()}
+            for i in range(30)
+        ],
+        nodes_visited=list(range(30)),
+        play_time_minutes=42,
+        is_auto_save=save_id % 2 == 0,
+        created_at=now,
+        updated_at=now,
+        story_title="The Sunken Citadel",
+        current_node_content="The corridor stretches into darkness...",
+    )
+
+
+def build_cases() -> List[Dict[str, Any]]:
+    nodes = _tree()
+    now = datetime.utcnow()
+    story = CompleteStoryResponse(
+        id=1, title="The Sunken Citadel", session_id="s", created_at=now, root_node=nodes[1], all_nodes=nodes
+    )
+    continue_game = {
+        "save_game": _save(1),
+        "story": {
+            "id": 1, "title": story.title, "session_id": "s", "created_at": now,
+            "root_node": nodes[1].model_dump(), "all_nodes": {k: v.model_dump() for k, v in nodes.items()},
+        },
+        "current_node": nodes[17].model_dump(),
+    }
+    progress = [
+        UserProgressResponse(
+            id=i, user_id=1, story_id=i, total_nodes_visited=12, endings_reached=[3, 9],
+            completion_percentage=40, first_played_at=now, last_played_at=now, story_title="The Sunken Citadel",
+        )
+        for i in range(50)
+    ]
+    window = StoryNodeWindowResponse(
+        story_id=1, node_id=1, depth=2, nodes={k: nodes[k] for k in range(1, 8)}, frontier=[4, 5, 6, 7]
+    )
+    return [
+        {"endpoint": "GET /saves/ (50 saves)", "model": List[SaveGameResponse], "content": [_save(i) for i in range(50)]},
+        {"endpoint": "GET /saves/{id}", "model": SaveGameResponse, "content": _save(1)},
+        {"endpoint": "POST /saves/{id}/load", "model": ContinueGameResponse, "content": continue_game},
+        {"endpoint": "GET /saves/progress/stories", "model": List[UserProgressResponse], "content": progress},
+        {"endpoint": "GET /stories/{id}/complete", "model": CompleteStoryResponse, "content": story},
+        {"endpoint": "GET /stories/{id}/nodes/{node}", "model": StoryNodeWindowResponse, "content": window},
+    ]
+
+
+def default_path(model: Any) -> Callable[[Any], bytes]:
+    adapter = TypeAdapter(model)
+
+    def run(content: Any) -> bytes:
+        validated = adapter.validate_python(content, from_attributes=True)
+        data = adapter.dump_python(validated, mode="json")
+        return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+    return run
+
+
+def _time(fn: Callable[[Any], bytes], content: Any, repeat: int) -> float:
+    fn(content)  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(content)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'endpoint':34} {'bytes':>8} {'default us':>11} {'fast us':>9} {'speedup':>8}")
+    for case in build_cases():
+        default_us = _time(default_path(case["model"]), case["content"], args.repeat)
+        fast_us = _time(dumps, case["content"], args.repeat)
+        size = len(dumps(case["content"]))
+        print(f"{case['endpoint']:34} {size:>8} {default_us:>11.1f} {fast_us:>9.1f} {default_us / fast_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
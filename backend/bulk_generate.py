@@ -0,0 +1,210 @@
+"""
+Offline bulk story generation for seeding content.
+
+    python -m bulk_generate themes.txt --count 200 --concurrency 4 --batch-size 10
+
+themes.txt holds one theme per line (blank lines and lines starting with # are ignored); themes are
+used round-robin until --count stories exist. LLM calls run in parallel threads, stories are written
+to the database in batches, and progress is checkpointed after every committed batch so an
+interrupted run picks up where it stopped when started again with the same arguments.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from logging.config import dictConfig
+from typing import Dict, List, Tuple
+
+from core.story_cache import precompute_story_tree
+from core.story_generator import StoryGenerator
+from db.database import SessionLocal, create_tables
+# Import all models to ensure they're registered with SQLAlchemy
+from models.user import User
+from models.story import Story, StoryNode
+from models.job import StoryJob
+from models.save_game import SaveGame, UserStoryProgress
+
+dictConfig({
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"default": {"format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"}},
+    "handlers": {"console": {"class": "logging.StreamHandler", "formatter": "default", "level": "DEBUG"}},
+    "loggers": {"app": {"handlers": ["console"], "level": "WARNING", "propagate": False}},
+    "root": {"handlers": ["console"], "level": "INFO"},
+})
+
+logger = logging.getLogger("bulk_generate")
+
+
+def load_themes(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        themes = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    if not themes:
+        raise SystemExit(f"No themes found in {path}")
+    return themes
+
+
+def load_checkpoint(path: str, themes_file: str, count: int) -> Dict:
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("themes_file") != themes_file or checkpoint.get("count") != count:
+            raise SystemExit(f"Checkpoint {path} belongs to a different run; delete it or pass another --checkpoint")
+        return checkpoint
+    return {
+        "run_id": uuid.uuid4().hex[:12],
+        "themes_file": themes_file,
+        "count": count,
+        "done": {},  # slot index -> story id
+    }
+
+
+def save_checkpoint(path: str, checkpoint: Dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _build(theme: str, story_key: str, images: bool) -> Tuple[object, float]:
+    """
+    Everything that waits on the network (the LLM and the root images) happens here, in the
+    parallel phase, so the batch write is database work only.
+    """
+    started = time.perf_counter()
+    structure = StoryGenerator.build_story_structure(theme)
+    if images:
+        structure = StoryGenerator.with_root_images(structure, None, story_key)
+    return structure, time.perf_counter() - started
+
+
+def run(args: argparse.Namespace) -> None:
+    themes = load_themes(args.themes_file)
+    checkpoint = load_checkpoint(args.checkpoint, os.path.abspath(args.themes_file), args.count)
+    session_id = f"bulk-{checkpoint['run_id']}"
+
+    pending = [slot for slot in range(args.count) if str(slot) not in checkpoint["done"]]
+    print(f"{len(checkpoint['done'])}/{args.count} stories already done, generating {len(pending)}")
+
+    generation_latencies: List[float] = []
+    write_latencies: List[float] = []
+    failures: List[Tuple[int, str]] = []
+    batch: List[Tuple[int, object]] = []
+    stored_this_run = 0
+    run_started = time.perf_counter()
+
+    def flush_batch() -> None:
+        nonlocal stored_this_run
+        if not batch:
+            return
+        db = SessionLocal()
+        started = time.perf_counter()
+        try:
+            stored = []
+            for slot, structure in batch:
+                story = StoryGenerator.persist_story(db, structure, session_id, user_id=None, generate_images=False)
+                stored.append((slot, story))
+            for slot, story in stored:
+                precompute_story_tree(db, story, commit=False)
+            db.commit()
+            for slot, story in stored:
+                checkpoint["done"][str(slot)] = story.id
+            stored_this_run += len(stored)
+            write_latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            db.rollback()
+            logger.error("Batch write failed, %d stories will be regenerated next run: %s", len(batch), e)
+            failures.extend((slot, f"write failed: {e}") for slot, _ in batch)
+        finally:
+            db.close()
+        save_checkpoint(args.checkpoint, checkpoint)
+        batch.clear()
+        print(f"  {len(checkpoint['done'])}/{args.count} stored")
+
+    slots = iter(pending)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        in_flight: Dict = {}  # future -> slot
+        try:
+            while True:
+                # Keep at most `concurrency` generations in flight so memory stays bounded
+                while len(in_flight) < args.concurrency:
+                    slot = next(slots, None)
+                    if slot is None:
+                        break
+                    in_flight[pool.submit(
+                        _build, themes[slot % len(themes)], f"{session_id}-{slot}", not args.no_images
+                    )] = slot
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    slot = in_flight.pop(future)
+                    try:
+                        structure, latency = future.result()
+                    except Exception as e:
+                        failures.append((slot, str(e)))
+                        logger.warning("Generation failed for slot %d: %s", slot, e)
+                        continue
+                    generation_latencies.append(latency)
+                    batch.append((slot, structure))
+                if len(batch) >= args.batch_size:
+                    flush_batch()
+        except KeyboardInterrupt:
+            print("Interrupted; writing finished stories and saving checkpoint")
+            for future in in_flight:
+                future.cancel()
+        finally:
+            flush_batch()
+
+    elapsed = time.perf_counter() - run_started
+    print()
+    print(f"Stored this run:   {stored_this_run}")
+    print(f"Total done:        {len(checkpoint['done'])}/{args.count}")
+    print(f"Failures:          {len(failures)}")
+    print(f"Elapsed:           {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput:        {stored_this_run / elapsed * 60:.2f} stories/min")
+    if generation_latencies:
+        print(
+            "Generation latency: "
+            f"mean={statistics.mean(generation_latencies):.1f}s "
+            f"p50={_percentile(generation_latencies, 50):.1f}s "
+            f"p95={_percentile(generation_latencies, 95):.1f}s "
+            f"max={max(generation_latencies):.1f}s"
+        )
+    if write_latencies:
+        print(
+            f"Batch write:       mean={statistics.mean(write_latencies):.2f}s "
+            f"max={max(write_latencies):.2f}s over {len(write_latencies)} batches"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate stories in bulk straight into the database.")
+    parser.add_argument("themes_file", help="file with one theme per line")
+    parser.add_argument("--count", type=int, required=True, help="total number of stories for this run")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel LLM generations")
+    parser.add_argument("--batch-size", type=int, default=10, help="stories per database commit")
+    parser.add_argument("--checkpoint", default="bulk_generate.checkpoint.json")
+    parser.add_argument("--no-images", action="store_true", help="skip root image generation")
+    args = parser.parse_args()
+
+    create_tables()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from core.auth import UserPrincipal
+from core.config import settings
+from core.job_queue import PRIORITY_INTERACTIVE, PRIORITY_TIERS, count_active_jobs
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated_at = now
+
+    def try_take(self, now: float) -> float:
+        """
+        Takes one token. Returns 0 on success, otherwise the seconds until a token is available.
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        if self.refill_per_second <= 0:
+            return math.inf
+        return (1 - self.tokens) / self.refill_per_second
+
+    def refund(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class BucketRegistry:
+    """
+    Per-key token buckets held in process memory. The least recently used keys are evicted beyond
+    `max_keys`; an evicted key simply starts again from a full bucket.
+    """
+
+    def __init__(self, capacity: float, per_hour: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.refill_per_second = per_hour / 3600.0
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.capacity, self.refill_per_second)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def try_take(self, key: str) -> float:
+        with self._lock:
+            return self._get(key).try_take(time.monotonic())
+
+    def refund(self, key: str) -> None:
+        with self._lock:
+            self._get(key).refund()
+
+
+user_buckets = BucketRegistry(settings.STORY_QUOTA_USER_BURST, settings.STORY_QUOTA_USER_PER_HOUR)
+session_buckets = BucketRegistry(settings.STORY_QUOTA_SESSION_BURST, settings.STORY_QUOTA_SESSION_PER_HOUR)
+
+
+def _too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    retry_after = settings.STORY_QUEUE_RETRY_AFTER_SECONDS if math.isinf(retry_after) else retry_after
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def resolve_priority(principal: UserPrincipal, tier: str) -> int:
+    """
+    The queue priority for a generation request. Only admins (who run bulk and prewarm work) may
+    pick a tier; everyone else is interactive. Raises 403 when a non-admin asks for another tier.
+    """
+    if tier != "interactive" and not principal.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Admin access required for the {tier} tier",
+        )
+    return PRIORITY_TIERS[tier]
+
+
+def admit_story_request(db: Session, user_id: int, session_id: Optional[str], priority: int) -> None:
+    """
+    Raises 429 with Retry-After when the generation queue is saturated or the caller is over quota.
+
+    The queue check runs first so a saturated system never burns anyone's tokens. Bulk and prewarm
+    work is only admitted while the queue is below STORY_BULK_QUEUE_SHARE of its cap, leaving the
+    rest for interactive requests.
+    """
+    max_depth = settings.STORY_MAX_QUEUE_DEPTH
+    if priority > PRIORITY_INTERACTIVE:
+        max_depth = int(max_depth * settings.STORY_BULK_QUEUE_SHARE)
+    if count_active_jobs(db) >= max_depth:
+        raise _too_many_requests(
+            "Story generation is at capacity, try again shortly", settings.STORY_QUEUE_RETRY_AFTER_SECONDS
+        )
+
+    user_key = f"user:{user_id}"
+    wait = user_buckets.try_take(user_key)
+    if wait:
+        raise _too_many_requests("Story generation quota exceeded", wait)
+
+    if session_id:
+        wait = session_buckets.try_take(f"session:{session_id}")
+        if wait:
+            user_buckets.refund(user_key)
+            raise _too_many_requests("Story generation quota exceeded for this session", wait)
@@ -0,0 +1,151 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from core.analytics_writer import event_row, write_events
+from core.autosave_buffer import autosave_buffer
+from core.progress import update_user_progress
+from core.save_journal import SaveState, append_choice, load_save_state
+from core.story_graph import get_story_graph
+from core.visited import visited_columns
+from models.save_game import SaveGame
+from models.story import StoryNode
+from schemas.story import CompleteStoryNodeResponse, StoryAdvanceRequest, StoryAdvanceResponse
+
+AUTOSAVE_NAME = "Autosave"
+
+
+def _target_save(db: Session, user_id: int, story_id: int, save_id: Optional[int]) -> Optional[SaveGame]:
+    query = db.query(SaveGame).filter(SaveGame.user_id == user_id, SaveGame.story_id == story_id)
+    if save_id is not None:
+        save = query.filter(SaveGame.id == save_id).first()
+        if save is None:
+            raise HTTPException(status_code=404, detail="Save game not found")
+        return save
+    return query.filter(SaveGame.is_auto_save == True).first()
+
+
+def resolve_choice(db: Session, story_id: int, from_node_id: int, next_node_id: int) -> Tuple[StoryNode, StoryNode, dict]:
+    """
+    Looks up a choice from `from_node_id` to `next_node_id` in `story_id`. Returns both nodes and
+    the option taken; 404 if either node isn't in the story, 400 if it isn't one of the options.
+    """
+    nodes = {
+        node.id: node
+        for node in db.query(StoryNode).filter(
+            StoryNode.id.in_([from_node_id, next_node_id]),
+            StoryNode.story_id == story_id,
+        )
+    }
+    from_node = nodes.get(from_node_id)
+    next_node = nodes.get(next_node_id)
+    if from_node is None or next_node is None:
+        raise HTTPException(status_code=404, detail="Story node not found")
+
+    option = next(
+        (o for o in from_node.options or [] if isinstance(o, dict) and o.get("node_id") == next_node.id),
+        None,
+    )
+    if option is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Node {next_node.id} is not a choice from node {from_node.id}",
+        )
+    return from_node, next_node, option
+
+
+def require_current_node(db: Session, save_id: int, node_id: int) -> SaveState:
+    """
+    Locks the save row and returns its state with pending journal entries replayed; 409 unless the
+    save is at `node_id`, so a choice can only continue from where the save actually is.
+    """
+    save = db.query(SaveGame).filter(SaveGame.id == save_id).populate_existing().with_for_update().one()
+    state = load_save_state(db, save)
+    if state.current_node_id != node_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Save {save_id} is at node {state.current_node_id}, not node {node_id}",
+        )
+    return state
+
+
+def advance_story(db: Session, user_id: int, story_id: int, request: StoryAdvanceRequest) -> StoryAdvanceResponse:
+    """
+    Applies one player choice: validates it against the stored options, appends it to the save
+    (the player's autosave unless `save_id` is given, created on first use), updates progress and
+    records the analytics events. Everything is flushed here and committed by the caller at once.
+
+    The choice must start where the save is (409 otherwise); a new autosave starts at the root.
+    """
+    from_node, next_node, option = resolve_choice(db, story_id, request.from_node_id, request.next_node_id)
+
+    save = _target_save(db, user_id, story_id, request.save_id)
+    entry_id = None
+    started = save is None
+    if save is None:
+        if not from_node.is_root:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"A new save starts at the root, not node {from_node.id}",
+            )
+        # First choice in this story: the autosave starts out with it already applied
+        graph = get_story_graph(db, story_id)
+        save = SaveGame(
+            user_id=user_id,
+            story_id=story_id,
+            save_name=AUTOSAVE_NAME,
+            current_node_id=next_node.id,
+            choices_made=[{
+                "node_id": from_node.id,
+                "option_text": option.get("text", ""),
+                "next_node_id": next_node.id,
+                "timestamp": datetime.utcnow().isoformat(),
+            }],
+            play_time_minutes=request.play_time_minutes or 0,
+            is_auto_save=True,
+            updated_at=datetime.utcnow(),
+            **visited_columns(graph, [from_node.id, next_node.id]),
+        )
+        db.add(save)
+        db.flush()
+    else:
+        # A buffered autosave snapshot goes first so the choice lands on top of it
+        autosave_buffer.flush(db, save_id=save.id, commit=False)
+        require_current_node(db, save.id, from_node.id)
+        entry = append_choice(
+            db, save.id, from_node.id, option.get("text", ""), next_node.id, request.play_time_minutes
+        )
+        entry_id = entry.id
+
+    update_user_progress(db, user_id, story_id, [from_node.id, next_node.id], commit=False)
+
+    event_payload = {
+        "save_id": save.id,
+        "from_node_id": from_node.id,
+        "next_node_id": next_node.id,
+        "option_text": option.get("text", ""),
+    }
+    events = []
+    if started:
+        events.append(event_row(user_id, story_id, "start", {"save_id": save.id}))
+    events.append(event_row(user_id, story_id, "choice", event_payload))
+    if next_node.is_ending:
+        events.append(event_row(
+            user_id,
+            story_id,
+            "ending",
+            {**event_payload, "node_id": next_node.id, "is_winning_ending": bool(next_node.is_winning_ending)},
+        ))
+    # Written with the choice rather than queued, so the events can't outlive a failed commit
+    write_events(db, events)
+
+    graph = get_story_graph(db, story_id)
+    return StoryAdvanceResponse(
+        story_id=story_id,
+        save_id=save.id,
+        journal_entry_id=entry_id,
+        node=CompleteStoryNodeResponse.model_validate(next_node),
+        endings_reachable=graph.endings_reachable_from(next_node.id) if graph else None,
+    )
@@ -0,0 +1,376 @@
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.event_watermark import EventWatermark
+from models.analytics_event import AnalyticsEvent
+from models.job import StoryJob
+from models.user import User
+
+START, CHOICE, ENDING, OTHER = 0, 1, 2, 3
+EVENT_CODES = {"start": START, "choice": CHOICE, "ending": ENDING}
+
+WEEK_SECONDS = 7 * 86400
+# 1970-01-01 was a Thursday; shifting by three days makes weeks start on Monday
+_WEEK_SHIFT = 3 * 86400
+UNKNOWN_THEME = "unknown"
+GROUP_SEPARATOR = "\x1f"
+
+
+def _epoch(value: Optional[datetime]) -> int:
+    if value is None:
+        return 0
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _week_start(ts: np.ndarray) -> np.ndarray:
+    return (ts + _WEEK_SHIFT) // WEEK_SECONDS * WEEK_SECONDS - _WEEK_SHIFT
+
+
+def _week_label(ts: int) -> str:
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).date().isoformat()
+
+
+@dataclass(frozen=True)
+class EventArrays:
+    """
+    analytics_events as parallel NumPy columns in id order, up to event id `watermark` (the highest
+    id read; see EventArrayCache for events that commit late).
+
+    user_id is -1 and story_id 0 where the event has none; ts is epoch seconds. The small user
+    and story lookups (signup time, theme) are reloaded with every refresh.
+    """
+
+    watermark: int
+    id: np.ndarray
+    user_id: np.ndarray
+    story_id: np.ndarray
+    event: np.ndarray
+    win: np.ndarray
+    ts: np.ndarray
+    signup_ts: Dict[int, int]
+    story_theme: Dict[int, str]
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+
+def _empty_columns() -> Dict[str, np.ndarray]:
+    return {
+        "id": np.empty(0, dtype=np.int64),
+        "user_id": np.empty(0, dtype=np.int64),
+        "story_id": np.empty(0, dtype=np.int64),
+        "event": np.empty(0, dtype=np.int8),
+        "win": np.empty(0, dtype=bool),
+        "ts": np.empty(0, dtype=np.int64),
+    }
+
+
+def _concat(first: Dict[str, np.ndarray], second: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    if not len(second["id"]):
+        return first
+    return {name: np.concatenate([first[name], second[name]]) for name in first}
+
+
+def _load_chunks(db: Session, after_id: int, through_id: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Events with after_id < id <= through_id, fetched ANALYTICS_ENGINE_CHUNK_SIZE rows at a time
+    into arrays.
+    """
+    query = (
+        select(
+            AnalyticsEvent.id,
+            AnalyticsEvent.user_id,
+            AnalyticsEvent.story_id,
+            AnalyticsEvent.event_type,
+            AnalyticsEvent.is_winning_ending,
+            AnalyticsEvent.created_at,
+        )
+        .where(AnalyticsEvent.id > after_id)
+        .order_by(AnalyticsEvent.id)
+        .execution_options(yield_per=settings.ANALYTICS_ENGINE_CHUNK_SIZE)
+    )
+    if through_id is not None:
+        query = query.where(AnalyticsEvent.id <= through_id)
+    chunks: List[Dict[str, np.ndarray]] = []
+    for rows in db.execute(query).partitions():
+        n = len(rows)
+        chunks.append({
+            "id": np.fromiter((r[0] for r in rows), dtype=np.int64, count=n),
+            "user_id": np.fromiter((-1 if r[1] is None else r[1] for r in rows), dtype=np.int64, count=n),
+            "story_id": np.fromiter((r[2] or 0 for r in rows), dtype=np.int64, count=n),
+            "event": np.fromiter((EVENT_CODES.get(r[3], OTHER) for r in rows), dtype=np.int8, count=n),
+            "win": np.fromiter((bool(r[4]) for r in rows), dtype=bool, count=n),
+            "ts": np.fromiter((_epoch(r[5]) for r in rows), dtype=np.int64, count=n),
+        })
+    if not chunks:
+        return _empty_columns()
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]}
+
+
+def _load_lookups(db: Session) -> Tuple[Dict[int, int], Dict[int, str]]:
+    signup_ts = {user_id: _epoch(created_at) for user_id, created_at in db.query(User.id, User.created_at)}
+    story_theme = {
+        story_id: theme or UNKNOWN_THEME
+        for story_id, theme in db.query(StoryJob.story_id, StoryJob.theme).filter(StoryJob.story_id.isnot(None))
+    }
+    return signup_ts, story_theme
+
+
+class EventArrayCache:
+    """
+    Keeps EventArrays in memory and tops them up with newer events at most once every
+    `min_refresh_seconds`. Events past ANALYTICS_RETENTION_DAYS are dropped from the arrays on
+    refresh, as they are from the table.
+
+    Only events up to the settled watermark (see EventWatermark) are kept between refreshes; the
+    tail after it is read again each time, so an event that commits after a higher id was read
+    still gets in. The database is read outside the lock by one caller at a time: the others keep
+    getting the previous arrays, or wait for that load when there are none yet.
+    """
+
+    def __init__(self, min_refresh_seconds: float):
+        self.min_refresh_seconds = min_refresh_seconds
+        self._arrays: Optional[EventArrays] = None
+        self._settled = _empty_columns()
+        self._watermark = EventWatermark()
+        self._refreshed_at = 0.0
+        self._loading: Optional[Future] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> EventArrays:
+        with self._lock:
+            now = time.monotonic()
+            arrays = self._arrays
+            if arrays is not None and now - self._refreshed_at < self.min_refresh_seconds:
+                return arrays
+            loading = self._loading
+            if loading is None:
+                loading = self._loading = Future()
+                settled, watermark, generation = self._settled, self._watermark, self._generation
+            else:
+                settled = None
+        if settled is None:
+            # Another caller is already loading
+            return arrays if arrays is not None else loading.result()
+
+        try:
+            settled, watermark, arrays = self._refresh(db, now, settled, watermark)
+        except BaseException as e:
+            with self._lock:
+                self._loading = None
+            loading.set_exception(e)
+            raise
+        with self._lock:
+            if generation == self._generation:
+                self._settled, self._watermark, self._arrays = settled, watermark, arrays
+                self._refreshed_at = now
+            self._loading = None
+        loading.set_result(arrays)
+        return arrays
+
+    @staticmethod
+    def _refresh(
+        db: Session, now: float, settled: Dict[str, np.ndarray], watermark: EventWatermark
+    ) -> Tuple[Dict[str, np.ndarray], EventWatermark, EventArrays]:
+        moved = watermark.settle(now, settings.ANALYTICS_COMMIT_GRACE_SECONDS)
+        if moved is not watermark:
+            settled = _concat(settled, _load_chunks(db, watermark.settled_id, moved.settled_id))
+        if settings.ANALYTICS_RETENTION_DAYS > 0 and len(settled["ts"]):
+            cutoff = _epoch(datetime.now(timezone.utc) - timedelta(days=settings.ANALYTICS_RETENTION_DAYS))
+            if settled["ts"][0] < cutoff:
+                keep = settled["ts"] >= cutoff
+                settled = {name: values[keep] for name, values in settled.items()}
+        tail = _load_chunks(db, moved.settled_id)
+        max_read = int(tail["id"][-1]) if len(tail["id"]) else moved.settled_id
+        moved = moved.observe(now, max_read)
+        signup_ts, story_theme = _load_lookups(db)
+        arrays = EventArrays(
+            watermark=max_read, signup_ts=signup_ts, story_theme=story_theme, **_concat(settled, tail)
+        )
+        return settled, moved, arrays
+
+    def clear(self) -> None:
+        with self._lock:
+            self._arrays = None
+            self._settled = _empty_columns()
+            self._watermark = EventWatermark()
+            self._generation += 1
+
+
+event_arrays = EventArrayCache(settings.ANALYTICS_ENGINE_REFRESH_SECONDS)
+
+
+def _lookup(keys: np.ndarray, mapping: Dict[int, Any], default: Any, dtype) -> np.ndarray:
+    """mapping[key] for every key, vectorized through a sorted key table."""
+    if not mapping:
+        return np.full(len(keys), default, dtype=dtype)
+    table_keys = np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))
+    table_values = np.array(list(mapping.values()), dtype=dtype)
+    order = np.argsort(table_keys)
+    table_keys, table_values = table_keys[order], table_values[order]
+    positions = np.clip(np.searchsorted(table_keys, keys), 0, len(table_keys) - 1)
+    found = table_keys[positions] == keys
+    return np.where(found, table_values[positions], np.array(default, dtype=dtype))
+
+
+def _pair_keys(user_id: np.ndarray, story_id: np.ndarray) -> np.ndarray:
+    return (user_id << 32) | story_id
+
+
+def _group_labels(arrays: EventArrays, users: np.ndarray, stories: np.ndarray, group_by: Sequence[str]) -> np.ndarray:
+    """One label per (user, story) pair: the requested group values joined with GROUP_SEPARATOR."""
+    parts = []
+    for name in group_by:
+        if name == "theme":
+            parts.append(_lookup(stories, arrays.story_theme, UNKNOWN_THEME, object))
+        elif name == "signup_week":
+            weeks = _week_start(_lookup(users, arrays.signup_ts, 0, np.int64))
+            unique_weeks, inverse = np.unique(weeks, return_inverse=True)
+            parts.append(np.array([_week_label(w) for w in unique_weeks], dtype=object)[inverse])
+        else:
+            parts.append(stories)
+    return np.array([GROUP_SEPARATOR.join(str(v) for v in values) for values in zip(*parts)], dtype=object)
+
+
+def funnel(
+    arrays: EventArrays, story_id: Optional[int] = None, group_by: Sequence[str] = ()
+) -> List[Dict[str, Any]]:
+    """
+    Player funnel over distinct (user, story) pairs: started, made a choice, reached an ending,
+    won. Grouped by any of "theme", "signup_week" and "story"; anonymous events are left out.
+    """
+    mask = arrays.user_id >= 0
+    if story_id is not None:
+        mask &= arrays.story_id == story_id
+    users, stories, event, win = arrays.user_id[mask], arrays.story_id[mask], arrays.event[mask], arrays.win[mask]
+    pairs = _pair_keys(users, stories)
+
+    # A pair that logged only choices still started; each later stage implies the earlier ones
+    stage_masks = [
+        np.isin(event, (START, CHOICE, ENDING)),
+        np.isin(event, (CHOICE, ENDING)),
+        event == ENDING,
+        (event == ENDING) & win,
+    ]
+    all_pairs, first = np.unique(pairs, return_index=True)
+    labels = _group_labels(arrays, users[first], stories[first], group_by) if group_by else np.full(len(all_pairs), "", dtype=object)
+    group_names, group_of_pair = np.unique(labels.astype(str), return_inverse=True)
+
+    counts = np.zeros((4, len(group_names)), dtype=np.int64)
+    for stage, stage_mask in enumerate(stage_masks):
+        reached = np.unique(pairs[stage_mask])
+        positions = np.searchsorted(all_pairs, reached)
+        counts[stage] = np.bincount(group_of_pair[positions], minlength=len(group_names))
+
+    result = []
+    for g, name in enumerate(group_names):
+        started, chose, ended, won = (int(c) for c in counts[:, g])
+        row: Dict[str, Any] = {}
+        if group_by:
+            for group, value in zip(group_by, name.split(GROUP_SEPARATOR)):
+                row[group] = int(value) if group == "story" else value
+        row.update({
+            "started": started,
+            "made_choice": chose,
+            "reached_ending": ended,
+            "won": won,
+            "completion_rate": round(ended / started * 100, 1) if started else 0,
+            "winning_rate": round(won / ended * 100, 1) if ended else 0,
+        })
+        result.append(row)
+    return result
+
+
+def cohort_retention(arrays: EventArrays, weeks: int = 8) -> List[Dict[str, Any]]:
+    """
+    Users grouped by signup week; for each week after signup, the share who logged any event.
+    """
+    if not arrays.signup_ts:
+        return []
+    user_ids = np.fromiter(arrays.signup_ts.keys(), dtype=np.int64, count=len(arrays.signup_ts))
+    signup = np.fromiter(arrays.signup_ts.values(), dtype=np.int64, count=len(arrays.signup_ts))
+    cohort_weeks, cohort_sizes = np.unique(_week_start(signup), return_counts=True)
+
+    mask = arrays.user_id >= 0
+    users, ts = arrays.user_id[mask], arrays.ts[mask]
+    user_signup = _lookup(users, arrays.signup_ts, -1, np.int64)
+    offset = (ts - user_signup) // WEEK_SECONDS
+    keep = (user_signup >= 0) & (offset >= 0) & (offset < weeks)
+    active = np.unique(np.stack([users[keep], offset[keep]], axis=1), axis=0) if keep.any() else np.empty((0, 2), dtype=np.int64)
+
+    cohort_of_user = np.searchsorted(cohort_weeks, _week_start(_lookup(active[:, 0], arrays.signup_ts, 0, np.int64)))
+    matrix = np.zeros((len(cohort_weeks), weeks), dtype=np.int64)
+    np.add.at(matrix, (cohort_of_user, active[:, 1]), 1)
+
+    return [
+        {
+            "signup_week": _week_label(week),
+            "users": int(size),
+            "active": [int(n) for n in matrix[i]],
+            "retention": [round(int(n) / int(size) * 100, 1) for n in matrix[i]],
+        }
+        for i, (week, size) in enumerate(zip(cohort_weeks, cohort_sizes))
+    ]
+
+
+PERCENTILES = (25, 50, 75, 90)
+
+
+def story_percentiles(arrays: EventArrays, story_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Per story, percentiles of the choices made and seconds spent before a player's first ending,
+    over the (user, story) pairs that reached one.
+    """
+    mask = (arrays.user_id >= 0) & (arrays.story_id > 0)
+    if story_id is not None:
+        mask &= arrays.story_id == story_id
+    users, stories, event, ts = arrays.user_id[mask], arrays.story_id[mask], arrays.event[mask], arrays.ts[mask]
+    if not len(users):
+        return []
+    pairs = _pair_keys(users, stories)
+
+    # Events are in id order already; a stable sort by pair keeps that order inside each pair
+    order = np.argsort(pairs, kind="stable")
+    pairs, stories, event, ts = pairs[order], stories[order], event[order], ts[order]
+    pair_values, pair_start = np.unique(pairs, return_index=True)
+    choices_so_far = np.cumsum(event == CHOICE)
+
+    ending_rows = np.flatnonzero(event == ENDING)
+    if not len(ending_rows):
+        return []
+    ending_pairs, first = np.unique(pairs[ending_rows], return_index=True)
+    first_ending = ending_rows[first]
+    starts = pair_start[np.searchsorted(pair_values, ending_pairs)]
+    before_start = np.where(starts > 0, choices_so_far[np.maximum(starts - 1, 0)], 0)
+    choices = choices_so_far[first_ending] - before_start
+    seconds = ts[first_ending] - ts[starts]
+    story_of = stories[first_ending]
+
+    result = []
+    by_story = np.argsort(story_of, kind="stable")
+    story_ids, story_start, story_count = np.unique(story_of[by_story], return_index=True, return_counts=True)
+    for sid, begin, count in zip(story_ids, story_start, story_count):
+        rows = by_story[begin:begin + count]
+        result.append({
+            "story_id": int(sid),
+            "completions": int(count),
+            "choices_before_ending": {
+                f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(choices[rows], PERCENTILES))
+            },
+            "seconds_before_ending": {
+                f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(seconds[rows], PERCENTILES))
+            },
+        })
+    return result
@@ -0,0 +1,198 @@
+import time
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.cache import LRUCache
+from core.config import settings
+from core.event_watermark import EventWatermark
+from core.story_graph import StoryGraphIndex, get_story_graph
+from models.analytics_event import AnalyticsEvent
+from models.story import StoryNode
+
+Edge = Tuple[int, int]  # (from node, next node)
+
+# story_id -> HeatmapCounters over the settled events; the tail past the watermark is re-read
+_counters_cache = LRUCache(settings.ANALYTICS_HEATMAP_CACHE_SIZE)
+
+
+@dataclass(frozen=True)
+class HeatmapCounters:
+    """
+    Event counts for one story, plus the story's options. Cached counters hold the events up to
+    watermark.settled_id (see EventWatermark); the ones handed out also include the tail.
+    Treated as immutable: a refresh builds a new instance with the newer events added.
+    """
+
+    watermark: EventWatermark
+    starts: int
+    edges: Dict[Edge, int]
+    endings: Dict[int, int]
+    options: Dict[int, Tuple[Tuple[int, str], ...]]
+
+
+def _story_options(db: Session, story_id: int) -> Dict[int, Tuple[Tuple[int, str], ...]]:
+    options = {}
+    for node_id, node_options in db.query(StoryNode.id, StoryNode.options).filter(StoryNode.story_id == story_id):
+        options[node_id] = tuple(
+            (o["node_id"], o.get("text", ""))
+            for o in node_options or []
+            if isinstance(o, dict) and isinstance(o.get("node_id"), int)
+        )
+    return options
+
+
+def _add_events(
+    db: Session, story_id: int, counters: HeatmapCounters, after_id: int, through_id: Optional[int] = None
+) -> Tuple[HeatmapCounters, int]:
+    """
+    Adds the story's events with after_id < id <= through_id to `counters`, and returns them with
+    the highest id read (after_id if none). The database groups the events, so only one row per
+    (event type, node, next node) comes back however many events there are.
+    """
+    query = (
+        db.query(
+            AnalyticsEvent.event_type,
+            AnalyticsEvent.node_id,
+            AnalyticsEvent.next_node_id,
+            func.count(),
+            func.max(AnalyticsEvent.id),
+        )
+        .filter(
+            AnalyticsEvent.story_id == story_id,
+            AnalyticsEvent.id > after_id,
+            AnalyticsEvent.event_type.in_(("start", "choice", "ending")),
+        )
+    )
+    if through_id is not None:
+        query = query.filter(AnalyticsEvent.id <= through_id)
+    rows = query.group_by(AnalyticsEvent.event_type, AnalyticsEvent.node_id, AnalyticsEvent.next_node_id).yield_per(1000)
+    starts = counters.starts
+    edges = Counter(counters.edges)
+    endings = Counter(counters.endings)
+    max_read = after_id
+    for event_type, node_id, next_node_id, count, max_id in rows:
+        max_read = max(max_read, max_id)
+        if event_type == "start":
+            starts += count
+        elif event_type == "choice" and node_id is not None and next_node_id is not None:
+            edges[(node_id, next_node_id)] += count
+        elif event_type == "ending" and node_id is not None:
+            endings[node_id] += count
+    if max_read == after_id:
+        return counters, max_read
+    return replace(counters, starts=starts, edges=dict(edges), endings=dict(endings)), max_read
+
+
+def get_heatmap_counters(db: Session, story_id: int) -> HeatmapCounters:
+    """
+    The story's counters including its newest events. Events that settled since the last call
+    are folded into the cached counters; the tail after them is counted again every time.
+    """
+    cached = _counters_cache.get(story_id)
+    settled = cached or HeatmapCounters(
+        watermark=EventWatermark(), starts=0, edges={}, endings={}, options=_story_options(db, story_id)
+    )
+    now = time.monotonic()
+    watermark = settled.watermark.settle(now, settings.ANALYTICS_COMMIT_GRACE_SECONDS)
+    if watermark is not settled.watermark:
+        settled, _ = _add_events(db, story_id, settled, settled.watermark.settled_id, watermark.settled_id)
+    current, max_read = _add_events(db, story_id, settled, watermark.settled_id)
+    watermark = watermark.observe(now, max_read)
+    if watermark is not settled.watermark:
+        settled = replace(settled, watermark=watermark)
+    if settled is not cached:
+        _counters_cache.set(story_id, settled)
+    return replace(current, watermark=watermark)
+
+
+def _rate(part: int, whole: int) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+
+def build_heatmap(graph: StoryGraphIndex, counters: HeatmapCounters) -> Dict[str, Any]:
+    """
+    Lays the counters over the story graph.
+
+    A node's visits are the choices that led into it (the root's are the starts, or the choices
+    made from it if starts weren't logged). Drop-off at a depth is whatever reached that depth
+    without choosing again or being at an ending.
+    """
+    incoming: Counter = Counter()
+    outgoing: Counter = Counter()
+    for (from_id, next_id), count in counters.edges.items():
+        incoming[next_id] += count
+        outgoing[from_id] += count
+
+    visits = {}
+    for node_id in graph.node_ids:
+        if node_id == graph.root_id:
+            visits[node_id] = max(counters.starts, outgoing[node_id])
+        else:
+            visits[node_id] = incoming[node_id]
+
+    nodes: List[Dict[str, Any]] = []
+    for node_id in graph.node_ids:
+        picks_total = outgoing[node_id]
+        nodes.append({
+            "node_id": node_id,
+            "depth": graph.depth_of(node_id),
+            "visits": visits[node_id],
+            "is_ending": graph.is_ending(node_id),
+            "options": [
+                {
+                    "next_node_id": next_id,
+                    "text": text,
+                    "picks": counters.edges.get((node_id, next_id), 0),
+                    "pick_rate": _rate(counters.edges.get((node_id, next_id), 0), picks_total),
+                }
+                for next_id, text in counters.options.get(node_id, ())
+            ],
+        })
+
+    by_depth: Dict[int, Dict[str, int]] = {}
+    for node_id in graph.node_ids:
+        depth = graph.depth_of(node_id)
+        if depth is None:
+            continue
+        level = by_depth.setdefault(depth, {"reached": 0, "continued": 0, "ended": 0})
+        level["reached"] += visits[node_id]
+        level["continued"] += outgoing[node_id]
+        # Reaching an ending is finishing, whether or not its "ending" event was logged
+        level["ended"] += visits[node_id] if graph.is_ending(node_id) else 0
+    drop_off = []
+    for depth in sorted(by_depth):
+        level = by_depth[depth]
+        dropped = max(0, level["reached"] - level["continued"] - level["ended"])
+        drop_off.append({"depth": depth, **level, "dropped": dropped, "drop_off_rate": _rate(dropped, level["reached"])})
+
+    total_endings = sum(counters.endings.get(n, 0) for n in graph.ending_ids)
+    endings = [
+        {
+            "node_id": node_id,
+            "is_winning_ending": graph.is_winning_ending(node_id),
+            "count": counters.endings.get(node_id, 0),
+            "share": _rate(counters.endings.get(node_id, 0), total_endings),
+        }
+        for node_id in sorted(graph.ending_ids)
+    ]
+
+    return {
+        "starts": counters.starts,
+        "nodes": nodes,
+        "drop_off": drop_off,
+        "endings": endings,
+        # Reachable nodes nobody has been to yet: the dead branches
+        "unvisited_node_ids": [n for n in graph.node_ids if graph.depth_of(n) is not None and visits[n] == 0],
+    }
+
+
+def story_heatmap(db: Session, story_id: int) -> Optional[Dict[str, Any]]:
+    """The heatmap for `story_id`, or None if the story does not exist."""
+    graph = get_story_graph(db, story_id)
+    if graph is None:
+        return None
+    return {"story_id": story_id, **build_heatmap(graph, get_heatmap_counters(db, story_id))}
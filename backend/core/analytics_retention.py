@@ -0,0 +1,145 @@
+import logging
+import re
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from db.database import SessionLocal
+from models.analytics_event import PARTITIONED, AnalyticsEvent
+
+logger = logging.getLogger("app.analytics")
+
+TABLE = AnalyticsEvent.__tablename__
+_PARTITION_NAME = re.compile(rf"^{TABLE}_(\d{{4}})_(\d{{2}})$")
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+def ensure_partitions(db: Session, now: Optional[datetime] = None) -> None:
+    """
+    Makes sure the monthly partitions for this month and the next ANALYTICS_PARTITIONS_AHEAD months
+    exist, plus a default partition for anything outside them. No-op unless the table is partitioned.
+    """
+    if not PARTITIONED:
+        return
+    now = now or datetime.now(timezone.utc)
+    month = _month_start(now.date())
+    statements = [f"CREATE TABLE IF NOT EXISTS {TABLE}_default PARTITION OF {TABLE} DEFAULT"]
+    for _ in range(settings.ANALYTICS_PARTITIONS_AHEAD + 1):
+        upper = _next_month(month)
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+    for statement in statements:
+        try:
+            db.execute(text(statement))
+            db.commit()
+        except Exception as e:
+            # e.g. rows for that month already sit in the default partition
+            db.rollback()
+            logger.warning("Creating analytics partition failed: %s", e)
+
+
+def _monthly_partitions(db: Session) -> List[Tuple[str, date]]:
+    rows = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": TABLE}).all()
+    partitions = []
+    for (name,) in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def apply_retention(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Removes events older than ANALYTICS_RETENTION_DAYS; their counts stay in the daily rollups.
+    Returns how many monthly partitions were dropped plus how many rows were deleted.
+
+    Whole months past the cutoff are dropped as partitions, which costs nothing per row. What is
+    left over (the cutoff's own month, the default partition, or an unpartitioned table) is
+    deleted in batches of ANALYTICS_RETENTION_DELETE_BATCH so no transaction grows unbounded.
+    """
+    if settings.ANALYTICS_RETENTION_DAYS <= 0:
+        return 0
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=settings.ANALYTICS_RETENTION_DAYS)
+
+    removed = 0
+    if PARTITIONED:
+        for name, month in _monthly_partitions(db):
+            if _next_month(month) > cutoff.date():
+                break
+            db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            db.commit()
+            logger.info("Dropped analytics partition %s", name)
+            removed += 1
+
+    batch = settings.ANALYTICS_RETENTION_DELETE_BATCH
+    while True:
+        expired = (
+            db.query(AnalyticsEvent.id)
+            .filter(AnalyticsEvent.created_at < cutoff)
+            .limit(batch)
+            .scalar_subquery()
+        )
+        result = db.execute(
+            delete(AnalyticsEvent)
+            .where(AnalyticsEvent.id.in_(expired), AnalyticsEvent.created_at < cutoff)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        removed += result.rowcount
+        if result.rowcount < batch:
+            break
+    return removed
+
+
+def _run_retention(stop_event: threading.Event, interval: float) -> None:
+    while not stop_event.wait(interval):
+        db = SessionLocal()
+        try:
+            ensure_partitions(db)
+            removed = apply_retention(db)
+            if removed:
+                logger.info("Analytics retention removed %d partitions/rows", removed)
+        except Exception as e:
+            db.rollback()
+            logger.warning("Analytics retention failed: %s", e)
+        finally:
+            db.close()
+
+
+def start_analytics_retention() -> Optional[threading.Event]:
+    """
+    Starts the partition and retention thread. Returns an event that stops it, or None if disabled.
+    Partitions for the current month are created by the caller at startup (ensure_partitions).
+    """
+    interval = settings.ANALYTICS_RETENTION_INTERVAL_SECONDS
+    if interval <= 0:
+        return None
+    stop_event = threading.Event()
+    threading.Thread(
+        target=_run_retention, args=(stop_event, interval), name="analytics-retention", daemon=True
+    ).start()
+    return stop_event
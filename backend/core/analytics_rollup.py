@@ -0,0 +1,185 @@
+import logging
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, cast, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from models.analytics_event import AnalyticsEvent, AnalyticsRollup
+
+logger = logging.getLogger("app.analytics")
+
+NO_STORY = 0
+
+RollupKey = Tuple[date, int, str, bool]  # (day, story_id, event_type, is_win)
+
+
+def is_win(event_type: str, payload: Optional[Dict[str, Any]]) -> bool:
+    return event_type == "ending" and bool((payload or {}).get("is_winning_ending"))
+
+
+def rollup_key(row: Dict[str, Any]) -> RollupKey:
+    created_at = row.get("created_at") or datetime.now(timezone.utc)
+    return (
+        created_at.astimezone(timezone.utc).date() if created_at.tzinfo else created_at.date(),
+        row.get("story_id") or NO_STORY,
+        row["event_type"],
+        bool(row.get("is_winning_ending")),
+    )
+
+
+def bump_rollups(db: Session, rows: Iterable[Dict[str, Any]]) -> None:
+    """
+    Adds `rows` (analytics_events column dicts) to their rollup counters; committing is left to
+    the caller so the counters always move in the same transaction as the events.
+    """
+    counts = Counter(rollup_key(row) for row in rows)
+    if not counts:
+        return
+    # Sorted so concurrent writers take row locks in the same order
+    values = [
+        {"day": day, "story_id": story_id, "event_type": event_type, "is_win": win, "count": n}
+        for (day, story_id, event_type, win), n in sorted(counts.items())
+    ]
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = upsert(AnalyticsRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "story_id", "event_type", "is_win"],
+            set_={"count": AnalyticsRollup.count + stmt.excluded["count"]},
+        )
+        db.execute(stmt, values)
+        return
+
+    for value in values:
+        result = db.execute(
+            update(AnalyticsRollup)
+            .where(
+                AnalyticsRollup.day == value["day"],
+                AnalyticsRollup.story_id == value["story_id"],
+                AnalyticsRollup.event_type == value["event_type"],
+                AnalyticsRollup.is_win == value["is_win"],
+            )
+            .values(count=AnalyticsRollup.count + value["count"])
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.execute(insert(AnalyticsRollup), [value])
+
+
+def fill_missing_win_flags(db: Session) -> None:
+    """
+    Events logged before is_winning_ending was a column have it NULL; copy it out of the payload.
+    """
+    missing = AnalyticsEvent.is_winning_ending.is_(None)
+    if db.query(AnalyticsEvent.id).filter(missing).first() is None:
+        return
+    db.query(AnalyticsEvent).filter(missing, AnalyticsEvent.event_type == "ending").update(
+        {
+            AnalyticsEvent.is_winning_ending: func.coalesce(
+                AnalyticsEvent.payload["is_winning_ending"].as_boolean(), False
+            )
+        },
+        synchronize_session=False,
+    )
+    db.query(AnalyticsEvent).filter(missing).update(
+        {AnalyticsEvent.is_winning_ending: False}, synchronize_session=False
+    )
+    db.commit()
+
+
+def utc_day(db: Session, column: Any) -> Any:
+    """
+    SQL for the UTC calendar day of a timestamp column, the same day rollup_key() picks. Postgres's
+    date() would follow the session time zone; SQLite stores the UTC time as written.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.timezone("UTC", column), Date)
+    return func.date(column)
+
+
+def backfill_rollups(db: Session) -> None:
+    """
+    Builds the rollups from analytics_events once, for events logged before the table existed.
+    Does nothing when any rollup row is already there. Run fill_missing_win_flags first.
+    """
+    if db.query(AnalyticsRollup.day).first() is not None or db.query(AnalyticsEvent.id).first() is None:
+        return
+    logger.info("Backfilling analytics rollups")
+    day = utc_day(db, AnalyticsEvent.created_at)
+    story_id = func.coalesce(AnalyticsEvent.story_id, NO_STORY)
+    win = func.coalesce(AnalyticsEvent.is_winning_ending, False)
+    db.execute(
+        insert(AnalyticsRollup).from_select(
+            ["day", "story_id", "event_type", "is_win", "count"],
+            select(day, story_id, AnalyticsEvent.event_type, win, func.count())
+            .group_by(day, story_id, AnalyticsEvent.event_type, win),
+        )
+    )
+    db.commit()
+
+
+def _rollup_query(db: Session, story_id: Optional[int], start: Optional[date], end: Optional[date], *columns):
+    query = db.query(*columns, AnalyticsRollup.event_type, AnalyticsRollup.is_win, func.sum(AnalyticsRollup.count))
+    if story_id is not None:
+        query = query.filter(AnalyticsRollup.story_id == story_id)
+    if start is not None:
+        query = query.filter(AnalyticsRollup.day >= start)
+    if end is not None:
+        query = query.filter(AnalyticsRollup.day <= end)
+    return query.group_by(*columns, AnalyticsRollup.event_type, AnalyticsRollup.is_win)
+
+
+def _summarize(counts: Dict[Tuple[str, bool], int]) -> Dict[str, Any]:
+    total_starts = counts.get(("start", False), 0) + counts.get(("start", True), 0)
+    total_choices = counts.get(("choice", False), 0) + counts.get(("choice", True), 0)
+    total_wins = counts.get(("ending", True), 0)
+    total_endings = counts.get(("ending", False), 0) + total_wins
+    completion_rate = (total_endings / total_starts * 100) if total_starts else 0
+    winning_rate = (total_wins / total_endings * 100) if total_endings else 0
+    return {
+        "total_starts": total_starts,
+        "total_choices": total_choices,
+        "total_endings": total_endings,
+        "total_wins": total_wins,
+        "completion_rate": round(completion_rate, 1),
+        "winning_rate": round(winning_rate, 1),
+    }
+
+
+def read_summary(
+    db: Session,
+    story_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    The /analytics/summary totals from the rollups, optionally for one story and an inclusive day
+    range. With `group_by` ("day" or "story") the same totals are also given per day or per story.
+    The work depends on the number of rollup rows in range, not on how many events were logged.
+    """
+    totals: Dict[Tuple[str, bool], int] = {}
+    for event_type, win, n in _rollup_query(db, story_id, start, end):
+        totals[(event_type, win)] = int(n)
+    summary = _summarize(totals)
+    if group_by is None:
+        return summary
+
+    column = AnalyticsRollup.day if group_by == "day" else AnalyticsRollup.story_id
+    groups: Dict[Any, Dict[Tuple[str, bool], int]] = {}
+    for key, event_type, win, n in _rollup_query(db, story_id, start, end, column):
+        groups.setdefault(key, {})[(event_type, win)] = int(n)
+    breakdown: List[Dict[str, Any]] = []
+    for key in sorted(groups):
+        item = {"day": key.isoformat()} if group_by == "day" else {"story_id": key or None}
+        item.update(_summarize(groups[key]))
+        breakdown.append(item)
+    summary["breakdown"] = breakdown
+    return summary
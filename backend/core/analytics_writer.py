@@ -0,0 +1,183 @@
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.analytics_rollup import bump_rollups, is_win
+from core.config import settings
+from db.database import SessionLocal
+from models.analytics_event import AnalyticsEvent
+from models.story import Story
+from models.user import User
+
+logger = logging.getLogger("app.analytics")
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def event_row(user_id: Optional[int], story_id: Optional[int], event_type: str, payload: Optional[Dict]) -> Dict[str, Any]:
+    """One analytics_events row, stamped now so a delayed write keeps the time the event arrived."""
+    payload = payload or {}
+    return {
+        "user_id": user_id,
+        "story_id": story_id,
+        "event_type": event_type,
+        "is_winning_ending": is_win(event_type, payload),
+        "node_id": _int_or_none(payload.get("node_id", payload.get("from_node_id"))),
+        "next_node_id": _int_or_none(payload.get("next_node_id")),
+        "payload": payload,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+def write_events(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserts `rows` with one executemany and adds them to the rollups; committing is left to the caller.
+    """
+    if rows:
+        db.execute(insert(AnalyticsEvent), rows)
+        bump_rollups(db, rows)
+
+
+def insert_events(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    Writes `rows` (see write_events) and commits. Returns how many were written.
+
+    If the batch hits a foreign key error (an event for a story or user that no longer exists),
+    those rows are dropped and the rest are inserted again, so one bad event can't sink a batch.
+    """
+    if not rows:
+        return 0
+    try:
+        write_events(db, rows)
+        db.commit()
+        return len(rows)
+    except IntegrityError:
+        db.rollback()
+
+    story_ids = {r["story_id"] for r in rows if r["story_id"] is not None}
+    user_ids = {r["user_id"] for r in rows if r["user_id"] is not None}
+    known_stories = {i for (i,) in db.query(Story.id).filter(Story.id.in_(story_ids))} if story_ids else set()
+    known_users = {i for (i,) in db.query(User.id).filter(User.id.in_(user_ids))} if user_ids else set()
+    valid = [
+        r for r in rows
+        if (r["story_id"] is None or r["story_id"] in known_stories)
+        and (r["user_id"] is None or r["user_id"] in known_users)
+    ]
+    if len(valid) < len(rows):
+        logger.warning("Dropped %d analytics events with unknown story or user", len(rows) - len(valid))
+    write_events(db, valid)
+    db.commit()
+    return len(valid)
+
+
+class AnalyticsWriter:
+    """
+    Bounded in-memory queue of analytics rows, written in bulk by a background thread.
+
+    Requests only append to the queue; the writer inserts up to `batch_size` rows per executemany,
+    every `interval` seconds or as soon as a full batch is waiting. When the queue is full,
+    enqueue() refuses the whole batch so the caller can push back instead of growing memory.
+    """
+
+    def __init__(self, max_pending: int, batch_size: int, interval: float):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: "deque[Dict[str, Any]]" = deque()
+        self._lock = threading.Lock()
+        # Held for a whole flush so the shutdown flush waits for the thread's batch in flight
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def enqueue(self, rows: Iterable[Dict[str, Any]]) -> bool:
+        """Queues `rows` as a unit. Returns False, queuing nothing, when they don't fit."""
+        rows = list(rows)
+        with self._lock:
+            if len(self._queue) + len(rows) > self.max_pending:
+                return False
+            self._queue.extend(rows)
+            full_batch = len(self._queue) >= self.batch_size
+        if full_batch:
+            self._wake.set()
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def _take(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _restore(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            # Oldest first again; what no longer fits is lost rather than blocking ingestion
+            room = max(0, self.max_pending - len(self._queue))
+            if room < len(rows):
+                logger.warning("Analytics queue full, dropping %d events", len(rows) - room)
+            self._queue.extendleft(reversed(rows[:room]))
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """
+        Writes everything queued so far, one batch per transaction. Returns how many rows were written.
+        A failed batch goes back to the front of the queue and ends this flush.
+        """
+        written = 0
+        with self._flush_lock:
+            own_session = db is None
+            db = db or SessionLocal()
+            try:
+                while True:
+                    rows = self._take()
+                    if not rows:
+                        break
+                    try:
+                        written += insert_events(db, rows)
+                    except Exception as e:
+                        db.rollback()
+                        self._restore(rows)
+                        logger.warning("Writing %d analytics events failed: %s", len(rows), e)
+                        break
+            finally:
+                if own_session:
+                    db.close()
+        return written
+
+    def run(self, stop_event: threading.Event) -> None:
+        while not stop_event.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            written = self.flush()
+            if written:
+                logger.debug("Wrote %d analytics events", written)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+
+analytics_writer = AnalyticsWriter(
+    settings.ANALYTICS_QUEUE_MAX_PENDING, settings.ANALYTICS_FLUSH_BATCH, settings.ANALYTICS_FLUSH_SECONDS
+)
+
+
+def start_analytics_writer() -> Optional[threading.Event]:
+    """
+    Starts the bulk writer thread. Returns an event that stops it, or None if write-behind is off.
+    Whoever stops it should call analytics_writer.wake() and then analytics_writer.flush().
+    """
+    if not settings.ANALYTICS_WRITE_BEHIND:
+        return None
+    stop_event = threading.Event()
+    threading.Thread(
+        target=analytics_writer.run, args=(stop_event,), name="analytics-writer", daemon=True
+    ).start()
+    return stop_event
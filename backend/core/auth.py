@@ -1,17 +1,20 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
+from core.cache import LRUCache
 from core.config import settings
+from core.password_hashing import make_context
 from db.database import get_db
 from models.user import User
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (blocking; request handlers use core.password_hashing.password_hasher)
+pwd_context = make_context(settings.PASSWORD_BCRYPT_ROUNDS)
 
 # JWT token handling
 security = HTTPBearer()
@@ -33,7 +36,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token(credentials: HTTPAuthorizationCredentials) -> dict:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -42,19 +45,106 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     
     try:
         payload = jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
+        user_id = payload.get("sub")
+        if user_id is None or not str(user_id).isdigit():
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    return user_id
+    return payload
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return decode_token(credentials).get("sub")
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """The authenticated caller: just what authorization needs, without the user row."""
+
+    id: int
+    is_active: bool
+    is_admin: bool
+
+
+# user id -> UserPrincipal; dropped when the user row changes, and expired so other processes catch up
+_principal_cache = LRUCache(settings.AUTH_USER_CACHE_SIZE, ttl_seconds=settings.AUTH_USER_CACHE_TTL_SECONDS)
+
+
+def is_admin_email(email: str) -> bool:
+    return email.lower() in settings.ADMIN_EMAILS
+
+
+def principal_claims(user: User) -> dict:
+    """Claims for create_access_token that let get_current_user skip the database (AUTH_TRUST_TOKEN_CLAIMS)."""
+    return {"active": bool(user.is_active), "admin": is_admin_email(user.email)}
+
+
+def invalidate_user(user_id: int) -> None:
+    """Forgets the cached principal; call after changing a user with a bulk UPDATE."""
+    _principal_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_row(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
+
 
-def get_current_user(db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
-    user = db.query(User).filter(User.id == user_id).first()
+def _load_principal(db: Session, user_id: int) -> Optional[UserPrincipal]:
+    principal = _principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    row = db.query(User.id, User.is_active, User.email).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    principal = UserPrincipal(id=row.id, is_active=bool(row.is_active), is_admin=is_admin_email(row.email))
+    _principal_cache.set(user_id, principal)
+    return principal
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)
+) -> UserPrincipal:
+    """
+    The caller's principal. Comes from signed token claims when AUTH_TRUST_TOKEN_CLAIMS is on and
+    the token carries them, otherwise from a TTL cache in front of a one-row users lookup.
+    """
+    payload = decode_token(credentials)
+    user_id = int(payload["sub"])
+    if settings.AUTH_TRUST_TOKEN_CLAIMS and "active" in payload:
+        principal = UserPrincipal(id=user_id, is_active=bool(payload["active"]), is_admin=bool(payload.get("admin")))
+    else:
+        principal = _load_principal(db, user_id)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user"
+        )
+    return principal
+
+
+def get_current_user_record(
+    principal: UserPrincipal = Depends(get_current_user), db: Session = Depends(get_db)
+) -> User:
+    """The full user row, for the few endpoints that return profile fields."""
+    user = db.query(User).filter(User.id == principal.id).first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
     return user
+
+
+def get_current_admin(current_user: UserPrincipal = Depends(get_current_user)) -> UserPrincipal:
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
@@ -0,0 +1,273 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, event, func, or_, update
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.progress import update_user_progress
+from core.save_journal import SaveState
+from core.story_graph import get_story_graphs
+from core.visited import visited_columns
+from db.database import SessionLocal
+from models.save_game import SaveGame, SaveJournalEntry
+
+logger = logging.getLogger("app.saves")
+
+AutosaveKey = Tuple[int, int]  # (user_id, story_id)
+
+# Session.info key: entries flushed into a caller's transaction that hasn't committed yet
+_UNCOMMITTED = "autosave_uncommitted"
+
+
+@dataclass(frozen=True)
+class BufferedAutosave:
+    """Latest autosave state for one (user, story), plus what a response needs without a query."""
+
+    save_id: int
+    user_id: int
+    story_id: int
+    save_name: str
+    current_node_id: int
+    choices_made: List[Dict[str, Any]]
+    nodes_visited: List[int]
+    play_time_minutes: int
+    created_at: Optional[datetime]
+    updated_at: datetime
+    story_title: Optional[str]
+    node_preview: Optional[str]
+    dirty: bool = True
+    # Highest journal entry id this snapshot supersedes; entries appended after it stay pending
+    journal_through: int = 0
+
+    def state(self) -> SaveState:
+        return SaveState(
+            current_node_id=self.current_node_id,
+            choices_made=self.choices_made,
+            nodes_visited=self.nodes_visited,
+            play_time_minutes=self.play_time_minutes,
+            journal_through=0,
+        )
+
+
+class AutosaveBuffer:
+    """
+    Write-behind buffer for autosaves, held in process memory.
+
+    Each (user, story) keeps only its latest autosave; flush() writes every dirty entry with one
+    executemany UPDATE and a single commit. Clean entries stay around (LRU, `max_keys`) so the next
+    autosave for the same key knows its row id without a lookup. Until a flush, reads in this
+    process are served from the buffer and other processes see the last flushed state.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[AutosaveKey, BufferedAutosave]" = OrderedDict()
+        self._keys_by_save_id: Dict[int, AutosaveKey] = {}
+        self._lock = threading.Lock()
+        self._dirty_count = 0
+        # Bumped on every put so list ETags move while changes are still only in memory
+        self._user_versions: Dict[int, int] = {}
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_keys:
+            for key, entry in self._entries.items():
+                if not entry.dirty:
+                    del self._entries[key]
+                    self._keys_by_save_id.pop(entry.save_id, None)
+                    break
+            else:
+                return
+
+    def get(self, user_id: int, story_id: int) -> Optional[BufferedAutosave]:
+        """The latest known autosave for (user, story), dirty or already flushed."""
+        with self._lock:
+            return self._entries.get((user_id, story_id))
+
+    def put(self, entry: BufferedAutosave) -> int:
+        """
+        Buffers `entry` (dirty) or remembers it (clean). Returns the number of dirty entries.
+        """
+        key = (entry.user_id, entry.story_id)
+        with self._lock:
+            previous = self._entries.get(key)
+            if entry.dirty and not (previous and previous.dirty):
+                self._dirty_count += 1
+            elif not entry.dirty and previous and previous.dirty:
+                self._dirty_count -= 1
+            if previous is not None and previous.save_id != entry.save_id:
+                self._keys_by_save_id.pop(previous.save_id, None)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._keys_by_save_id[entry.save_id] = key
+            self._user_versions[entry.user_id] = self._user_versions.get(entry.user_id, 0) + 1
+            self._evict()
+            return self._dirty_count
+
+    def pending(self, save_id: int) -> Optional[BufferedAutosave]:
+        """The unflushed autosave for `save_id`, if any."""
+        with self._lock:
+            key = self._keys_by_save_id.get(save_id)
+            entry = self._entries.get(key) if key else None
+            return entry if entry is not None and entry.dirty else None
+
+    def pending_for_user(self, user_id: int) -> Dict[int, BufferedAutosave]:
+        """Dirty entries of one user keyed by save id."""
+        with self._lock:
+            return {e.save_id: e for (uid, _), e in self._entries.items() if uid == user_id and e.dirty}
+
+    def user_version(self, user_id: int) -> int:
+        with self._lock:
+            return self._user_versions.get(user_id, 0)
+
+    def forget(self, save_id: int) -> None:
+        """Drops a save (deleted, or about to be overwritten by a direct write) from the buffer."""
+        with self._lock:
+            key = self._keys_by_save_id.pop(save_id, None)
+            entry = self._entries.pop(key, None) if key else None
+            if entry is not None:
+                if entry.dirty:
+                    self._dirty_count -= 1
+                self._user_versions[entry.user_id] = self._user_versions.get(entry.user_id, 0) + 1
+
+    def _take_dirty(self, save_id: Optional[int] = None) -> List[BufferedAutosave]:
+        with self._lock:
+            if save_id is not None:
+                key = self._keys_by_save_id.get(save_id)
+                keys = [key] if key else []
+            else:
+                keys = list(self._entries)
+            taken = []
+            for key in keys:
+                entry = self._entries[key]
+                if entry.dirty:
+                    taken.append(entry)
+                    self._entries[key] = replace(entry, dirty=False)
+                    self._dirty_count -= 1
+            return taken
+
+    @staticmethod
+    def _write(db: Session, entries: List[BufferedAutosave]) -> None:
+        graphs = get_story_graphs(db, {e.story_id for e in entries})
+        table = SaveGame.__table__
+        # Compare-and-set like compact_save: a snapshot never overwrites a row that already
+        # folded journal entries newer than the ones it covers
+        result = db.execute(
+            update(table).where(
+                table.c.id == bindparam("b_save_id"),
+                func.coalesce(table.c.journal_through, 0) <= bindparam("b_through"),
+            ),
+            [
+                {
+                    "b_save_id": e.save_id,
+                    "b_through": e.journal_through,
+                    "save_name": e.save_name,
+                    "current_node_id": e.current_node_id,
+                    "choices_made": e.choices_made,
+                    "play_time_minutes": e.play_time_minutes,
+                    "updated_at": e.updated_at,
+                    "journal_through": e.journal_through,
+                    **visited_columns(graphs.get(e.story_id), e.nodes_visited),
+                }
+                for e in entries
+            ],
+        )
+        if result.rowcount != len(entries):
+            logger.info("%d autosave snapshots were older than their compacted saves", len(entries) - result.rowcount)
+        # The snapshots supersede the choices appended before them, and only those
+        db.execute(
+            delete(SaveJournalEntry)
+            .where(or_(*(
+                and_(SaveJournalEntry.save_id == e.save_id, SaveJournalEntry.id <= e.journal_through)
+                for e in entries
+            )))
+            .execution_options(synchronize_session=False)
+        )
+        for e in entries:
+            update_user_progress(db, e.user_id, e.story_id, e.nodes_visited, commit=False)
+
+    def _restore(self, entries: List[BufferedAutosave]) -> None:
+        with self._lock:
+            for entry in entries:
+                key = (entry.user_id, entry.story_id)
+                current = self._entries.get(key)
+                # A newer autosave arrived while we were flushing; keep that one
+                if current is None or current.dirty or current.save_id != entry.save_id:
+                    continue
+                self._entries[key] = entry
+                self._dirty_count += 1
+
+    def flush(self, db: Optional[Session] = None, save_id: Optional[int] = None, commit: bool = True) -> int:
+        """
+        Writes dirty entries (only `save_id`'s if given) in one transaction. Returns how many were written.
+        On failure the entries go back into the buffer for the next flush.
+
+        With commit=False the writes join the caller's transaction on `db`, and committing or
+        rolling back is left to the caller: a failure is raised, and if the transaction ends
+        without a commit the entries go back into the buffer.
+        """
+        entries = self._take_dirty(save_id)
+        if not entries:
+            return 0
+
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            self._write(db, entries)
+            if commit:
+                db.commit()
+            else:
+                db.info.setdefault(_UNCOMMITTED, []).extend(entries)
+        except Exception as e:
+            self._restore(entries)
+            if not commit:
+                raise
+            db.rollback()
+            logger.warning("Autosave flush of %d entries failed: %s", len(entries), e)
+            return 0
+        finally:
+            if own_session:
+                db.close()
+        return len(entries)
+
+
+autosave_buffer = AutosaveBuffer()
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_committed(session: Session) -> None:
+    session.info.pop(_UNCOMMITTED, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _restore_uncommitted(session: Session, transaction: Any) -> None:
+    # Rolled back or closed without a commit: the snapshots are only in the buffer again
+    if transaction.parent is None:
+        entries = session.info.pop(_UNCOMMITTED, None)
+        if entries:
+            autosave_buffer._restore(entries)
+
+
+def _run_flusher(stop_event: threading.Event, interval: float) -> None:
+    while not stop_event.wait(interval):
+        written = autosave_buffer.flush()
+        if written:
+            logger.debug("Flushed %d buffered autosaves", written)
+
+
+def start_autosave_flusher() -> Optional[threading.Event]:
+    """
+    Starts the periodic flush thread. Returns an event that stops it, or None if buffering is off.
+    Whoever stops it should call autosave_buffer.flush() afterwards to write what is left.
+    """
+    if not settings.AUTOSAVE_WRITE_BEHIND:
+        return None
+    stop_event = threading.Event()
+    threading.Thread(
+        target=_run_flusher, args=(stop_event, settings.AUTOSAVE_FLUSH_SECONDS), name="autosave-flusher", daemon=True
+    ).start()
+    return stop_event
@@ -22,10 +22,119 @@ class Settings(BaseSettings):
     # --- IMAGE GENERATION MODEL (Updated) ---
     EURI_IMAGE_MODEL: str = "black-forest-labs/FLUX.1-schnell"
     # ----------------------------------------
+
+    # Structural repair: how many validate/re-prompt rounds to run and how many subtrees to regenerate per round
+    STORY_REPAIR_MAX_ROUNDS: int = 2
+    STORY_REPAIR_MAX_SUBTREES: int = 4
+
+    # Job queue: leases are renewed every JOB_HEARTBEAT_SECONDS while a worker runs a job.
+    # Set RUN_EMBEDDED_WORKER=False when generation runs in separate `python -m worker` processes.
+    RUN_EMBEDDED_WORKER: bool = True
+    JOB_LEASE_SECONDS: int = 120
+    JOB_HEARTBEAT_SECONDS: int = 30
+    JOB_MAX_ATTEMPTS: int = 3
+    WORKER_POLL_SECONDS: float = 2.0
+
+    # Admission control for /stories/create: token buckets per user and per session, plus a global
+    # cap on pending/processing jobs. Bulk and prewarm tiers are only admitted below a share of that cap.
+    STORY_QUOTA_USER_BURST: int = 5
+    STORY_QUOTA_USER_PER_HOUR: float = 20
+    STORY_QUOTA_SESSION_BURST: int = 3
+    STORY_QUOTA_SESSION_PER_HOUR: float = 10
+    STORY_MAX_QUEUE_DEPTH: int = 100
+    STORY_BULK_QUEUE_SHARE: float = 0.5
+    STORY_QUEUE_RETRY_AFTER_SECONDS: int = 30
+
+    # Push-based job status (SSE / long-poll). When workers run in other processes without Postgres
+    # LISTEN/NOTIFY, one shared poll re-reads the jobs being waited on this often (0 disables it).
+    JOB_STATUS_DB_FALLBACK_SECONDS: float = 5.0
+    JOB_STATUS_LONG_POLL_SECONDS: float = 25.0
+    JOB_STATUS_SSE_KEEPALIVE_SECONDS: float = 15.0
+    JOB_STATUS_PG_NOTIFY: bool = True
+
+    # Idempotency-Key replay window for story creation and save writes
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    # An unfinished request holds its key this long; after that a retry takes the key over
+    IDEMPOTENCY_RESERVATION_SECONDS: int = 60
+
+    # Serialized complete-story trees kept in process memory (entries, not bytes)
+    STORY_TREE_CACHE_SIZE: int = 512
+
+    # Encode responses with orjson and skip the response_model re-validation for objects the
+    # endpoints build themselves (see core/serialization.py)
+    FAST_JSON_RESPONSES: bool = True
+
+    # GET /saves/ page size (keyset pagination, next page cursor in X-Next-Cursor)
+    SAVES_PAGE_SIZE: int = 50
+    SAVES_MAX_PAGE_SIZE: int = 200
+
+    # Save journal compaction: every interval (0 disables the in-process compactor), fold saves with
+    # at least MIN_ENTRIES pending choices or whose oldest pending choice is older than MAX_AGE
+    SAVE_JOURNAL_COMPACT_INTERVAL_SECONDS: float = 30.0
+    SAVE_JOURNAL_COMPACT_MIN_ENTRIES: int = 20
+    SAVE_JOURNAL_COMPACT_MAX_AGE_SECONDS: int = 300
+    SAVE_JOURNAL_COMPACT_BATCH: int = 200
+
+    # Autosave write-behind: keep the latest autosave per (user, story) in memory and write them in
+    # batches every AUTOSAVE_FLUSH_SECONDS, or right away once AUTOSAVE_FLUSH_MAX_PENDING are waiting.
+    # Run the API as a single process (or with sticky sessions) when this is on.
+    AUTOSAVE_WRITE_BEHIND: bool = True
+    AUTOSAVE_FLUSH_SECONDS: float = 5.0
+    AUTOSAVE_FLUSH_MAX_PENDING: int = 500
+
+    # Analytics ingestion: events are queued in memory and bulk-inserted ANALYTICS_FLUSH_BATCH at a
+    # time, every ANALYTICS_FLUSH_SECONDS or as soon as a full batch waits. Past
+    # ANALYTICS_QUEUE_MAX_PENDING queued events the endpoints answer 503 with Retry-After.
+    ANALYTICS_WRITE_BEHIND: bool = True
+    ANALYTICS_FLUSH_SECONDS: float = 1.0
+    ANALYTICS_FLUSH_BATCH: int = 1000
+    ANALYTICS_QUEUE_MAX_PENDING: int = 50000
+    ANALYTICS_MAX_EVENTS_PER_REQUEST: int = 500
+    ANALYTICS_RETRY_AFTER_SECONDS: int = 2
+
+    # Raw analytics events older than ANALYTICS_RETENTION_DAYS are removed (0 keeps them); the daily
+    # rollups keep their counts. On Postgres whole monthly partitions are dropped, and partitions are
+    # created ANALYTICS_PARTITIONS_AHEAD months in advance. SQLite keeps a single table and deletes
+    # expired rows ANALYTICS_RETENTION_DELETE_BATCH at a time.
+    ANALYTICS_RETENTION_DAYS: int = 400
+    ANALYTICS_RETENTION_INTERVAL_SECONDS: float = 3600.0
+    ANALYTICS_RETENTION_DELETE_BATCH: int = 10000
+    ANALYTICS_PARTITIONS_AHEAD: int = 2
+    # Event ids are assigned at insert but become visible at commit, so a lower id can show up after
+    # a higher one was read. In-memory event counters treat ids as final only once this long has
+    # passed since a refresh first read past them, and re-read newer events on every refresh. Must
+    # exceed the longest transaction that writes analytics events.
+    ANALYTICS_COMMIT_GRACE_SECONDS: float = 120.0
+    # Per-story heatmap counters kept in memory and topped up with newer events on each request
+    ANALYTICS_HEATMAP_CACHE_SIZE: int = 256
+    # Funnel/cohort engine: events held as NumPy columns, loaded ANALYTICS_ENGINE_CHUNK_SIZE rows at a
+    # time and topped up with newer events at most every ANALYTICS_ENGINE_REFRESH_SECONDS
+    ANALYTICS_ENGINE_CHUNK_SIZE: int = 50000
+    ANALYTICS_ENGINE_REFRESH_SECONDS: float = 30.0
+
+    # Data export: rows fetched per round trip from the (server-side) cursor
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Comma-separated emails of users allowed on the /admin endpoints
+    ADMIN_EMAILS: str = ""
     
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
+    # Authenticated principals (id, is_active, admin) cached per user id in process memory
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_USER_CACHE_TTL_SECONDS: float = 60.0
+    # Trust the active/admin claims signed into access tokens and skip the lookup entirely; a
+    # deactivated user then keeps access until their token expires
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+    # Password hashing runs in a dedicated pool of PASSWORD_HASH_WORKERS processes (0 runs it in the
+    # request threadpool). Past PASSWORD_HASH_MAX_PENDING running or queued hashes, register/login
+    # answer 503 with Retry-After. Pick PASSWORD_BCRYPT_ROUNDS with benchmarks/password_hashing.py;
+    # hashes made with another cost are replaced at the user's next login.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+    PASSWORD_BCRYPT_ROUNDS: int = 12
 
     # Back-compat envs already used in your project (optional)
     CHOREO_OPENAI_CONNECTION_OPENAI_API_KEY: Optional[str] = None
@@ -49,6 +158,11 @@ class Settings(BaseSettings):
     def parse_allowed_origins(cls, v: str) -> List[str]:
         return v.split(",") if v else []
 
+    @field_validator("ADMIN_EMAILS")
+    @classmethod
+    def parse_admin_emails(cls, v: str) -> List[str]:
+        return [email.strip().lower() for email in v.split(",") if email.strip()] if v else []
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,40 @@
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+# Bump when a cached response body changes shape so clients stop matching old tags
+ETAG_FORMAT_VERSION = "1"
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1("|".join([ETAG_FORMAT_VERSION, *map(str, parts)]).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes on both sides
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    # Private per-user data: browsers may keep it but must revalidate before reuse
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    Returns a 304 response if the client already holds `etag`, otherwise None.
+    """
+    if not etag_matches(request, etag):
+        return None
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
@@ -0,0 +1,32 @@
+from dataclasses import dataclass, replace
+from typing import Tuple
+
+
+@dataclass(frozen=True)
+class EventWatermark:
+    """
+    How far in-memory counters over analytics_events can treat event ids as final.
+
+    Ids are assigned at insert but become visible at commit, so reading `id > last seen` can skip
+    an event whose transaction committed late. Instead, every event id at or below `settled_id`
+    is final and counted once; everything above it is the tail, read again on every refresh and
+    never stored. An id becomes final ANALYTICS_COMMIT_GRACE_SECONDS after a refresh first read
+    past it: any transaction that had inserted a lower id by then has committed or rolled back.
+    """
+
+    settled_id: int = 0
+    # (monotonic time, highest id read then) for refreshes whose ids are not final yet
+    seen: Tuple[Tuple[float, int], ...] = ()
+
+    def settle(self, now: float, grace_seconds: float) -> "EventWatermark":
+        """The watermark moved past the ids read at least `grace_seconds` ago."""
+        settled_id = max([m for t, m in self.seen if t <= now - grace_seconds], default=self.settled_id)
+        if settled_id <= self.settled_id:
+            return self
+        return EventWatermark(settled_id, tuple((t, m) for t, m in self.seen if m > settled_id))
+
+    def observe(self, now: float, max_id: int) -> "EventWatermark":
+        """Records that a refresh at `now` read the tail up to `max_id`."""
+        if max_id <= self.settled_id or any(m >= max_id for _, m in self.seen):
+            return self
+        return replace(self, seen=self.seen + ((now, max_id),))
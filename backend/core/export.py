@@ -0,0 +1,145 @@
+import csv
+import io
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import select
+
+from core.config import settings
+from core.serialization import dumps
+from core.story_graph import get_story_graph
+from core.visited import visited_ids
+from db.database import SessionLocal
+from models.analytics_event import AnalyticsEvent
+from models.save_game import SaveGame
+
+EXPORT_FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+CHUNK_BYTES = 65536
+
+EVENT_COLUMNS = [
+    "id", "user_id", "story_id", "event_type", "is_winning_ending", "node_id", "next_node_id",
+    "payload", "created_at",
+]
+SAVE_COLUMNS = [
+    "id", "user_id", "story_id", "save_name", "current_node_id", "choices_made", "nodes_visited",
+    "play_time_minutes", "is_auto_save", "journal_through", "created_at", "updated_at",
+]
+
+
+def _day_bounds(start: Optional[date], end: Optional[date]):
+    """Inclusive UTC days as [start, end) datetimes."""
+    lower = datetime.combine(start, time.min, tzinfo=timezone.utc) if start else None
+    upper = datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc) if end else None
+    return lower, upper
+
+
+def _filtered(query, column, story_column, story_id, start, end):
+    lower, upper = _day_bounds(start, end)
+    if story_id is not None:
+        query = query.where(story_column == story_id)
+    if lower is not None:
+        query = query.where(column >= lower)
+    if upper is not None:
+        query = query.where(column < upper)
+    return query
+
+
+def iter_analytics_events(
+    story_id: Optional[int] = None, start: Optional[date] = None, end: Optional[date] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields analytics_events rows as dicts in id order, EXPORT_BATCH_SIZE rows per fetch.
+
+    Rows are plain column tuples read through a server-side cursor where the driver has one
+    (stream_results), so neither the ORM identity map nor the driver buffer the whole result.
+    The generator owns its session; it is closed when iteration ends or the generator is dropped.
+    """
+    query = _filtered(
+        select(*(getattr(AnalyticsEvent, c) for c in EVENT_COLUMNS)),
+        AnalyticsEvent.created_at, AnalyticsEvent.story_id, story_id, start, end,
+    ).order_by(AnalyticsEvent.id)
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        for row in result:
+            yield dict(row._mapping)
+    finally:
+        db.close()
+
+
+def iter_save_games(
+    story_id: Optional[int] = None, start: Optional[date] = None, end: Optional[date] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields save_games rows as stored (journal entries not yet compacted are not replayed), with
+    visited nodes decoded to ids. Filtered on updated_at. Streams like iter_analytics_events.
+    """
+    columns = [c for c in SAVE_COLUMNS if c != "nodes_visited"]
+    query = _filtered(
+        select(*(getattr(SaveGame, c) for c in columns), SaveGame.nodes_visited, SaveGame.visited_bitmap),
+        SaveGame.updated_at, SaveGame.story_id, story_id, start, end,
+    ).order_by(SaveGame.id)
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        for row in result:
+            item = {c: getattr(row, c) for c in columns}
+            item["nodes_visited"] = visited_ids(get_story_graph(db, row.story_id), row)
+            yield {c: item[c] for c in SAVE_COLUMNS}
+    finally:
+        db.close()
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+def to_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    """One JSON object per line, handed out in chunks of about CHUNK_BYTES."""
+    chunk = bytearray()
+    for row in rows:
+        chunk += dumps(row)
+        chunk += b"\n"
+        if len(chunk) >= CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+def to_csv(rows: Iterator[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    """CSV with a header line, in chunks like to_ndjson; JSON columns are written as JSON text."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_value(row[c]) for c in columns])
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+EXPORTS = {
+    "analytics-events": (iter_analytics_events, EVENT_COLUMNS),
+    "save-games": (iter_save_games, SAVE_COLUMNS),
+}
+
+
+def export_stream(
+    kind: str,
+    fmt: str,
+    story_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> Iterator[bytes]:
+    """Encoded chunks of the `kind` export ("analytics-events" or "save-games") in `fmt`."""
+    rows_for, columns = EXPORTS[kind]
+    rows = rows_for(story_id=story_id, start=start, end=end)
+    return to_csv(rows, columns) if fmt == "csv" else to_ndjson(rows)
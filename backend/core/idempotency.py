@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from fastapi import Header, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.idempotency_key import IdempotencyKey
+
+logger = logging.getLogger("app.idempotency")
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def get_idempotency_key(idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)) -> Optional[str]:
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 255:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Idempotency-Key header")
+    return idempotency_key
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands timestamps back naive
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+def _request_hash(payload: Any) -> str:
+    encoded = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def purge_expired_keys(db: Session) -> int:
+    deleted = (
+        db.query(IdempotencyKey)
+        .filter(IdempotencyKey.expires_at < _utcnow())
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+class IdempotentRequest:
+    """
+    Guards one write endpoint call behind an optional Idempotency-Key.
+
+        with IdempotentRequest(db, user.id, "POST /saves/", key, payload) as idem:
+            if idem.replay is not None:
+                return idem.replay
+            ...
+            return idem.save(response_body)
+
+    The first request reserves the key before doing any work; repeats replay the stored response,
+    get 409 while the first is still running and 422 if the payload differs. If the guarded block
+    raises, the reservation is released so the client can retry. A reservation that was never
+    released (the process died mid-request) is a lease: after IDEMPOTENCY_RESERVATION_SECONDS a
+    retry with the same payload takes it over instead of getting 409 until the key expires.
+    """
+
+    def __init__(self, db: Session, user_id: int, scope: str, key: Optional[str], payload: Any):
+        self.db = db
+        self.user_id = user_id
+        self.scope = scope
+        self.key = key
+        self.request_hash = _request_hash(payload) if key else None
+        self.replay: Optional[JSONResponse] = None
+        self._record: Optional[IdempotencyKey] = None
+        self._reserved_at: Optional[datetime] = None
+
+    def _find(self) -> Optional[IdempotencyKey]:
+        return self.db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == self.user_id,
+            IdempotencyKey.scope == self.scope,
+            IdempotencyKey.key == self.key,
+        ).first()
+
+    def _check_existing(self, record: IdempotencyKey) -> None:
+        if record.request_hash != self.request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request",
+            )
+        if record.status_code is None:
+            if self._take_over(record):
+                return
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress",
+            )
+        self.replay = JSONResponse(
+            content=record.response_body,
+            status_code=record.status_code,
+            headers={REPLAY_HEADER: "true"},
+        )
+
+    def _owned(self):
+        return (
+            IdempotencyKey.id == self._record.id,
+            IdempotencyKey.status_code.is_(None),
+            IdempotencyKey.reserved_at == self._reserved_at,
+        )
+
+    def _take_over(self, record: IdempotencyKey) -> bool:
+        """
+        Claims an abandoned reservation. Compare-and-set on reserved_at, so of several retries
+        racing for the same stale key exactly one wins; the rest get 409.
+        """
+        now = _utcnow()
+        stale_before = now - timedelta(seconds=settings.IDEMPOTENCY_RESERVATION_SECONDS)
+        result = self.db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.id == record.id,
+                IdempotencyKey.status_code.is_(None),
+                or_(IdempotencyKey.reserved_at.is_(None), IdempotencyKey.reserved_at < stale_before),
+            )
+            .values(reserved_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        if result.rowcount != 1:
+            return False
+        logger.info("Took over abandoned Idempotency-Key reservation %s for %s", record.id, self.scope)
+        self.db.refresh(record)
+        self._record = record
+        self._reserved_at = _aware(record.reserved_at)
+        return True
+
+    def __enter__(self) -> "IdempotentRequest":
+        if not self.key:
+            return self
+
+        existing = self._find()
+        if existing is not None:
+            if _aware(existing.expires_at) >= _utcnow():
+                self._check_existing(existing)
+                return self
+            self.db.delete(existing)
+            self.db.commit()
+
+        now = _utcnow()
+        record = IdempotencyKey(
+            user_id=self.user_id,
+            scope=self.scope,
+            key=self.key,
+            request_hash=self.request_hash,
+            reserved_at=now,
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+        )
+        self.db.add(record)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # A concurrent retry reserved the key first
+            self.db.rollback()
+            existing = self._find()
+            if existing is None:
+                raise
+            self._check_existing(existing)
+            return self
+
+        self._record = record
+        self._reserved_at = now
+        return self
+
+    def save(self, body: Any, status_code: int = 200) -> Any:
+        """
+        Stores the response for replay and returns `body` unchanged.
+        """
+        if self._record is not None:
+            # Only while the reservation is still ours; a retry that took it over stores its own
+            self.db.execute(
+                update(IdempotencyKey)
+                .where(*self._owned())
+                .values(status_code=status_code, response_body=jsonable_encoder(body))
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            self._record = None
+        return body
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self._record is not None:
+            # The block failed (or never saved): release the key so a retry does the work
+            try:
+                self.db.rollback()
+                self.db.query(IdempotencyKey).filter(*self._owned()).delete(synchronize_session=False)
+                self.db.commit()
+            except Exception as e:
+                # The lease still runs out, so a retry can take the key over later
+                self.db.rollback()
+                logger.warning("Releasing Idempotency-Key reservation failed: %s", e)
+            self._record = None
+        return False
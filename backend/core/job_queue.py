@@ -0,0 +1,248 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.job_status import job_snapshot, job_status
+from core.story_generator import StoryGenerator
+from db.database import SessionLocal
+from models.job import StoryJob
+
+logger = logging.getLogger("app.jobs")
+
+PENDING = "pending"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Claim order: interactive requests are always served before bulk seeding and cache prewarming
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+PRIORITY_PREWARM = 20
+PRIORITY_TIERS = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "bulk": PRIORITY_BULK,
+    "prewarm": PRIORITY_PREWARM,
+}
+
+
+def make_worker_id(prefix: str = "worker") -> str:
+    return f"{prefix}-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _claimable(now: datetime):
+    return or_(
+        StoryJob.status == PENDING,
+        and_(StoryJob.status == PROCESSING, StoryJob.lease_expires_at < now),
+    )
+
+
+def _fail_exhausted_jobs(db: Session, now: datetime) -> None:
+    """
+    Jobs whose lease expired after JOB_MAX_ATTEMPTS claims keep killing their workers; stop retrying them.
+    """
+    db.execute(
+        update(StoryJob)
+        .where(
+            StoryJob.status == PROCESSING,
+            StoryJob.lease_expires_at < now,
+            StoryJob.attempts >= settings.JOB_MAX_ATTEMPTS,
+        )
+        .values(status=FAILED, error="Job lease expired too many times", completed_at=now, lease_owner=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _lease_values(worker_id: str, now: datetime) -> dict:
+    return {
+        "status": PROCESSING,
+        "lease_owner": worker_id,
+        "lease_expires_at": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        "heartbeat_at": now,
+        "started_at": now,
+        "attempts": StoryJob.attempts + 1,
+    }
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[int]:
+    """
+    Leases the highest-priority, oldest claimable job to `worker_id` and returns its primary key,
+    or None if the queue is empty.
+
+    Postgres uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never block on each other.
+    Other backends (SQLite) fall back to a compare-and-set UPDATE guarded by the same claimable predicate.
+    """
+    now = _utcnow()
+    _fail_exhausted_jobs(db, now)
+
+    if db.get_bind().dialect.name == "postgresql":
+        row = (
+            db.query(StoryJob.id)
+            .filter(_claimable(now))
+            .order_by(StoryJob.priority, StoryJob.id)
+            .with_for_update(skip_locked=True)
+            .limit(1)
+            .first()
+        )
+        if row is None:
+            db.commit()
+            return None
+        db.execute(
+            update(StoryJob)
+            .where(StoryJob.id == row.id)
+            .values(**_lease_values(worker_id, now))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return row.id
+
+    candidates = (
+        db.query(StoryJob.id)
+        .filter(_claimable(now))
+        .order_by(StoryJob.priority, StoryJob.id)
+        .limit(5)
+        .all()
+    )
+    for row in candidates:
+        result = db.execute(
+            update(StoryJob)
+            .where(StoryJob.id == row.id, _claimable(now))
+            .values(**_lease_values(worker_id, now))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            db.commit()
+            return row.id
+    db.commit()
+    return None
+
+
+def count_active_jobs(db: Session) -> int:
+    return db.query(func.count(StoryJob.id)).filter(StoryJob.status.in_([PENDING, PROCESSING])).scalar() or 0
+
+
+def renew_lease(db: Session, job_pk: int, worker_id: str) -> bool:
+    now = _utcnow()
+    result = db.execute(
+        update(StoryJob)
+        .where(StoryJob.id == job_pk, StoryJob.lease_owner == worker_id, StoryJob.status == PROCESSING)
+        .values(lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS), heartbeat_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def finish_job(
+    db: Session,
+    job_pk: int,
+    worker_id: str,
+    status: str,
+    story_id: Optional[int] = None,
+    error: Optional[str] = None,
+) -> bool:
+    """
+    Records the outcome only if `worker_id` still holds the lease; returns False if another worker took over.
+    """
+    result = db.execute(
+        update(StoryJob)
+        .where(StoryJob.id == job_pk, StoryJob.lease_owner == worker_id, StoryJob.status == PROCESSING)
+        .values(
+            status=status,
+            story_id=story_id,
+            error=error,
+            completed_at=_utcnow(),
+            lease_owner=None,
+            lease_expires_at=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+class _LeaseHeartbeat(threading.Thread):
+    """Keeps a job's lease alive from a separate session while generation blocks the worker thread."""
+
+    def __init__(self, job_pk: int, worker_id: str):
+        super().__init__(name=f"heartbeat-{job_pk}", daemon=True)
+        self.job_pk = job_pk
+        self.worker_id = worker_id
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(settings.JOB_HEARTBEAT_SECONDS):
+            db = SessionLocal()
+            try:
+                if not renew_lease(db, self.job_pk, self.worker_id):
+                    logger.warning("Lost lease on job pk=%s (worker=%s)", self.job_pk, self.worker_id)
+                    return
+            except Exception as e:
+                logger.warning("Heartbeat failed for job pk=%s: %s", self.job_pk, e)
+            finally:
+                db.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def generate_story_task(job_pk: int, worker_id: str) -> None:
+    db = SessionLocal()
+    heartbeat = _LeaseHeartbeat(job_pk, worker_id)
+    heartbeat.start()
+
+    try:
+        job = db.query(StoryJob).filter(StoryJob.id == job_pk).first()
+        if not job:
+            return
+
+        # Stage updates reuse this snapshot so progress reporting never touches the database
+        running = job_snapshot(job)
+        job_status.publish(running)
+
+        def on_progress(stage: str) -> None:
+            job_status.publish({**running, "stage": stage})
+
+        try:
+            story = StoryGenerator.generate_story(
+                db, job.session_id, job.theme, job.user_id, on_progress=on_progress
+            )
+            recorded = finish_job(db, job_pk, worker_id, COMPLETED, story_id=story.id)
+        except Exception as e:
+            recorded = finish_job(db, job_pk, worker_id, FAILED, error=str(e))
+
+        if not recorded:
+            logger.warning("Job %s finished after its lease was taken over; result discarded", job.job_id)
+        job_status.publish(job_snapshot(job))
+    finally:
+        heartbeat.stop()
+        db.close()
+
+
+def work_once(worker_id: str) -> bool:
+    """
+    Claims and runs a single job. Returns False when there was nothing to do.
+    """
+    db = SessionLocal()
+    try:
+        job_pk = claim_next_job(db, worker_id)
+    finally:
+        db.close()
+
+    if job_pk is None:
+        return False
+
+    logger.info("Worker %s claimed job pk=%s", worker_id, job_pk)
+    generate_story_task(job_pk, worker_id)
+    return True
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+
+from core.config import settings
+from db.database import SessionLocal, engine
+from models.job import StoryJob
+
+logger = logging.getLogger("app.jobs")
+
+TERMINAL_STATUSES = ("completed", "failed")
+PG_CHANNEL = "story_job_status"
+
+# Order a job moves through; a re-claimed job starts over at "processing" with one more attempt
+STATUS_RANKS = {"pending": 0, "processing": 1, "completed": 2, "failed": 2}
+STAGES = (None, "generating_text", "validating", "generating_images")
+
+
+def job_snapshot(job, stage: Optional[str] = None) -> Dict[str, Any]:
+    return jsonable_encoder({
+        "job_id": job.job_id,
+        "status": job.status,
+        "stage": stage,
+        "story_id": job.story_id,
+        "error": job.error,
+        "attempts": job.attempts or 0,
+        "created_at": job.created_at,
+        "completed_at": job.completed_at,
+    })
+
+
+def snapshot_version(snapshot: Dict[str, Any]) -> int:
+    """
+    Version of a job state, from the persisted claim count and status plus the in-memory stage.
+    Every replica computes the same number for the same state and it only grows as the job moves
+    on, so a client's `since` stays meaningful whichever replica answers next.
+    """
+    stage = STAGES.index(snapshot.get("stage")) if snapshot.get("stage") in STAGES else 0
+    step = (snapshot.get("attempts") or 0) * 3 + STATUS_RANKS.get(snapshot["status"], 0)
+    return 1 + step * len(STAGES) + stage
+
+
+class JobStatusBroadcaster:
+    """
+    Latest status per job plus asyncio subscribers waiting for the next change.
+
+    publish() may be called from any thread (worker threads, the Postgres listener, the database
+    poller); subscribers are woken on their own event loop. A snapshot whose version (see
+    snapshot_version) isn't newer than the one held is ignored, so late or partial reports (a row
+    read without the stage) never move a job backwards.
+    """
+
+    def __init__(self, max_jobs: int = 10000):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._latest: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._notifier: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    def set_notifier(self, notifier: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        self._notifier = notifier
+
+    def latest(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._latest.get(job_id)
+
+    def publish(self, snapshot: Dict[str, Any], propagate: bool = True) -> Dict[str, Any]:
+        job_id = snapshot["job_id"]
+        with self._lock:
+            previous = self._latest.get(job_id)
+            snapshot = {**snapshot, "version": snapshot_version(snapshot)}
+            if previous is not None and previous["version"] >= snapshot["version"]:
+                return previous
+            self._latest[job_id] = snapshot
+            self._latest.move_to_end(job_id)
+            while len(self._latest) > self.max_jobs:
+                self._latest.popitem(last=False)
+            subscribers = list(self._subscribers.get(job_id, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, snapshot)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                pass
+
+        if propagate and self._notifier is not None:
+            try:
+                self._notifier(snapshot)
+            except Exception as e:
+                logger.warning("Job status notify failed for %s: %s", job_id, e)
+        return snapshot
+
+    def watched_job_ids(self) -> List[str]:
+        """Unfinished jobs somebody is currently waiting on."""
+        with self._lock:
+            return [
+                job_id for job_id in self._subscribers
+                if (self._latest.get(job_id) or {}).get("status") not in TERMINAL_STATUSES
+            ]
+
+    def _subscribe(self, job_id: str) -> Tuple[asyncio.AbstractEventLoop, asyncio.Queue]:
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add(entry)
+        return entry
+
+    def _unsubscribe(self, job_id: str, entry) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(entry)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    async def wait_for_update(self, job_id: str, after_version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Returns the first snapshot newer than `after_version`, or the current one once `timeout` elapses.
+        Waiting costs no queries; changes arrive through publish().
+        """
+        entry = self._subscribe(job_id)
+        loop, queue = entry
+        try:
+            current = self.latest(job_id)
+            if current is not None and current["version"] > after_version:
+                return current
+
+            deadline = loop.time() + timeout
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return self.latest(job_id)
+                try:
+                    snapshot = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    return self.latest(job_id)
+                if snapshot["version"] > after_version:
+                    return snapshot
+        finally:
+            self._unsubscribe(job_id, entry)
+
+
+job_status = JobStatusBroadcaster()
+
+
+# ---------- Optional cross-process delivery via Postgres LISTEN/NOTIFY ----------
+
+def _pg_notify(snapshot: Dict[str, Any]) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": PG_CHANNEL, "payload": json.dumps(snapshot)},
+        )
+
+
+def _pg_listen(stop_event: threading.Event) -> None:
+    while not stop_event.is_set():
+        raw = None
+        try:
+            raw = engine.raw_connection()
+            conn = raw.driver_connection
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {PG_CHANNEL}")
+            logger.info("Listening for job status notifications on %s", PG_CHANNEL)
+            while not stop_event.is_set():
+                if select.select([conn], [], [], 5.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    snapshot = json.loads(notify.payload)
+                    snapshot.pop("version", None)
+                    job_status.publish(snapshot, propagate=False)
+        except Exception as e:
+            logger.warning("Job status listener error: %s", e)
+            stop_event.wait(5.0)
+        finally:
+            if raw is not None:
+                raw.close()
+
+
+def cross_process_enabled() -> bool:
+    return settings.JOB_STATUS_PG_NOTIFY and engine.dialect.name == "postgresql"
+
+
+def start_status_listener() -> Optional[threading.Event]:
+    """
+    Starts the LISTEN thread in the API process. Returns an event that stops it, or None if disabled.
+    """
+    if not cross_process_enabled():
+        return None
+    stop_event = threading.Event()
+    threading.Thread(target=_pg_listen, args=(stop_event,), name="job-status-listener", daemon=True).start()
+    return stop_event
+
+
+if cross_process_enabled():
+    job_status.set_notifier(_pg_notify)
+
+
+# ---------- Database fallback when nothing pushes status changes ----------
+
+def db_fallback_needed() -> bool:
+    """
+    Only when workers run in other processes and there is no LISTEN/NOTIFY to hear from them.
+    An embedded worker publishes into this process directly.
+    """
+    return (
+        settings.JOB_STATUS_DB_FALLBACK_SECONDS > 0
+        and not cross_process_enabled()
+        and not settings.RUN_EMBEDDED_WORKER
+    )
+
+
+def poll_watched_jobs() -> int:
+    """
+    Re-reads every unfinished job somebody is waiting on, in one query for all of them, and
+    publishes what changed. Returns how many jobs were read.
+    """
+    job_ids = job_status.watched_job_ids()
+    if not job_ids:
+        return 0
+    db = SessionLocal()
+    try:
+        jobs = db.query(StoryJob).filter(StoryJob.job_id.in_(job_ids)).all()
+        for job in jobs:
+            job_status.publish(job_snapshot(job), propagate=False)
+        return len(jobs)
+    finally:
+        db.close()
+
+
+def _run_status_poller(stop_event: threading.Event, interval: float) -> None:
+    while not stop_event.wait(interval):
+        try:
+            poll_watched_jobs()
+        except Exception as e:
+            logger.warning("Job status poll failed: %s", e)
+
+
+def start_status_poller() -> Optional[threading.Event]:
+    """
+    Starts the shared database poll for waiters. Returns an event that stops it, or None when
+    status changes are pushed (see db_fallback_needed).
+    """
+    if not db_fallback_needed():
+        return None
+    stop_event = threading.Event()
+    threading.Thread(
+        target=_run_status_poller,
+        args=(stop_event, settings.JOB_STATUS_DB_FALLBACK_SECONDS),
+        name="job-status-poller",
+        daemon=True,
+    ).start()
+    return stop_event
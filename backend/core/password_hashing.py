@@ -0,0 +1,145 @@
+import asyncio
+import math
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+
+
+@lru_cache(maxsize=None)
+def make_context(rounds: int) -> CryptContext:
+    """
+    bcrypt at exactly `rounds`: new hashes use it, and needs_update() flags hashes made with any
+    other cost so they get replaced at the next successful login.
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# Run in the pool's worker processes; module-level so they can be pickled
+def hash_password(password: str, rounds: int) -> str:
+    return make_context(rounds).hash(password)
+
+
+def check_password(password: str, hashed: str) -> bool:
+    return make_context(settings.PASSWORD_BCRYPT_ROUNDS).verify(password, hashed)
+
+
+class PasswordHasher:
+    """
+    bcrypt off the event loop and off the shared request threadpool.
+
+    Work runs in a dedicated process pool of `workers` processes (inline in the threadpool when
+    workers is 0). At most `max_pending` calls may be running or queued; past that, callers get
+    a 503 with Retry-After instead of lining up behind a burst of logins.
+    """
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._latencies_ms: "deque[float]" = deque(maxlen=1000)
+        self._dummy_hash: Optional[str] = None
+
+    def _pool(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                # Not fork: by the first login the API runs background threads, and a forked child
+                # can inherit a lock one of them held and never get it back
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many sign-ins in progress, try again shortly",
+                    headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+                )
+            self._pending += 1
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._latencies_ms.append((time.perf_counter() - started) * 1000)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed: Optional[str]) -> bool:
+        """
+        Checks `password` against `hashed`. With no hash (unknown account) a dummy hash is checked
+        instead, so the response takes as long as a real failed login.
+        """
+        if hashed is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await self.hash("not-a-real-password")
+            await self._run(check_password, password, self._dummy_hash)
+            return False
+        return await self._run(check_password, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True when `hashed` was made with a different bcrypt cost. Doesn't hash anything."""
+        return make_context(self.rounds).needs_update(hashed)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = self._pending
+            latencies = sorted(self._latencies_ms)
+            completed, rejected = self._completed, self._rejected
+
+        def percentile(p: int) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, math.ceil(p / 100 * len(latencies)) - 1)], 1)
+
+        return {
+            "workers": self.workers,
+            "bcrypt_rounds": self.rounds,
+            "in_flight": min(pending, self.workers) if self.workers > 0 else pending,
+            "queue_depth": max(0, pending - self.workers) if self.workers > 0 else 0,
+            "max_pending": self.max_pending,
+            "completed": completed,
+            "rejected": rejected,
+            "latency_ms_p50": percentile(50),
+            "latency_ms_p95": percentile(95),
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING, settings.PASSWORD_BCRYPT_ROUNDS
+)
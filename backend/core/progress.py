@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from core.story_graph import get_story_graph
+from core.visited import mask_to_bytes, visited_mask
+from models.save_game import UserStoryProgress
+
+
+def update_user_progress(db: Session, user_id: int, story_id: int, nodes_visited: List[int], commit: bool = True):
+    """
+    Merges a save's visited nodes into the user's progress for the story.
+
+    Progress keeps the union of everything visited across saves as a bitmap, so the totals are
+    popcounts: nodes visited, completion against the story's node count, and the endings reached.
+    """
+    progress = db.query(UserStoryProgress).filter(
+        UserStoryProgress.user_id == user_id,
+        UserStoryProgress.story_id == story_id
+    ).first()
+
+    if not progress:
+        progress = UserStoryProgress(
+            user_id=user_id,
+            story_id=story_id,
+            total_nodes_visited=len(nodes_visited),
+            last_played_at=datetime.utcnow()
+        )
+        db.add(progress)
+    else:
+        progress.last_played_at = datetime.utcnow()
+
+    graph = get_story_graph(db, story_id)
+    if graph is None or graph.node_count == 0:
+        progress.total_nodes_visited = max(progress.total_nodes_visited or 0, len(nodes_visited))
+    else:
+        union = visited_mask(graph, progress.visited_bitmap) | graph.to_mask(nodes_visited)
+        progress.visited_bitmap = mask_to_bytes(union)
+        # Rows from before the bitmap only know their old count
+        progress.total_nodes_visited = max(progress.total_nodes_visited or 0, union.bit_count())
+        progress.completion_percentage = min(100, union.bit_count() * 100 // graph.node_count)
+        progress.endings_reached = graph.from_mask(union & graph.ending_mask)
+
+    if commit:
+        db.commit()
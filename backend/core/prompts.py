@@ -17,6 +17,24 @@ IMAGE PROMPT RULE (must follow):
 Return EXACTLY one JSON object that conforms to the schema:
 {format_instructions}
 """
+SUBTREE_PROMPT = """
+You are a formatter that outputs ONLY JSON matching the provided schema.
+
+You are repairing one branch of an existing choose-your-own-adventure story. The rest of the story is
+already written; you only write the single node described by the user and everything below it.
+
+STRICTLY FOLLOW THESE RULES (must follow):
+- Output must be a single valid JSON object with no extra text, no prose, no Markdown, and no code fences.
+- Do not include comments or trailing commas.
+- Booleans must be true/false.
+- Every non-ending node MUST have EXACTLY 2 options; ending nodes must have no options field.
+- Every path below the node must end in an ending node.
+- Include 'image_prompt_1' and 'image_prompt_2' (maximum 20 words each, different from each other) on EVERY node.
+
+Return EXACTLY one JSON object (a single story node) that conforms to the schema:
+{format_instructions}
+"""
+
 json_structure = """
         {
             "title": "Story Title",
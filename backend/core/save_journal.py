@@ -0,0 +1,226 @@
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.story_graph import StoryGraphIndex, get_story_graph, get_story_graphs
+from core.visited import visited_columns, visited_ids
+from db.database import SessionLocal
+from models.save_game import SaveGame, SaveJournalEntry
+
+logger = logging.getLogger("app.saves")
+
+
+@dataclass
+class SaveState:
+    """A save's game state with its pending journal entries replayed on top of the stored row."""
+
+    current_node_id: int
+    choices_made: List[Dict[str, Any]]
+    nodes_visited: List[int]
+    play_time_minutes: int
+    journal_through: int
+    pending_entries: int = 0
+
+
+def append_choice(
+    db: Session,
+    save_id: int,
+    node_id: int,
+    option_text: str,
+    next_node_id: int,
+    play_time_minutes: Optional[int] = None,
+) -> SaveJournalEntry:
+    """
+    Adds one choice as a single small insert; the save row itself is not touched. Committing is
+    left to the caller.
+    """
+    entry = SaveJournalEntry(
+        save_id=save_id,
+        node_id=node_id,
+        option_text=option_text,
+        next_node_id=next_node_id,
+        play_time_minutes=play_time_minutes,
+    )
+    db.add(entry)
+    db.flush()
+    return entry
+
+
+def replay(save: Any, entries: Iterable[SaveJournalEntry], graph: Optional[StoryGraphIndex]) -> SaveState:
+    """
+    Applies `entries` (oldest first) to `save`, which may be a SaveGame or a row with the same columns.
+    """
+    state = SaveState(
+        current_node_id=save.current_node_id,
+        choices_made=list(save.choices_made or []),
+        nodes_visited=visited_ids(graph, save),
+        play_time_minutes=save.play_time_minutes or 0,
+        journal_through=save.journal_through or 0,
+    )
+    visited = set(state.nodes_visited)
+    for entry in entries:
+        state.choices_made.append({
+            "node_id": entry.node_id,
+            "option_text": entry.option_text,
+            "next_node_id": entry.next_node_id,
+            "timestamp": entry.created_at.isoformat() if entry.created_at else None,
+        })
+        if entry.next_node_id not in visited:
+            visited.add(entry.next_node_id)
+            state.nodes_visited.append(entry.next_node_id)
+        state.current_node_id = entry.next_node_id
+        if entry.play_time_minutes is not None:
+            state.play_time_minutes = entry.play_time_minutes
+        state.journal_through = entry.id
+        state.pending_entries += 1
+    return state
+
+
+def load_save_states(db: Session, saves: Iterable[Any]) -> Dict[int, SaveState]:
+    """
+    Materializes many saves with one journal query. Keyed by save id.
+    """
+    saves = list(saves)
+    if not saves:
+        return {}
+    # journal_through differs per save, so filter on the smallest and drop the rest in Python
+    entries = (
+        db.query(SaveJournalEntry)
+        .filter(
+            SaveJournalEntry.save_id.in_([save.id for save in saves]),
+            SaveJournalEntry.id > min(save.journal_through or 0 for save in saves),
+        )
+        .order_by(SaveJournalEntry.id)
+        .all()
+    )
+    by_save: Dict[int, List[SaveJournalEntry]] = {}
+    for entry in entries:
+        by_save.setdefault(entry.save_id, []).append(entry)
+    graphs = get_story_graphs(db, {save.story_id for save in saves})
+    return {
+        save.id: replay(
+            save,
+            [e for e in by_save.get(save.id, ()) if e.id > (save.journal_through or 0)],
+            graphs.get(save.story_id),
+        )
+        for save in saves
+    }
+
+
+def load_save_state(db: Session, save: Any) -> SaveState:
+    return load_save_states(db, [save])[save.id]
+
+
+def compact_save(db: Session, save_id: int) -> int:
+    """
+    Folds the save's pending entries into the save row and deletes them. Returns how many were folded.
+
+    The row update is a compare-and-set on journal_through, so two compactors (or a compactor and a
+    PUT) racing on the same save can't fold the same entries twice.
+    """
+    save = db.query(SaveGame).filter(SaveGame.id == save_id).first()
+    if save is None:
+        return 0
+    previous = save.journal_through or 0
+    state = load_save_state(db, save)
+    if state.pending_entries == 0:
+        db.commit()
+        return 0
+
+    result = db.execute(
+        update(SaveGame)
+        .where(SaveGame.id == save_id, func.coalesce(SaveGame.journal_through, 0) == previous)
+        .values(
+            current_node_id=state.current_node_id,
+            choices_made=state.choices_made,
+            play_time_minutes=state.play_time_minutes,
+            journal_through=state.journal_through,
+            **visited_columns(get_story_graph(db, save.story_id), state.nodes_visited),
+            # Compaction doesn't change what the save reads as; keep onupdate from bumping it
+            updated_at=SaveGame.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        return 0
+    db.execute(
+        delete(SaveJournalEntry)
+        .where(SaveJournalEntry.save_id == save_id, SaveJournalEntry.id <= state.journal_through)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return state.pending_entries
+
+
+def discard_journal(db: Session, save_id: int) -> None:
+    """
+    Deletes every journal entry of a save that is about to be deleted; committing is left to the caller.
+    """
+    db.execute(
+        delete(SaveJournalEntry)
+        .where(SaveJournalEntry.save_id == save_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def compact_journals(db: Session) -> int:
+    """
+    One compactor pass over saves with enough pending entries or with entries waiting too long.
+    Returns the number of entries folded.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.SAVE_JOURNAL_COMPACT_MAX_AGE_SECONDS)
+    save_ids = [
+        row.save_id
+        for row in db.query(SaveJournalEntry.save_id)
+        .group_by(SaveJournalEntry.save_id)
+        .having(or_(
+            func.count(SaveJournalEntry.id) >= settings.SAVE_JOURNAL_COMPACT_MIN_ENTRIES,
+            func.min(SaveJournalEntry.created_at) < cutoff,
+        ))
+        .limit(settings.SAVE_JOURNAL_COMPACT_BATCH)
+        .all()
+    ]
+    db.commit()
+
+    folded = 0
+    for save_id in save_ids:
+        try:
+            folded += compact_save(db, save_id)
+        except Exception as e:
+            db.rollback()
+            logger.warning("Compacting journal of save %d failed: %s", save_id, e)
+    return folded
+
+
+def _run_compactor(stop_event: threading.Event, interval: float) -> None:
+    while not stop_event.wait(interval):
+        db = SessionLocal()
+        try:
+            folded = compact_journals(db)
+            if folded:
+                logger.info("Compacted %d save journal entries", folded)
+        except Exception as e:
+            logger.warning("Save journal compaction failed: %s", e)
+        finally:
+            db.close()
+
+
+def start_journal_compactor() -> Optional[threading.Event]:
+    """
+    Starts the background compactor thread. Returns an event that stops it, or None if disabled.
+    """
+    interval = settings.SAVE_JOURNAL_COMPACT_INTERVAL_SECONDS
+    if interval <= 0:
+        return None
+    stop_event = threading.Event()
+    threading.Thread(
+        target=_run_compactor, args=(stop_event, interval), name="save-journal-compactor", daemon=True
+    ).start()
+    return stop_event
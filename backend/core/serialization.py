@@ -0,0 +1,55 @@
+from typing import Any, Optional, Type
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from core.config import settings
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    # OPT_NON_STR_KEYS: node maps are keyed by int ids, same output as the stdlib encoder
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson-backed JSON response; understands pydantic models, datetimes and int dict keys."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_response(
+    content: Any,
+    response: Optional[Response] = None,
+    status_code: int = 200,
+    model: Optional[Type[BaseModel]] = None,
+) -> Any:
+    """
+    Returns `content` pre-encoded so FastAPI skips its response_model validation pass.
+
+    Only for objects the endpoint built itself (already-validated schema instances or plain dicts);
+    response_model stays on the route for the OpenAPI docs. A dict that may carry more than the
+    schema (an internal snapshot) needs `model`, the route's response_model: it is validated and
+    dumped through it first so only the schema's fields go out. Headers set on the injected
+    `response` (ETag, cookies) are carried over. With FAST_JSON_RESPONSES off, `content` is
+    returned untouched and goes through FastAPI's normal validation.
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return content
+    if model is not None:
+        content = model.model_validate(content).model_dump(mode="json")
+
+    fast = FastJSONResponse(content=content, status_code=status_code)
+    if response is not None:
+        for name, value in response.raw_headers:
+            if name.lower() != b"content-length":
+                fast.raw_headers.append((name, value))
+    return fast
@@ -0,0 +1,94 @@
+import logging
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, undefer
+
+from core.cache import LRUCache
+from core.config import settings
+from core.story_graph import store_graph_index, store_story_columns
+from models.story import Story, StoryNode
+from schemas.story import CompleteStoryNodeResponse, CompleteStoryResponse
+
+logger = logging.getLogger("app.story")
+
+# story_id -> serialized CompleteStoryResponse; stories never change after generation
+_tree_cache = LRUCache(settings.STORY_TREE_CACHE_SIZE)
+
+
+def build_complete_story_tree(
+    db: Session, story: Story, nodes: Optional[List[StoryNode]] = None
+) -> CompleteStoryResponse:
+    if nodes is None:
+        nodes = db.query(StoryNode).filter(StoryNode.story_id == story.id).all()
+
+    node_dict = {}
+    for node in nodes:
+        node_response = CompleteStoryNodeResponse(
+            id=node.id,
+            content=node.content,
+            is_ending=node.is_ending,
+            is_winning_ending=node.is_winning_ending,
+            options=node.options
+        )
+        node_dict[node.id] = node_response
+
+    root_node = next((node for node in nodes if node.is_root), None)
+    if not root_node:
+        raise HTTPException(status_code=500, detail="Story root node not found")
+
+    return CompleteStoryResponse(
+        id=story.id,
+        title=story.title,
+        session_id=story.session_id,
+        created_at=story.created_at,
+        root_node=node_dict[root_node.id],
+        all_nodes=node_dict
+    )
+
+
+def precompute_story_tree(db: Session, story: Story, commit: bool = True) -> bytes:
+    """
+    Serializes the complete tree and builds the graph index once, storing both on the story row.
+    Call after the story's nodes are committed so created_at is populated.
+    """
+    nodes = db.query(StoryNode).filter(StoryNode.story_id == story.id).all()
+    store_graph_index(story, nodes)
+    payload = build_complete_story_tree(db, story, nodes).model_dump_json().encode()
+    story.complete_tree_json = payload.decode()
+    if commit:
+        db.commit()
+    _tree_cache.set(story.id, payload)
+    return payload
+
+
+def get_story_tree_json(db: Session, story_id: int) -> Optional[bytes]:
+    """
+    Returns the serialized CompleteStoryResponse for `story_id`, or None if the story does not exist.
+
+    Lookup order: in-process LRU, the stored column, then a one-off build for stories generated
+    before the column existed.
+    """
+    payload = _tree_cache.get(story_id)
+    if payload is not None:
+        return payload
+
+    story = (
+        db.query(Story)
+        .options(undefer(Story.complete_tree_json))
+        .filter(Story.id == story_id)
+        .first()
+    )
+    if not story:
+        return None
+
+    if story.complete_tree_json:
+        payload = story.complete_tree_json.encode()
+        _tree_cache.set(story_id, payload)
+        return payload
+
+    logger.info("Backfilling serialized tree for story %d", story_id)
+    payload = build_complete_story_tree(db, story).model_dump_json().encode()
+    _tree_cache.set(story_id, payload)
+    store_story_columns(story_id, {Story.complete_tree_json: payload.decode()})
+    return payload
@@ -1,7 +1,7 @@
 import json
 import logging
 import re
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional, Union
 import requests 
 import hashlib 
 import os
@@ -12,10 +12,15 @@ from sqlalchemy.orm import Session
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 
-from core.prompts import STORY_PROMPT
+from core.prompts import STORY_PROMPT, SUBTREE_PROMPT
 from models.story import Story, StoryNode
 from core.models import StoryLLMResponse, StoryNodeLLM
 from core.euriai_client import EuriaiChat
+from core.story_cache import precompute_story_tree
+from core.story_validator import (
+    DEAD_END, MIN_OPTIONS, NO_WINNING_ENDING, REPAIRABLE_KINDS, TARGET_DEPTH, StructuralIssue,
+    get_node, get_path_context, validate_tree,
+)
 from core.config import settings
 
 logger = logging.getLogger("app.story")
@@ -27,7 +32,7 @@ class StoryGenerator:
 
     # --- FIXED METHOD: Path Helper ---
     @classmethod
-    def _get_image_save_path(cls, user_id: Optional[int], story_id: int, filename: str) -> str:
+    def _get_image_save_path(cls, user_id: Optional[int], story_id: Union[int, str], filename: str) -> str:
         """Constructs the local file path for image storage."""
         
         # Use a placeholder ID if user_id is None (unauthenticated session)
@@ -70,7 +75,7 @@ class StoryGenerator:
 
     # --- MODIFIED: Image Generation Logic ---
     @classmethod
-    def _generate_image_url(cls, prompt: str, user_id: Optional[int], story_id: int, image_num: int) -> str:
+    def _generate_image_url(cls, prompt: str, user_id: Optional[int], story_id: Union[int, str], image_num: int) -> str:
         """
         Calls the dedicated Euriai Image API endpoint for generation, then downloads and saves it.
         """
@@ -138,65 +143,135 @@ class StoryGenerator:
         )
 
     @classmethod
-    def generate_story(cls, db: Session, session_id: str, theme: str = "fantasy", user_id: Optional[int] = None) -> Story:
+    def generate_story(
+        cls,
+        db: Session,
+        session_id: str,
+        theme: str = "fantasy",
+        user_id: Optional[int] = None,
+        on_progress: Optional[Callable[[str], None]] = None,
+    ) -> Story:
         """
         1) Call Euriai and get assistant content (JSON string or dict)
         2) Convert to dict robustly (unfence, unescape, cleanup)
         3) Normalize schema drift (key typos, null options, ending rules)
+        3b) Validate tree structure and re-prompt only for broken subtrees
         4) Validate and persist
+
+        `on_progress` is called with a stage name ("generating_text", "validating", "generating_images")
+        as each step starts.
         """
+        report = on_progress or (lambda stage: None)
         try:
-            llm = cls._get_llm()
-            strict_parser = PydanticOutputParser(pydantic_object=StoryLLMResponse)
-
-            prompt = ChatPromptTemplate.from_messages(
-                [
-                    ("system", STORY_PROMPT),
-                    ("user", f"Create the story with this theme: {theme}. Respond with JSON only.")
-                ]
-            ).partial(format_instructions=strict_parser.get_format_instructions())
-
-            # 1) Call model; client returns assistant message.content in .content
-            raw = llm.invoke(prompt.invoke({}))
-            content = raw.content if hasattr(raw, "content") else str(raw)
-            logger.debug("LLM raw response len=%d preview=%s", len(str(content)), str(content)[:500])
-
-            # 2) Convert to dict robustly
-            obj = cls._to_object(content)
-            logger.debug("Parsed content to object type=%s keys=%s", type(obj).__name__, list(obj.keys())[:5] if isinstance(obj, dict) else "n/a")
-
-            # 3) Normalize to schema
-            obj = cls._normalize_top(obj)
-            logger.debug("Normalized object keys=%s", list(obj.keys())[:5] if isinstance(obj, dict) else "n/a")
-
-            # 4) Validate and persist
-            story_structure = StoryLLMResponse.model_validate(obj)
-            logger.debug("Pydantic validation successful")
-
-            story_db = Story(
-                title=story_structure.title, 
-                session_id=session_id,
-                user_id=user_id
-            )
-            db.add(story_db)
-            db.flush()
-
-            root_node_data = story_structure.rootNode
-            if isinstance(root_node_data, dict):
-                root_node_data = StoryNodeLLM.model_validate(root_node_data)
+            story_structure = cls.build_story_structure(theme, on_progress=report)
 
             # --- CRITICAL FIX: Pass user_id for folder creation and trigger image generation for ROOT only ---
-            cls._process_story_node(db, story_db.id, root_node_data, is_root=True, generate_images=True, user_id=user_id) 
+            report("generating_images")
+            story_db = cls.persist_story(db, story_structure, session_id, user_id, generate_images=True)
             # --- END FIX ---
             db.commit()
-            logger.debug("Story generation completed successfully")
-            return story_db
-            
         except Exception as e:
             logger.error("Story generation failed: %s", str(e), exc_info=True)
             db.rollback()
             raise
 
+        # The story is committed at this point; failing here must not fail the job (a retry would
+        # generate a duplicate). The read path builds a missing tree on first request.
+        try:
+            precompute_story_tree(db, story_db)
+        except Exception as e:
+            db.rollback()
+            logger.warning("Precomputing the tree of story %s failed: %s", story_db.id, e)
+        logger.debug("Story generation completed successfully")
+        return story_db
+
+    @classmethod
+    def build_story_structure(
+        cls,
+        theme: str,
+        on_progress: Optional[Callable[[str], None]] = None,
+    ) -> StoryLLMResponse:
+        """
+        Steps 1-3b plus schema validation, without touching the database (safe to run in parallel).
+        """
+        report = on_progress or (lambda stage: None)
+        llm = cls._get_llm()
+        strict_parser = PydanticOutputParser(pydantic_object=StoryLLMResponse)
+
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", STORY_PROMPT),
+                ("user", f"Create the story with this theme: {theme}. Respond with JSON only.")
+            ]
+        ).partial(format_instructions=strict_parser.get_format_instructions())
+
+        # 1) Call model; client returns assistant message.content in .content
+        report("generating_text")
+        raw = llm.invoke(prompt.invoke({}))
+        content = raw.content if hasattr(raw, "content") else str(raw)
+        logger.debug("LLM raw response len=%d preview=%s", len(str(content)), str(content)[:500])
+
+        # 2) Convert to dict robustly
+        obj = cls._to_object(content)
+        logger.debug("Parsed content to object type=%s keys=%s", type(obj).__name__, list(obj.keys())[:5] if isinstance(obj, dict) else "n/a")
+
+        # 3) Normalize to schema
+        obj = cls._normalize_top(obj)
+        logger.debug("Normalized object keys=%s", list(obj.keys())[:5] if isinstance(obj, dict) else "n/a")
+
+        # 3b) Repair structural problems by splicing in regenerated subtrees
+        report("validating")
+        if isinstance(obj.get("rootNode"), dict):
+            cls._repair_structure(llm, theme, obj["rootNode"])
+
+        # 4) Validate
+        story_structure = StoryLLMResponse.model_validate(obj)
+        logger.debug("Pydantic validation successful")
+        return story_structure
+
+    @classmethod
+    def with_root_images(
+        cls, story_structure: StoryLLMResponse, user_id: Optional[int], story_key: Union[int, str]
+    ) -> StoryLLMResponse:
+        """
+        Generates the root node's images before anything is written and returns a copy of the
+        structure with their paths in place of the prompts, for persist_story(generate_images=False).
+        `story_key` names the image folder when the story has no id yet.
+        """
+        root = story_structure.rootNode
+        root = root.model_copy(update={
+            "image_prompt_1": cls._generate_image_url(root.image_prompt_1, user_id, story_key, 1),
+            "image_prompt_2": cls._generate_image_url(root.image_prompt_2, user_id, story_key, 2),
+        })
+        return story_structure.model_copy(update={"rootNode": root})
+
+    @classmethod
+    def persist_story(
+        cls,
+        db: Session,
+        story_structure: StoryLLMResponse,
+        session_id: str,
+        user_id: Optional[int] = None,
+        generate_images: bool = True,
+    ) -> Story:
+        """
+        Adds the story and its nodes to `db` and flushes; committing is left to the caller.
+        """
+        story_db = Story(
+            title=story_structure.title, 
+            session_id=session_id,
+            user_id=user_id
+        )
+        db.add(story_db)
+        db.flush()
+
+        root_node_data = story_structure.rootNode
+        if isinstance(root_node_data, dict):
+            root_node_data = StoryNodeLLM.model_validate(root_node_data)
+
+        cls._process_story_node(db, story_db.id, root_node_data, is_root=True, generate_images=generate_images, user_id=user_id)
+        return story_db
+
     # ---------- Helpers: parsing and normalization ----------
 
     @staticmethod
@@ -346,6 +421,109 @@ class StoryGenerator:
 
         return node
 
+    # ---------- Structural validation and partial regeneration ----------
+
+    @classmethod
+    def _repair_structure(cls, llm, theme: str, root: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validates the normalized tree in place. Each deficient subtree is re-prompted on its own and spliced
+        back in, so one bad branch never costs a full regeneration, and the root is never replaced. Dead
+        ends left after the last round are closed as losing endings so the persisted tree is always
+        playable. A tree shorter than TARGET_DEPTH is logged but kept as it is.
+        """
+        for round_num in range(settings.STORY_REPAIR_MAX_ROUNDS):
+            issues = [
+                issue for issue in validate_tree(root)
+                # The root is never rewritten as an ending; a bare root gets continued (DEAD_END) first
+                if issue.kind in REPAIRABLE_KINDS and not (issue.kind == NO_WINNING_ENDING and not issue.path)
+            ]
+            # A dead end picked to become the winning ending is fixed by that; continuing it first
+            # would only have the new subtree thrown away
+            winning_targets = {issue.path for issue in issues if issue.kind == NO_WINNING_ENDING}
+            issues = [issue for issue in issues if not (issue.kind == DEAD_END and issue.path in winning_targets)]
+            if not issues:
+                break
+            logger.info(
+                "Structural repair round %d: %d issue(s) %s",
+                round_num + 1, len(issues), [(issue.kind, issue.path) for issue in issues],
+            )
+            for issue in issues[: settings.STORY_REPAIR_MAX_SUBTREES]:
+                try:
+                    cls._regenerate_subtree(llm, theme, root, issue)
+                except Exception as e:
+                    logger.warning("Subtree regeneration failed kind=%s path=%s: %s", issue.kind, issue.path, e)
+
+        for issue in validate_tree(root):
+            logger.warning("Unrepaired structural issue kind=%s path=%s: %s", issue.kind, issue.path, issue.detail)
+            if issue.kind == DEAD_END:
+                node = get_node(root, issue.path)
+                node["isEnding"] = True
+                node["isWinningEnding"] = False
+                node.pop("options", None)
+
+        return root
+
+    @classmethod
+    def _regenerate_subtree(cls, llm, theme: str, root: Dict[str, Any], issue: StructuralIssue) -> None:
+        node = get_node(root, issue.path)
+        history = get_path_context(root, issue.path)
+
+        if issue.kind == NO_WINNING_ENDING:
+            instruction = (
+                "Rewrite this ending so the player wins. Return a single ending node with "
+                "isEnding: true and isWinningEnding: true and no options."
+            )
+            subtree = cls._invoke_node_prompt(llm, theme, history, node.get("content", ""), instruction)
+            if not (subtree.get("isEnding") and subtree.get("isWinningEnding")):
+                raise RuntimeError("regenerated node is not a winning ending")
+            # Replace in place so the parent option keeps pointing at the same dict
+            node.clear()
+            node.update(subtree)
+            return
+
+        remaining_depth = max(1, TARGET_DEPTH - issue.depth)
+        instruction = (
+            f"Keep this scene as the node content and continue it with exactly {MIN_OPTIONS} options. "
+            f"Each option must lead to a subtree at most {remaining_depth} level(s) deep where every path "
+            f"finishes in an ending node."
+        )
+        subtree = cls._invoke_node_prompt(llm, theme, history, node.get("content", ""), instruction)
+        existing = node.get("options") or []
+        fresh = subtree.get("options") or []
+        if not fresh:
+            raise RuntimeError("regenerated subtree has no options")
+        node["isEnding"] = False
+        node["options"] = existing + fresh[: MIN_OPTIONS - len(existing)]
+
+    @classmethod
+    def _invoke_node_prompt(cls, llm, theme: str, history: list, scene: str, instruction: str) -> Dict[str, Any]:
+        node_parser = PydanticOutputParser(pydantic_object=StoryNodeLLM)
+        prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", SUBTREE_PROMPT),
+                (
+                    "user",
+                    "Story theme: {theme}\n\nStory so far:\n{history}\n\nNode to write:\n{scene}\n\n"
+                    "{instruction}\nRespond with JSON only.",
+                ),
+            ]
+        ).partial(format_instructions=node_parser.get_format_instructions())
+
+        raw = llm.invoke(prompt.invoke({
+            "theme": theme,
+            "history": "\n".join(history) or "(this is the opening scene)",
+            "scene": scene,
+            "instruction": instruction,
+        }))
+        content = raw.content if hasattr(raw, "content") else str(raw)
+        obj = cls._to_object(content)
+        if not isinstance(obj, dict):
+            raise RuntimeError(f"Expected JSON object for subtree, got {type(obj).__name__}")
+        # Models sometimes answer with a full story envelope instead of a bare node
+        if isinstance(obj.get("rootNode"), dict):
+            obj = obj["rootNode"]
+        return cls._normalize_node(obj)
+
     # ---------- Persistence (Modified to halt recursive image generation) ----------
 
     @classmethod
@@ -0,0 +1,271 @@
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session, undefer
+
+from core.cache import LRUCache
+from core.config import settings
+from db.database import SessionLocal
+from models.story import Story, StoryNode
+
+logger = logging.getLogger("app.story")
+
+GRAPH_INDEX_VERSION = 1
+
+# story_id -> StoryGraphIndex; the graph never changes after generation
+_graph_cache = LRUCache(settings.STORY_TREE_CACHE_SIZE)
+
+
+@dataclass(frozen=True)
+class StoryGraphIndex:
+    """
+    Read-only facts about one story's node graph, computed once when the story is generated.
+
+    Stored on the story row as parallel arrays (see to_json); every lookup here is a dict access.
+    Nodes not reachable from the root have no depth or parent and count as reaching no endings.
+
+    Each node also has a dense ordinal (its position in node_ids), so a set of visited nodes is an
+    int bitmask: unions are `|`, counts are bit_count(), endings reached are `mask & ending_mask`.
+    """
+
+    root_id: Optional[int]
+    node_count: int
+    depth: Dict[int, int]
+    parent: Dict[int, Optional[int]]
+    ending_ids: frozenset
+    winning_ending_ids: frozenset
+    reachable_endings: Dict[int, int]
+    reachable_winning_endings: Dict[int, int]
+    total_paths: int
+    node_ids: Tuple[int, ...]
+    ordinal: Dict[int, int]
+    ending_mask: int
+    winning_mask: int
+
+    def depth_of(self, node_id: int) -> Optional[int]:
+        return self.depth.get(node_id)
+
+    def parent_of(self, node_id: int) -> Optional[int]:
+        return self.parent.get(node_id)
+
+    def is_ending(self, node_id: int) -> bool:
+        return node_id in self.ending_ids
+
+    def is_winning_ending(self, node_id: int) -> bool:
+        return node_id in self.winning_ending_ids
+
+    def endings_reachable_from(self, node_id: int) -> int:
+        return self.reachable_endings.get(node_id, 0)
+
+    def winning_endings_reachable_from(self, node_id: int) -> int:
+        return self.reachable_winning_endings.get(node_id, 0)
+
+    def to_mask(self, node_ids: Iterable[int]) -> int:
+        """Bitmask of `node_ids`; ids that don't belong to this story are dropped."""
+        mask = 0
+        for node_id in node_ids:
+            position = self.ordinal.get(node_id)
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    def from_mask(self, mask: int) -> List[int]:
+        """Node ids in `mask`, in ordinal (= id) order."""
+        node_ids = []
+        while mask:
+            low = mask & -mask
+            node_ids.append(self.node_ids[low.bit_length() - 1])
+            mask ^= low
+        return node_ids
+
+    def to_json(self) -> Dict:
+        node_ids = sorted(self.reachable_endings)
+        return {
+            "v": GRAPH_INDEX_VERSION,
+            "root": self.root_id,
+            "nodes": node_ids,
+            "depth": [self.depth.get(n, -1) for n in node_ids],
+            "parent": [self.parent.get(n) for n in node_ids],
+            "reach": [self.reachable_endings[n] for n in node_ids],
+            "reach_win": [self.reachable_winning_endings[n] for n in node_ids],
+            "endings": sorted(self.ending_ids),
+            "winning": sorted(self.winning_ending_ids),
+            "paths": self.total_paths,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "StoryGraphIndex":
+        node_ids = data["nodes"]
+        ordinal = {node_id: i for i, node_id in enumerate(node_ids)}
+        return cls(
+            root_id=data["root"],
+            node_count=len(node_ids),
+            depth={n: d for n, d in zip(node_ids, data["depth"]) if d >= 0},
+            parent={n: p for n, p in zip(node_ids, data["parent"]) if p is not None},
+            ending_ids=frozenset(data["endings"]),
+            winning_ending_ids=frozenset(data["winning"]),
+            reachable_endings=dict(zip(node_ids, data["reach"])),
+            reachable_winning_endings=dict(zip(node_ids, data["reach_win"])),
+            total_paths=data["paths"],
+            node_ids=tuple(node_ids),
+            ordinal=ordinal,
+            ending_mask=sum(1 << ordinal[n] for n in data["endings"]),
+            winning_mask=sum(1 << ordinal[n] for n in data["winning"]),
+        )
+
+
+def _child_ids(node: StoryNode) -> List[int]:
+    children = []
+    for option in node.options or []:
+        next_id = option.get("node_id") if isinstance(option, dict) else None
+        if isinstance(next_id, int):
+            children.append(next_id)
+    return children
+
+
+def build_graph_index(nodes: Iterable[StoryNode]) -> StoryGraphIndex:
+    nodes = list(nodes)
+    by_id = {node.id: node for node in nodes}
+    children = {node.id: [c for c in _child_ids(node) if c in by_id] for node in nodes}
+    root = next((node for node in nodes if node.is_root), None)
+
+    ending_ids = frozenset(node.id for node in nodes if node.is_ending)
+    winning_ids = frozenset(node.id for node in nodes if node.is_ending and node.is_winning_ending)
+    node_ids = tuple(sorted(by_id))
+    ordinal = {node_id: i for i, node_id in enumerate(node_ids)}
+    ending_bit = {node_id: 1 << ordinal[node_id] for node_id in ending_ids}
+    ending_mask = sum(ending_bit.values())
+    winning_mask = sum(ending_bit[node_id] for node_id in winning_ids)
+
+    # Breadth-first from the root: shortest depth and the parent it was first reached from
+    depth: Dict[int, int] = {}
+    parent: Dict[int, Optional[int]] = {}
+    order: List[int] = []
+    if root is not None:
+        depth[root.id] = 0
+        parent[root.id] = None
+        order.append(root.id)
+        for node_id in order:
+            for child_id in children[node_id]:
+                if child_id not in depth:
+                    depth[child_id] = depth[node_id] + 1
+                    parent[child_id] = node_id
+                    order.append(child_id)
+
+    # Bottom-up over the BFS order: reachable endings as a bitmask (distinct even if branches
+    # merge) and root-to-ending path counts. Edges back to shallower nodes are ignored so a
+    # malformed cycle can't recurse forever.
+    reach_mask: Dict[int, int] = {node_id: 0 for node_id in by_id}
+    paths: Dict[int, int] = {node_id: 0 for node_id in by_id}
+    for node_id in reversed(order):
+        mask = ending_bit.get(node_id, 0)
+        count = 1 if node_id in ending_ids else 0
+        for child_id in children[node_id]:
+            if depth.get(child_id, -1) > depth[node_id]:
+                mask |= reach_mask[child_id]
+                count += paths[child_id]
+        reach_mask[node_id] = mask
+        paths[node_id] = count
+
+    return StoryGraphIndex(
+        root_id=root.id if root is not None else None,
+        node_count=len(by_id),
+        depth=depth,
+        parent={k: v for k, v in parent.items() if v is not None},
+        ending_ids=ending_ids,
+        winning_ending_ids=winning_ids,
+        reachable_endings={n: m.bit_count() for n, m in reach_mask.items()},
+        reachable_winning_endings={n: (m & winning_mask).bit_count() for n, m in reach_mask.items()},
+        total_paths=paths[root.id] if root is not None else 0,
+        node_ids=node_ids,
+        ordinal=ordinal,
+        ending_mask=ending_mask,
+        winning_mask=winning_mask,
+    )
+
+
+def store_graph_index(story: Story, nodes: Iterable[StoryNode]) -> StoryGraphIndex:
+    """
+    Computes the index and sets it on `story`; committing is left to the caller.
+    """
+    index = build_graph_index(nodes)
+    story.graph_index = index.to_json()
+    story.node_count = index.node_count
+    _graph_cache.set(story.id, index)
+    return index
+
+
+def get_story_graph(db: Session, story_id: int) -> Optional[StoryGraphIndex]:
+    """
+    Returns the graph index for `story_id`, or None if the story does not exist.
+
+    Same lookup order as the serialized tree: in-process LRU, the stored column, then a one-off
+    build for stories generated before the column existed.
+    """
+    index = _graph_cache.get(story_id)
+    if index is not None:
+        return index
+
+    story = (
+        db.query(Story)
+        .options(undefer(Story.graph_index))
+        .filter(Story.id == story_id)
+        .first()
+    )
+    if not story:
+        return None
+
+    data = story.graph_index
+    if data and data.get("v") == GRAPH_INDEX_VERSION:
+        index = StoryGraphIndex.from_json(data)
+        _graph_cache.set(story_id, index)
+        return index
+
+    logger.info("Backfilling graph index for story %d", story_id)
+    nodes = db.query(StoryNode).filter(StoryNode.story_id == story_id).all()
+    index = build_graph_index(nodes)
+    _graph_cache.set(story_id, index)
+    store_story_columns(story_id, {Story.graph_index: index.to_json(), Story.node_count: index.node_count})
+    return index
+
+
+def store_story_columns(story_id: int, values: Dict) -> None:
+    """
+    Writes backfilled columns of a story from a session of its own, so the caller's transaction is
+    neither committed nor extended. Failing only means the next process builds them again.
+    """
+    db = SessionLocal()
+    try:
+        db.query(Story).filter(Story.id == story_id).update(values, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("Storing backfilled %s of story %d failed: %s", ", ".join(c.key for c in values), story_id, e)
+    finally:
+        db.close()
+
+
+def get_story_graphs(db: Session, story_ids: Set[int]) -> Dict[int, StoryGraphIndex]:
+    """
+    get_story_graph for many stories: cache misses are read with one IN query instead of one each.
+    """
+    found: Dict[int, StoryGraphIndex] = {}
+    missing = []
+    for story_id in story_ids:
+        index = _graph_cache.get(story_id)
+        if index is not None:
+            found[story_id] = index
+        else:
+            missing.append(story_id)
+    if not missing:
+        return found
+
+    rows = db.query(Story.id, Story.graph_index).filter(Story.id.in_(missing)).all()
+    for story_id, data in rows:
+        if data and data.get("v") == GRAPH_INDEX_VERSION:
+            found[story_id] = StoryGraphIndex.from_json(data)
+            _graph_cache.set(story_id, found[story_id])
+        else:
+            found[story_id] = get_story_graph(db, story_id)
+    return found
@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Structural rules the story prompt asks the LLM to follow.
+MIN_OPTIONS = 2
+TARGET_DEPTH = 4
+
+DEAD_END = "dead_end"
+UNDER_BRANCHED = "under_branched"
+NO_WINNING_ENDING = "no_winning_ending"
+TOO_SHALLOW = "too_shallow"
+
+# Issue kinds that can be fixed by regenerating the subtree at `path`. TOO_SHALLOW is reported
+# only: deepening a tree means rewriting most of it, which is what targeted repair avoids.
+REPAIRABLE_KINDS = (DEAD_END, UNDER_BRANCHED, NO_WINNING_ENDING)
+
+
+@dataclass(frozen=True)
+class StructuralIssue:
+    kind: str
+    path: Tuple[int, ...]  # option indices from the root to the offending node
+    depth: int
+    detail: str
+
+
+def iter_nodes(root: Dict[str, Any]) -> Iterator[Tuple[Tuple[int, ...], Dict[str, Any]]]:
+    """
+    Walk a normalized LLM node tree depth-first, yielding (path, node).
+    """
+    stack: List[Tuple[Tuple[int, ...], Dict[str, Any]]] = [((), root)]
+    while stack:
+        path, node = stack.pop()
+        yield path, node
+        if node.get("isEnding"):
+            continue
+        options = node.get("options") or []
+        for idx in range(len(options) - 1, -1, -1):
+            child = options[idx].get("nextNode")
+            if isinstance(child, dict):
+                stack.append((path + (idx,), child))
+
+
+def get_node(root: Dict[str, Any], path: Tuple[int, ...]) -> Dict[str, Any]:
+    node = root
+    for idx in path:
+        node = node["options"][idx]["nextNode"]
+    return node
+
+
+def get_path_context(root: Dict[str, Any], path: Tuple[int, ...]) -> List[str]:
+    """
+    Returns the scene contents and choices taken from the root down to (but excluding) the node at `path`.
+    """
+    steps: List[str] = []
+    node = root
+    for idx in path:
+        option = node["options"][idx]
+        steps.append(f"Scene: {node.get('content', '')}")
+        steps.append(f"Choice: {option.get('text', '')}")
+        node = option["nextNode"]
+    return steps
+
+
+def validate_tree(
+    root: Dict[str, Any],
+    min_options: int = MIN_OPTIONS,
+    min_depth: int = TARGET_DEPTH,
+) -> List[StructuralIssue]:
+    """
+    Checks a normalized LLM node tree for:
+      - non-ending nodes without any option (dead ends, no reachable ending)
+      - non-ending nodes with fewer than `min_options` options
+      - the absence of any winning ending, targeted at the deepest ending, or the deepest dead end
+        if there are no endings (the root only when it is the whole tree; repair never rewrites it)
+      - a longest path shorter than `min_depth` (reported only, see REPAIRABLE_KINDS)
+    """
+    issues: List[StructuralIssue] = []
+    max_depth = 0
+    has_winning = False
+    deepest_ending: Optional[Tuple[int, ...]] = None
+    deepest_dead_end: Optional[Tuple[int, ...]] = None
+
+    for path, node in iter_nodes(root):
+        depth = len(path)
+        max_depth = max(max_depth, depth)
+
+        if node.get("isEnding"):
+            if node.get("isWinningEnding"):
+                has_winning = True
+            if deepest_ending is None or depth > len(deepest_ending):
+                deepest_ending = path
+            continue
+
+        option_count = len(node.get("options") or [])
+        if option_count == 0:
+            issues.append(StructuralIssue(DEAD_END, path, depth, "non-ending node has no options"))
+            if path and (deepest_dead_end is None or depth > len(deepest_dead_end)):
+                deepest_dead_end = path
+        elif option_count < min_options:
+            issues.append(StructuralIssue(
+                UNDER_BRANCHED, path, depth, f"non-ending node has {option_count} of {min_options} options"
+            ))
+
+    if not has_winning:
+        # Rewriting the deepest ending (or turning the deepest dead end into one) keeps the rest of
+        # the tree intact
+        target = deepest_ending or deepest_dead_end or ()
+        issues.append(StructuralIssue(NO_WINNING_ENDING, target, len(target), "story has no winning ending"))
+
+    if max_depth < min_depth:
+        issues.append(StructuralIssue(TOO_SHALLOW, (), 0, f"longest path is {max_depth}, expected {min_depth}"))
+
+    return issues
@@ -0,0 +1,60 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from models.story import StoryNode
+from schemas.story import CompleteStoryNodeResponse, StoryNodeWindowResponse
+
+
+def _node_response(node: StoryNode) -> CompleteStoryNodeResponse:
+    return CompleteStoryNodeResponse(
+        id=node.id,
+        content=node.content,
+        image_prompt_1=node.image_prompt_1,
+        image_prompt_2=node.image_prompt_2,
+        is_ending=node.is_ending,
+        is_winning_ending=node.is_winning_ending,
+        options=node.options or []
+    )
+
+
+def load_node_window(db: Session, story_id: int, node_id: int, depth: int) -> Optional[StoryNodeWindowResponse]:
+    """
+    Loads `node_id` and every node up to `depth` choices below it, one IN query per level.
+
+    `frontier` lists the deepest loaded nodes that still have children; requesting any of them
+    continues the traversal. Returns None if the node does not belong to the story.
+    """
+    nodes: Dict[int, CompleteStoryNodeResponse] = {}
+    level: List[int] = [node_id]
+    frontier: List[int] = []
+
+    for current_depth in range(depth + 1):
+        rows = db.query(StoryNode).filter(
+            StoryNode.story_id == story_id,
+            StoryNode.id.in_(level)
+        ).all()
+        if current_depth == 0 and not rows:
+            return None
+
+        next_level: List[int] = []
+        for row in rows:
+            nodes[row.id] = _node_response(row)
+            child_ids = [opt.get("node_id") for opt in (row.options or []) if opt.get("node_id") is not None]
+            if current_depth == depth:
+                if child_ids:
+                    frontier.append(row.id)
+            else:
+                next_level.extend(child_id for child_id in child_ids if child_id not in nodes)
+
+        if not next_level:
+            break
+        level = next_level
+
+    return StoryNodeWindowResponse(
+        story_id=story_id,
+        node_id=node_id,
+        depth=depth,
+        nodes=nodes,
+        frontier=frontier,
+    )
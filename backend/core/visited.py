@@ -0,0 +1,40 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from core.story_graph import StoryGraphIndex
+
+# Visited-node sets are stored as bitmaps over the story's node ordinals (see StoryGraphIndex):
+# a 63-node story needs 8 bytes per save instead of a JSON list of ids.
+
+
+def mask_to_bytes(mask: int) -> bytes:
+    return mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+
+def mask_from_bytes(data: Optional[bytes]) -> int:
+    return int.from_bytes(data, "little") if data else 0
+
+
+def visited_mask(graph: StoryGraphIndex, bitmap: Optional[bytes], legacy_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    The visited set of a save or progress row. Rows written before bitmaps existed only have the id list.
+    """
+    if bitmap is not None:
+        return mask_from_bytes(bitmap)
+    return graph.to_mask(legacy_ids or ())
+
+
+def visited_ids(graph: Optional[StoryGraphIndex], row: Any) -> List[int]:
+    """Node ids visited by a save row (a SaveGame or a projected row with the same columns)."""
+    if graph is None:
+        return list(row.nodes_visited or [])
+    return graph.from_mask(visited_mask(graph, row.visited_bitmap, row.nodes_visited))
+
+
+def visited_columns(graph: Optional[StoryGraphIndex], node_ids: Iterable[int]) -> Dict[str, Any]:
+    """
+    Column values for storing `node_ids` on a save. Falls back to the id list if the story's graph
+    is gone.
+    """
+    if graph is None:
+        return {"visited_bitmap": None, "nodes_visited": list(node_ids)}
+    return {"visited_bitmap": mask_to_bytes(graph.to_mask(node_ids)), "nodes_visited": None}
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+import logging
+
+from sqlalchemy import create_engine, inspect, literal, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -12,6 +14,8 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+logger = logging.getLogger("app.db")
+
 
 def get_db():
     db = SessionLocal()
@@ -22,4 +26,56 @@ def get_db():
 
 
 def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    upgrade_tables()
+
+
+def _column_ddl(column) -> str:
+    ddl = f"{column.name} {column.type.compile(dialect=engine.dialect)}"
+    if column.nullable:
+        # Existing rows get NULL; the startup backfills fill in what they can
+        return ddl
+    if column.server_default is not None:
+        default = column.server_default.arg
+        if not isinstance(default, str):
+            default = default.compile(dialect=engine.dialect)
+        return f"{ddl} DEFAULT {default} NOT NULL"
+    if column.default is not None and column.default.is_scalar:
+        value = literal(column.default.arg, column.type).compile(
+            dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+        )
+        return f"{ddl} DEFAULT {value} NOT NULL"
+    return ddl
+
+
+def upgrade_tables():
+    """
+    create_all never touches tables that already exist, so columns and indexes the models gained
+    since a database was created are added here. Idempotent; runs right after create_all, before
+    any startup backfill reads the new columns.
+
+    Only additions are handled. Primary key changes (the partitioned analytics_events on
+    Postgres) need the table rebuilt by hand.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or column.primary_key:
+                    continue
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column)}"))
+                logger.info("Added column %s.%s", table.name, column.name)
+
+            indexes = {i["name"]: i["column_names"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                columns = [c.name for c in index.columns]
+                if indexes.get(index.name) == columns:
+                    continue
+                if index.name in indexes:
+                    # Same name, different columns (e.g. a single-column index widened to a composite)
+                    conn.execute(text(f"DROP INDEX {index.name}"))
+                index.create(conn)
+                logger.info("Created index %s", index.name)
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Streams analytics events or save games out of the database as NDJSON or CSV.
+
+    python -m export_data analytics-events --format csv --story-id 3 --start 2026-01-01 -o events.csv
+    python -m export_data save-games > saves.ndjson
+
+Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE and written as they
+arrive, so memory stays flat however large the tables are. --start/--end are inclusive UTC days.
+"""
+import argparse
+import sys
+from datetime import date
+
+from core.export import EXPORT_FORMATS, EXPORTS, export_stream
+# Import all models to ensure they're registered with SQLAlchemy
+from models.user import User
+from models.story import Story, StoryNode
+from models.save_game import SaveGame, UserStoryProgress
+from models.analytics_event import AnalyticsEvent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export analytics events or save games.")
+    parser.add_argument("kind", choices=sorted(EXPORTS))
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--story-id", type=int)
+    parser.add_argument("--start", type=date.fromisoformat, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day, YYYY-MM-DD")
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in export_stream(args.kind, args.format, story_id=args.story_id, start=args.start, end=args.end):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,32 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from core.config import settings
 from routers import story, job
 from routes import auth, saves
-from db.database import create_tables
+from db.database import create_tables, SessionLocal
 from routes.analytics import router as analytics_router
+from routes.export import router as export_router
+from core.job_status import start_status_listener, start_status_poller
+from core.idempotency import purge_expired_keys
+from core.save_journal import start_journal_compactor
+from core.autosave_buffer import autosave_buffer, start_autosave_flusher
+from core.analytics_rollup import backfill_rollups, fill_missing_win_flags
+from core.analytics_retention import ensure_partitions, start_analytics_retention
+from core.analytics_writer import analytics_writer, start_analytics_writer
+from core.password_hashing import password_hasher
+from routes.saves import fill_missing_updated_at
+from core.serialization import FastJSONResponse
 # Import all models to ensure they're registered with SQLAlchemy
 from models.user import User
 from models.story import Story, StoryNode  
 from models.job import StoryJob
 from models.save_game import SaveGame, UserStoryProgress
-
-create_tables()
+from models.idempotency_key import IdempotencyKey
 
 # --- logging setup (add near top of main.py) ---
 import logging
@@ -29,12 +42,62 @@ dictConfig({
 })
 # --- end logging setup ---
 
+# Creates missing tables and adds columns/indexes the models gained since (see db/database.py)
+create_tables()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Relays job status from worker processes when Postgres LISTEN/NOTIFY is available
+    status_listener = start_status_listener()
+    # Otherwise, with workers in other processes, one poll serves every waiting client
+    status_poller = start_status_poller()
+    # Folds appended save choices into their save rows in the background
+    journal_compactor = start_journal_compactor()
+    autosave_flusher = start_autosave_flusher()
+    analytics_flusher = start_analytics_writer()
+    # Creates upcoming analytics partitions and drops expired events
+    analytics_retention = start_analytics_retention()
+
+    db = SessionLocal()
+    try:
+        purge_expired_keys(db)
+        fill_missing_updated_at(db)
+        ensure_partitions(db)
+        fill_missing_win_flags(db)
+        backfill_rollups(db)
+    finally:
+        db.close()
+
+    yield
+    if status_listener is not None:
+        status_listener.set()
+    if status_poller is not None:
+        status_poller.set()
+    if journal_compactor is not None:
+        journal_compactor.set()
+    if autosave_flusher is not None:
+        autosave_flusher.set()
+    if analytics_retention is not None:
+        analytics_retention.set()
+    # Buffered autosaves must reach the database before the process exits
+    autosave_buffer.flush()
+    if analytics_flusher is not None:
+        analytics_flusher.set()
+        analytics_writer.wake()
+    # Same for queued analytics events
+    analytics_writer.flush()
+    password_hasher.shutdown()
+
+
 app = FastAPI(
     title="Choose Your Own Adventure Game API",
     description="api to generate cool stories",
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse if settings.FAST_JSON_RESPONSES else JSONResponse,
 )
 
 app.add_middleware(
@@ -43,6 +106,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", saves.NEXT_CURSOR_HEADER],
 )
 
 app.include_router(story.router, prefix=settings.API_PREFIX)
@@ -50,6 +114,7 @@ app.include_router(job.router, prefix=settings.API_PREFIX)
 app.include_router(auth.router, prefix=settings.API_PREFIX)
 app.include_router(saves.router, prefix=settings.API_PREFIX)
 app.include_router(analytics_router, prefix=settings.API_PREFIX)
+app.include_router(export_router, prefix=settings.API_PREFIX)
 
 # --- CRITICAL: Static Files Route to serve images to the frontend ---
 # This mounts /static/ to serve from generated_images directory
@@ -1,12 +1,51 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Date, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
-from db.database import Base
+from db.database import Base, engine
+
+# On Postgres the table is range-partitioned by month on created_at (partitions are managed by
+# core/analytics_retention.py), which needs created_at in the primary key.
+PARTITIONED = engine.dialect.name == "postgresql"
+
 
 class AnalyticsEvent(Base):
     __tablename__ = "analytics_events"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     story_id = Column(Integer, ForeignKey("stories.id"), nullable=True)
-    event_type = Column(String, index=True)  # "start", "choice", "ending"
+    event_type = Column(String)  # "start", "choice", "ending"
+    # payload["is_winning_ending"] as a column, for "ending" events; False for everything else
+    is_winning_ending = Column(Boolean, default=False)
+    # The node the event happened at (ending node, or the node a choice was made from) and the
+    # node a choice led to, copied out of the payload for the per-story heatmap
+    node_id = Column(Integer, nullable=True)
+    next_node_id = Column(Integer, nullable=True)
     payload = Column(JSON, default={})
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), primary_key=PARTITIONED, nullable=False
+    )
+
+    __table_args__ = (
+        Index("ix_analytics_events_created_at", "created_at"),
+        Index("ix_analytics_events_type_created", "event_type", "created_at"),
+        Index("ix_analytics_events_story_type_created", "story_id", "event_type", "created_at"),
+        Index("ix_analytics_events_story_id", "story_id", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"} if PARTITIONED else {},
+    )
+
+
+class AnalyticsRollup(Base):
+    """
+    Event counters per UTC day, story, event type and win flag, kept up to date as events are
+    written (see core/analytics_writer.py). story_id 0 stands for events without a story so the
+    key stays non-null and upserts can target it.
+    """
+    __tablename__ = "analytics_rollups"
+    day = Column(Date, primary_key=True)
+    story_id = Column(Integer, primary_key=True, default=0)
+    event_type = Column(String, primary_key=True)
+    is_win = Column(Boolean, primary_key=True, default=False)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_analytics_rollups_story_day", "story_id", "day"),
+    )
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+
+from db.database import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    scope = Column(String, nullable=False)  # endpoint the key belongs to, e.g. "POST /saves/"
+    key = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)
+
+    # Null until the first request finishes; a reserved row without a response means "in progress"
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(JSON, nullable=True)
+    # When the in-progress request took the key; a reservation older than
+    # IDEMPOTENCY_RESERVATION_SECONDS is abandoned (crashed or cancelled) and can be taken over
+    reserved_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "scope", "key", name="uq_idempotency_keys_user_scope_key"),
+    )
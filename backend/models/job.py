@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.sql import func
 
 from db.database import Base
@@ -10,9 +10,24 @@ class StoryJob(Base):
     id = Column(Integer, primary_key=True, index=True)
     job_id = Column(String, index=True, unique=True)
     session_id = Column(String, index=True)
+    user_id = Column(Integer, nullable=True)
     theme = Column(String)
     status = Column(String)
+    priority = Column(Integer, default=0, nullable=False)  # lower runs first, see core/job_queue.PRIORITY_TIERS
     story_id = Column(Integer, nullable=True)
     error = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    completed_at = Column(DateTime(timezone=True), nullable=True)
\ No newline at end of file
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Queue lease: a worker owns the job until lease_expires_at and keeps extending it via heartbeats.
+    # An expired lease on a "processing" job means its worker died and the job can be claimed again.
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_story_jobs_status_lease", "status", "lease_expires_at"),
+        Index("ix_story_jobs_status_priority", "status", "priority", "id"),
+    )
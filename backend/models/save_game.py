@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON, Text, Index, LargeBinary
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -18,8 +18,11 @@ class SaveGame(Base):
     
     # Game state
     choices_made = Column(JSON, default=list)  # List of choice objects with node_id, option_text, timestamp
-    nodes_visited = Column(JSON, default=list)  # List of visited node IDs
+    nodes_visited = Column(JSON, default=list)  # List of visited node IDs (rows from before visited_bitmap)
+    visited_bitmap = Column(LargeBinary, nullable=True)  # Visited nodes by story ordinal, see core/visited.py
     play_time_minutes = Column(Integer, default=0)
+    # Highest SaveJournalEntry.id already folded into the columns above
+    journal_through = Column(Integer, default=0, nullable=False)
     
     # Save info
     is_auto_save = Column(Boolean, default=False)
@@ -31,6 +34,33 @@ class SaveGame(Base):
     story = relationship("Story")
     current_node = relationship("StoryNode")
 
+    __table_args__ = (
+        # Saves listing: newest first per user, id as the keyset tie-breaker
+        Index("ix_save_games_user_updated", "user_id", "updated_at", "id"),
+    )
+
+
+class SaveJournalEntry(Base):
+    """
+    One choice appended to a save. Pending entries (id > SaveGame.journal_through) are replayed on
+    top of the save row when it is read and folded into it by the compactor (core/save_journal.py).
+    """
+    __tablename__ = "save_journal_entries"
+
+    id = Column(Integer, primary_key=True)
+    save_id = Column(Integer, ForeignKey("save_games.id"), nullable=False)
+    node_id = Column(Integer, nullable=False)
+    option_text = Column(String, nullable=False)
+    next_node_id = Column(Integer, nullable=False)
+    play_time_minutes = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_save_journal_entries_save_id", "save_id", "id"),
+        # Never reuse ids of compacted entries: journal_through and ETags rely on them only growing
+        {"sqlite_autoincrement": True},
+    )
+
 
 class UserStoryProgress(Base):
     __tablename__ = "user_story_progress"
@@ -42,6 +72,7 @@ class UserStoryProgress(Base):
     # Progress tracking
     total_nodes_visited = Column(Integer, default=1)
     endings_reached = Column(JSON, default=list)  # List of ending node IDs reached
+    visited_bitmap = Column(LargeBinary, nullable=True)  # Union of nodes visited across all saves
     completion_percentage = Column(Integer, default=0)  # 0-100
     
     # Timestamps
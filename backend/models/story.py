@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON, Text
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON
 
 
@@ -17,6 +17,14 @@ class Story(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Serialized CompleteStoryResponse, written once when generation finishes (see core/story_cache.py).
+    # Deferred so ordinary Story queries don't pull the whole tree.
+    complete_tree_json = deferred(Column(Text, nullable=True))
+    # Depths, endings, reachable-ending and path counts (see core/story_graph.py)
+    graph_index = deferred(Column(JSON, nullable=True))
+    # Cached len(nodes), set together with graph_index
+    node_count = Column(Integer, nullable=True)
+
     nodes = relationship("StoryNode", back_populates="story")
 
 
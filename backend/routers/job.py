@@ -1,12 +1,18 @@
+import json
 import uuid
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from db.database import get_db
+from core.config import settings
+from core.job_status import TERMINAL_STATUSES, job_snapshot, job_status
+from core.serialization import fast_response
+from db.database import get_db, SessionLocal
 from models.job import StoryJob
-from schemas.job import StoryJobResponse
+from schemas.job import StoryJobResponse, StoryJobStatusEvent
 
 router = APIRouter(
     prefix="/jobs",
@@ -16,9 +22,84 @@ router = APIRouter(
 
 @router.get("/{job_id}", response_model=StoryJobResponse)
 def get_job_status(job_id: str, db: Session = Depends(get_db)):
+    # A finished job never changes again, so a terminal snapshot is safe to serve without the DB
+    snapshot = job_status.latest(job_id)
+    if snapshot and snapshot["status"] in TERMINAL_STATUSES:
+        return fast_response(snapshot, model=StoryJobResponse)
+
     job = db.query(StoryJob).filter(StoryJob.job_id == job_id).first()
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    return job
\ No newline at end of file
+    return job
+
+
+@router.get("/{job_id}/wait", response_model=StoryJobStatusEvent)
+async def wait_for_job_status(
+    job_id: str,
+    since: int = Query(0, description="last version the client has seen"),
+    timeout: Optional[float] = Query(None, gt=0, le=60),
+):
+    """
+    Long-poll: returns as soon as the job's status (or progress stage) moves past `since`,
+    or the current status after `timeout` seconds.
+    """
+    await _ensure_known(job_id)
+    snapshot = job_status.latest(job_id)
+    if snapshot["status"] not in TERMINAL_STATUSES:
+        snapshot = await job_status.wait_for_update(
+            job_id,
+            since,
+            timeout or settings.JOB_STATUS_LONG_POLL_SECONDS,
+        )
+    return fast_response(snapshot, model=StoryJobStatusEvent)
+
+
+@router.get("/{job_id}/events")
+async def stream_job_status(job_id: str, request: Request):
+    """
+    Server-sent events: one `status` event per change until the job completes or fails.
+    """
+    await _ensure_known(job_id)
+
+    async def event_stream():
+        version = 0
+        while not await request.is_disconnected():
+            snapshot = await job_status.wait_for_update(job_id, version, settings.JOB_STATUS_SSE_KEEPALIVE_SECONDS)
+            if snapshot is None or snapshot["version"] <= version:
+                yield ": keep-alive\n\n"
+                continue
+            version = snapshot["version"]
+            yield f"event: status\nid: {version}\ndata: {json.dumps(snapshot)}\n\n"
+            if snapshot["status"] in TERMINAL_STATUSES:
+                break
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _load_snapshot(job_id: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        job = db.query(StoryJob).filter(StoryJob.job_id == job_id).first()
+        return job_snapshot(job) if job else None
+    finally:
+        db.close()
+
+
+async def _refresh(job_id: str) -> None:
+    snapshot = await run_in_threadpool(_load_snapshot, job_id)
+    if snapshot is not None:
+        # The row carries no stage; publish() keeps a newer in-process snapshot that has one
+        job_status.publish(snapshot, propagate=False)
+
+
+async def _ensure_known(job_id: str) -> None:
+    if job_status.latest(job_id) is None:
+        await _refresh(job_id)
+        if job_status.latest(job_id) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
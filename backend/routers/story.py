@@ -1,25 +1,37 @@
+import hashlib
 import uuid
 from typing import Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Cookie, Response, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Cookie, Request, Response, BackgroundTasks, Query
 from sqlalchemy.orm import Session
 
-from db.database import get_db, SessionLocal
+from db.database import get_db
 from models.story import Story, StoryNode
 from models.job import StoryJob
-from models.user import User
 from schemas.story import (
-    CompleteStoryResponse, CompleteStoryNodeResponse, CreateStoryRequest
+    CompleteStoryResponse, CreateStoryRequest, StoryAdvanceRequest, StoryAdvanceResponse, StoryNodeWindowResponse
 )
 from schemas.job import StoryJobResponse
-from core.story_generator import StoryGenerator
-from core.auth import get_current_user
+from core.auth import UserPrincipal, get_current_user
+from core.config import settings
+from core.job_queue import PENDING, make_worker_id, work_once
+from core.admission import admit_story_request, resolve_priority
+from core.job_status import job_snapshot, job_status
+from core.idempotency import IdempotentRequest, get_idempotency_key
+from core.story_cache import get_story_tree_json
+from core.story_window import load_node_window
+from core.advance import advance_story
+from core.etag import make_etag, not_modified, set_etag
+from core.serialization import fast_response
 
 router = APIRouter(
     prefix="/stories",
     tags=["stories"]
 )
 
+# Used when RUN_EMBEDDED_WORKER lets the API process drain the queue itself
+EMBEDDED_WORKER_ID = make_worker_id("api")
+
 def get_session_id(session_id: Optional[str] = Cookie(None)):
     if not session_id:
         session_id = str(uuid.uuid4())
@@ -30,92 +42,90 @@ def create_story(
         request: CreateStoryRequest,
         background_tasks: BackgroundTasks,
         response: Response,
-        current_user: User = Depends(get_current_user),
+        current_user: UserPrincipal = Depends(get_current_user),
         session_id: str = Depends(get_session_id),
+        idempotency_key: Optional[str] = Depends(get_idempotency_key),
         db: Session = Depends(get_db)
 ):
-    response.set_cookie(key="session_id", value=session_id, httponly=True)
-
-    job_id = str(uuid.uuid4())
-
-    job = StoryJob(
-        job_id=job_id,
-        session_id=session_id,
-        theme=request.theme,
-        status="pending"
-    )
-    db.add(job)
-    db.commit()
-
-    background_tasks.add_task(
-        generate_story_task,
-        job_id=job_id,
-        theme=request.theme,
-        session_id=session_id,
-        user_id=current_user.id
-    )
-
-    return job
-
-def generate_story_task(job_id: str, theme: str, session_id: str, user_id: int):
-    db = SessionLocal()
-
-    try:
-        job = db.query(StoryJob).filter(StoryJob.job_id == job_id).first()
-
-        if not job:
-            return
-
-        try:
-            job.status = "processing"
-            db.commit()
-
-            story = StoryGenerator.generate_story(db, session_id, theme, user_id)
-
-            job.story_id = story.id
-            job.status = "completed"
-            job.completed_at = datetime.now()
-            db.commit()
-        except Exception as e:
-            job.status = "failed"
-            job.completed_at = datetime.now()
-            job.error = str(e)
-            db.commit()
-    finally:
-        db.close()
+    with IdempotentRequest(db, current_user.id, "POST /stories/create", idempotency_key, request) as idem:
+        # A retried request replays the original job instead of generating a second story
+        if idem.replay is not None:
+            return idem.replay
+
+        priority = resolve_priority(current_user, request.priority)
+        admit_story_request(db, current_user.id, session_id, priority)
+
+        response.set_cookie(key="session_id", value=session_id, httponly=True)
+
+        job_id = str(uuid.uuid4())
+
+        job = StoryJob(
+            job_id=job_id,
+            session_id=session_id,
+            user_id=current_user.id,
+            theme=request.theme,
+            status=PENDING,
+            priority=priority
+        )
+        db.add(job)
+        db.commit()
+        job_status.publish(job_snapshot(job))
+
+        # Workers started with `python -m worker` pick the job up from the queue; the embedded
+        # worker only exists so a single-process dev setup keeps working without one.
+        if settings.RUN_EMBEDDED_WORKER:
+            background_tasks.add_task(work_once, EMBEDDED_WORKER_ID)
+
+        return idem.save(StoryJobResponse.model_validate(job))
 
 @router.get("/{story_id}/complete", response_model=CompleteStoryResponse)
-def get_complete_story(story_id: int, db: Session = Depends(get_db)):
-    story = db.query(Story).filter(Story.id == story_id).first()
-    if not story:
+def get_complete_story(story_id: int, request: Request, db: Session = Depends(get_db)):
+    # Primary key lookup first, so a missing story is a 404 even for a client holding an old tag
+    if db.query(Story.id).filter(Story.id == story_id).first() is None:
         raise HTTPException(status_code=404, detail="Story not found")
 
-    complete_story = build_complete_story_tree(db, story)
-    return complete_story
+    # The JSON is built once and served as raw bytes; its hash versions the body
+    payload = get_story_tree_json(db, story_id)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+    etag = make_etag("story", story_id, hashlib.sha1(payload).hexdigest())
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    response = Response(content=payload, media_type="application/json")
+    set_etag(response, etag)
+    return response
+
+
+@router.get("/{story_id}/nodes/{node_id}", response_model=StoryNodeWindowResponse)
+def get_story_node_window(
+    story_id: int,
+    node_id: int,
+    depth: int = Query(1, ge=0, le=5, description="how many choices ahead to include"),
+    db: Session = Depends(get_db)
+):
+    window = load_node_window(db, story_id, node_id, depth)
+    if window is None:
+        raise HTTPException(status_code=404, detail="Story node not found")
 
-def build_complete_story_tree(db: Session, story: Story) -> CompleteStoryResponse:
-    nodes = db.query(StoryNode).filter(StoryNode.story_id == story.id).all()
+    return fast_response(window)
 
-    node_dict = {}
-    for node in nodes:
-        node_response = CompleteStoryNodeResponse(
-            id=node.id,
-            content=node.content,
-            is_ending=node.is_ending,
-            is_winning_ending=node.is_winning_ending,
-            options=node.options
-        )
-        node_dict[node.id] = node_response
-
-    root_node = next((node for node in nodes if node.is_root), None)
-    if not root_node:
-        raise HTTPException(status_code=500, detail="Story root node not found")
-
-    return CompleteStoryResponse(
-        id=story.id,
-        title=story.title,
-        session_id=story.session_id,
-        created_at=story.created_at,
-        root_node=node_dict[root_node.id],
-        all_nodes=node_dict
-    )
+
+@router.post("/{story_id}/advance", response_model=StoryAdvanceResponse)
+def advance(
+    story_id: int,
+    request: StoryAdvanceRequest,
+    current_user: UserPrincipal = Depends(get_current_user),
+    idempotency_key: Optional[str] = Depends(get_idempotency_key),
+    db: Session = Depends(get_db)
+):
+    # One request per choice: validation, the save, progress and analytics share a single commit
+    with IdempotentRequest(db, current_user.id, f"POST /stories/{story_id}/advance", idempotency_key, request) as idem:
+        if idem.replay is not None:
+            return idem.replay
+
+        result = advance_story(db, current_user.id, story_id, request)
+        db.commit()
+
+        return fast_response(idem.save(result))
@@ -1,53 +1,135 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import Dict
+from datetime import date
+from typing import Dict, List, Literal, Optional
 from db.database import get_db
-from models.analytics_event import AnalyticsEvent
-from core.auth import get_current_user
-from models.user import User
+from core.analytics_engine import cohort_retention, event_arrays, funnel, story_percentiles
+from core.analytics_heatmap import story_heatmap
+from core.analytics_rollup import read_summary
+from core.analytics_writer import analytics_writer, event_row, insert_events
+from core.auth import UserPrincipal, get_current_admin, get_current_user
+from core.config import settings
+from schemas.analytics import AnalyticsEventBatch, AnalyticsEventBatchResponse
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+
+def _ingest(db: Session, rows: List[Dict]) -> None:
+    """
+    Hands rows to the bulk writer, or inserts them right away when write-behind is off.
+    Raises 503 with Retry-After when the writer's queue is full.
+    """
+    if not settings.ANALYTICS_WRITE_BEHIND:
+        insert_events(db, rows)
+        return
+    if not analytics_writer.enqueue(rows):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analytics ingestion is backed up, try again shortly",
+            headers={"Retry-After": str(settings.ANALYTICS_RETRY_AFTER_SECONDS)},
+        )
+
+
 @router.post("/event")
-def log_event(event: Dict, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def log_event(event: Dict, current_user: UserPrincipal = Depends(get_current_user), db: Session = Depends(get_db)):
     """
     Accepts { story_id, event_type, payload } and logs to analytics_events.
     """
-    ev = AnalyticsEvent(
-        user_id=current_user.id,
-        story_id=event.get("story_id"),
-        event_type=event["event_type"],
-        payload=event.get("payload", {})
-    )
-    db.add(ev)
-    db.commit()
+    _ingest(db, [event_row(current_user.id, event.get("story_id"), event["event_type"], event.get("payload", {}))])
     return {"message": "Event logged"}
 
+
+@router.post("/events", response_model=AnalyticsEventBatchResponse, status_code=status.HTTP_202_ACCEPTED)
+def log_events(
+    batch: AnalyticsEventBatch,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Accepts { events: [{ story_id, event_type, payload }, ...] }. The events are queued and written
+    in bulk shortly after; the whole batch is accepted or, under backpressure, none of it.
+    """
+    if len(batch.events) > settings.ANALYTICS_MAX_EVENTS_PER_REQUEST:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.ANALYTICS_MAX_EVENTS_PER_REQUEST} events per request",
+        )
+    _ingest(db, [event_row(current_user.id, e.story_id, e.event_type, e.payload) for e in batch.events])
+    return AnalyticsEventBatchResponse(accepted=len(batch.events))
+
 @router.get("/summary")
-def get_summary(db: Session = Depends(get_db)):
+def get_summary(
+    story_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: Optional[Literal["day", "story"]] = None,
+    db: Session = Depends(get_db),
+):
     """
-    Returns aggregated metrics:
+    Returns aggregated metrics, read from the daily rollups:
       - total_starts
       - total_choices
       - total_endings
       - total_wins
       - completion_rate
       - winning_rate
+    Optionally for one story and an inclusive UTC day range; `group_by=day|story` adds a breakdown.
+    """
+    return read_summary(db, story_id=story_id, start=start, end=end, group_by=group_by)
+
+
+@router.get("/stories/{story_id}/heatmap")
+def get_story_heatmap(
+    story_id: int,
+    current_user: UserPrincipal = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Per-story play analytics laid over the node graph:
+      - nodes: visits per node, and picks and pick rate per option
+      - drop_off: per depth, how many reached it, chose again, ended, or left
+      - endings: how often each ending was reached and its share
+      - unvisited_node_ids: reachable nodes nobody has visited
+    """
+    heatmap = story_heatmap(db, story_id)
+    if heatmap is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+    return heatmap
+
+
+@router.get("/funnel")
+def get_funnel(
+    story_id: Optional[int] = None,
+    group_by: List[Literal["theme", "signup_week", "story"]] = Query(default=[]),
+    current_user: UserPrincipal = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Started -> made a choice -> reached an ending -> won, over distinct (player, story) pairs.
+    `group_by` may be repeated, e.g. ?group_by=theme&group_by=signup_week.
+    """
+    return funnel(event_arrays.get(db), story_id=story_id, group_by=group_by)
+
+
+@router.get("/cohorts")
+def get_cohorts(
+    weeks: int = Query(default=8, ge=1, le=52),
+    current_user: UserPrincipal = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Weekly signup cohorts and the share of each that was active 0..weeks-1 weeks after signing up.
+    """
+    return cohort_retention(event_arrays.get(db), weeks=weeks)
+
+
+@router.get("/percentiles")
+def get_percentiles(
+    story_id: Optional[int] = None,
+    current_user: UserPrincipal = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Per story, p25/p50/p75/p90 of the choices made and seconds spent before a player's first ending.
     """
-    total_starts = db.query(AnalyticsEvent).filter(AnalyticsEvent.event_type == "start").count()
-    total_choices = db.query(AnalyticsEvent).filter(AnalyticsEvent.event_type == "choice").count()
-    total_endings = db.query(AnalyticsEvent).filter(AnalyticsEvent.event_type == "ending").count()
-    total_wins = db.query(AnalyticsEvent).filter(
-        AnalyticsEvent.event_type == "ending",
-        AnalyticsEvent.payload["is_winning_ending"].as_boolean() == True
-    ).count()
-    completion_rate = (total_endings / total_starts * 100) if total_starts else 0
-    winning_rate = (total_wins / total_endings * 100) if total_endings else 0
-    return {
-        "total_starts": total_starts,
-        "total_choices": total_choices,
-        "total_endings": total_endings,
-        "total_wins": total_wins,
-        "completion_rate": round(completion_rate, 1),
-        "winning_rate": round(winning_rate, 1)
-    }
+    return story_percentiles(event_arrays.get(db), story_id=story_id)
@@ -1,17 +1,21 @@
 from datetime import timedelta
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from db.database import get_db
 from models.user import User
 from schemas.auth import UserCreate, UserLogin, UserResponse, Token
 from core.auth import (
-    get_password_hash, 
-    verify_password, 
+    UserPrincipal,
     create_access_token, 
-    get_current_user
+    get_current_admin,
+    get_current_user_record,
+    principal_claims
 )
 from core.config import settings
+from core.password_hashing import password_hasher
 
 router = APIRouter(
     prefix="/auth",
@@ -19,47 +23,65 @@ router = APIRouter(
 )
 
 
-@router.post("/register", response_model=UserResponse)
-def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
-    # Check if user already exists
-    existing_user = db.query(User).filter(
-        (User.email == user_data.email) | (User.username == user_data.username)
-    ).first()
-    
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email or username already registered"
-        )
-    
-    # Create new user
+# Database steps run in the threadpool; the handlers are async so they can await the hash pool
+def _user_exists(db: Session, email: str, username: str) -> bool:
+    return db.query(User.id).filter((User.email == email) | (User.username == username)).first() is not None
+
+
+def _create_user(db: Session, user_data: UserCreate, hashed_password: str) -> User:
     db_user = User(
         email=user_data.email,
         username=user_data.username,
-        hashed_password=get_password_hash(user_data.password)
+        hashed_password=hashed_password
     )
-    
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
-    
     return db_user
 
 
+def _find_user(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+
+def _store_hash(db: Session, user: User, hashed_password: str) -> None:
+    user.hashed_password = hashed_password
+    db.commit()
+
+
+@router.post("/register", response_model=UserResponse)
+async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+    # Check if user already exists
+    if await run_in_threadpool(_user_exists, db, user_data.email, user_data.username):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email or username already registered"
+        )
+    
+    hashed_password = await password_hasher.hash(user_data.password)
+    return await run_in_threadpool(_create_user, db, user_data, hashed_password)
+
+
 @router.post("/login", response_model=Token)
-def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_find_user, db, user_credentials.email)
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    # Unknown emails still pay for a verify, so timing doesn't tell which accounts exist
+    verified = await password_hasher.verify(user_credentials.password, user.hashed_password if user else None)
+    if not user or not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # The bcrypt cost changed since this hash was made: we have the plaintext now, so move it over
+    if password_hasher.needs_rehash(user.hashed_password):
+        await run_in_threadpool(_store_hash, db, user, await password_hasher.hash(user_credentials.password))
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data={"sub": str(user.id), **principal_claims(user)},
         expires_delta=access_token_expires
     )
     
@@ -70,7 +92,7 @@ def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+def get_current_user_info(current_user: User = Depends(get_current_user_record)):
     return current_user
 
 
@@ -78,3 +100,9 @@ def get_current_user_info(current_user: User = Depends(get_current_user)):
 def logout_user():
     # Since we're using stateless JWT, logout is handled client-side
     return {"message": "Successfully logged out"}
+
+
+@router.get("/hashing-metrics")
+def get_hashing_metrics(current_user: UserPrincipal = Depends(get_current_admin)):
+    """Password hash pool load: in flight, queue depth, rejections and recent latency."""
+    return password_hasher.metrics()
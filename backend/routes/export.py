@@ -0,0 +1,49 @@
+from datetime import date
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from core.auth import UserPrincipal, get_current_admin
+from core.export import MEDIA_TYPES, export_stream
+
+router = APIRouter(prefix="/admin/export", tags=["admin"])
+
+ExportFormat = Literal["ndjson", "csv"]
+
+
+def _stream(kind: str, format: str, story_id: Optional[int], start: Optional[date], end: Optional[date]):
+    return StreamingResponse(
+        export_stream(kind, format, story_id=story_id, start=start, end=end),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{format}"'},
+    )
+
+
+@router.get("/analytics-events")
+def export_analytics_events(
+    format: ExportFormat = "ndjson",
+    story_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: UserPrincipal = Depends(get_current_admin),
+):
+    """
+    Streams analytics_events as NDJSON or CSV, optionally for one story and an inclusive UTC day
+    range on created_at. Memory use doesn't depend on how many rows match.
+    """
+    return _stream("analytics-events", format, story_id, start, end)
+
+
+@router.get("/save-games")
+def export_save_games(
+    format: ExportFormat = "ndjson",
+    story_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: UserPrincipal = Depends(get_current_admin),
+):
+    """
+    Streams save_games as NDJSON or CSV, filtered like the events export but on updated_at.
+    """
+    return _stream("save-games", format, story_id, start, end)
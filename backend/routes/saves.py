@@ -1,17 +1,35 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.orm import Session
 from datetime import datetime
+import base64
+import json
 
 from db.database import get_db
-from models.user import User
 from models.story import Story, StoryNode
-from models.save_game import SaveGame, UserStoryProgress
+from models.save_game import SaveGame, SaveJournalEntry, UserStoryProgress
 from schemas.save_game import (
     SaveGameCreate, SaveGameUpdate, SaveGameResponse, 
-    UserProgressResponse, ContinueGameResponse
+    UserProgressResponse, ContinueGameResponse,
+    SaveChoiceAppend, SaveChoiceResponse
 )
-from core.auth import get_current_user
+from core.auth import UserPrincipal, get_current_user
+from core.idempotency import IdempotentRequest, get_idempotency_key
+from core.story_window import load_node_window
+from core.story_graph import StoryGraphIndex, get_story_graph, get_story_graphs
+from core.etag import make_etag, not_modified, set_etag
+from core.serialization import fast_response
+from core.progress import update_user_progress
+from core.visited import visited_columns
+from core.autosave_buffer import BufferedAutosave, autosave_buffer
+from core.save_journal import (
+    SaveState, append_choice, compact_save, discard_journal, load_save_state, load_save_states
+)
+from core.advance import require_current_node, resolve_choice
+from core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
 router = APIRouter(
     prefix="/saves",
@@ -22,74 +40,172 @@ router = APIRouter(
 @router.post("/", response_model=SaveGameResponse)
 def create_save_game(
     save_data: SaveGameCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
+    idempotency_key: Optional[str] = Depends(get_idempotency_key),
     db: Session = Depends(get_db)
 ):
-    # Verify user owns the story session or story exists
-    story = db.query(Story).filter(Story.id == save_data.story_id).first()
-    if not story:
-        raise HTTPException(status_code=404, detail="Story not found")
-    
-    # Verify current node exists and belongs to story
-    current_node = db.query(StoryNode).filter(
-        StoryNode.id == save_data.current_node_id,
-        StoryNode.story_id == save_data.story_id
-    ).first()
-    if not current_node:
-        raise HTTPException(status_code=404, detail="Invalid current node")
-    
-    # Delete existing auto-save for this user/story if creating new auto-save
-    if save_data.is_auto_save:
-        existing_auto_save = db.query(SaveGame).filter(
-            SaveGame.user_id == current_user.id,
-            SaveGame.story_id == save_data.story_id,
-            SaveGame.is_auto_save == True
+    with IdempotentRequest(db, current_user.id, "POST /saves/", idempotency_key, save_data) as idem:
+        if idem.replay is not None:
+            return idem.replay
+
+        # Repeat autosaves only update the in-memory buffer; it is written out in batches
+        if save_data.is_auto_save and settings.AUTOSAVE_WRITE_BEHIND:
+            buffered = buffer_autosave(db, current_user.id, save_data)
+            if buffered is not None:
+                graph = get_story_graph(db, buffered.story_id)
+                return fast_response(idem.save(_buffered_save_response(buffered, graph)))
+
+        # Verify user owns the story session or story exists
+        story = db.query(Story).filter(Story.id == save_data.story_id).first()
+        if not story:
+            raise HTTPException(status_code=404, detail="Story not found")
+    
+        # Verify current node exists and belongs to story
+        current_node = db.query(StoryNode).filter(
+            StoryNode.id == save_data.current_node_id,
+            StoryNode.story_id == save_data.story_id
         ).first()
-        if existing_auto_save:
-            db.delete(existing_auto_save)
-    
-    # Create save game
-    save_game = SaveGame(
-        user_id=current_user.id,
-        story_id=save_data.story_id,
-        save_name=save_data.save_name,
-        current_node_id=save_data.current_node_id,
-        choices_made=save_data.choices_made,
-        nodes_visited=save_data.nodes_visited,
-        play_time_minutes=save_data.play_time_minutes,
-        is_auto_save=save_data.is_auto_save
-    )
-    
-    db.add(save_game)
-    db.commit()
-    db.refresh(save_game)
-    
-    # Update user progress
-    update_user_progress(db, current_user.id, save_data.story_id, save_data.nodes_visited)
+        if not current_node:
+            raise HTTPException(status_code=404, detail="Invalid current node")
+    
+        # Delete existing auto-save for this user/story if creating new auto-save
+        if save_data.is_auto_save:
+            existing_auto_save = db.query(SaveGame).filter(
+                SaveGame.user_id == current_user.id,
+                SaveGame.story_id == save_data.story_id,
+                SaveGame.is_auto_save == True
+            ).first()
+            if existing_auto_save:
+                autosave_buffer.forget(existing_auto_save.id)
+                discard_journal(db, existing_auto_save.id)
+                db.delete(existing_auto_save)
+    
+        # Create save game
+        save_game = SaveGame(
+            user_id=current_user.id,
+            story_id=save_data.story_id,
+            save_name=save_data.save_name,
+            current_node_id=save_data.current_node_id,
+            choices_made=save_data.choices_made,
+            play_time_minutes=save_data.play_time_minutes,
+            is_auto_save=save_data.is_auto_save,
+            updated_at=datetime.utcnow(),
+            **visited_columns(get_story_graph(db, save_data.story_id), save_data.nodes_visited)
+        )
     
-    return format_save_game_response(db, save_game)
+        db.add(save_game)
+        # Save and progress go out in one commit
+        update_user_progress(db, current_user.id, save_data.story_id, save_data.nodes_visited, commit=False)
+        db.commit()
+        db.refresh(save_game)
+
+        save_response = format_save_game_response(db, save_game)
+        if save_data.is_auto_save and settings.AUTOSAVE_WRITE_BEHIND:
+            # Remember the row so the next autosave for this story can be buffered
+            autosave_buffer.put(BufferedAutosave(
+                save_id=save_game.id,
+                user_id=save_game.user_id,
+                story_id=save_game.story_id,
+                save_name=save_game.save_name,
+                current_node_id=save_game.current_node_id,
+                choices_made=save_game.choices_made,
+                nodes_visited=save_response.nodes_visited,
+                play_time_minutes=save_game.play_time_minutes,
+                created_at=save_game.created_at,
+                updated_at=save_game.updated_at,
+                story_title=save_response.story_title,
+                node_preview=current_node.content[:101],
+                dirty=False,
+            ))
+    
+        return fast_response(idem.save(save_response))
 
 
 @router.get("/", response_model=List[SaveGameResponse])
 def get_user_saves(
+    request: Request,
+    response: Response,
     story_id: Optional[int] = None,
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(settings.SAVES_PAGE_SIZE, ge=1, le=settings.SAVES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     query = db.query(SaveGame).filter(SaveGame.user_id == current_user.id)
     
     if story_id:
         query = query.filter(SaveGame.story_id == story_id)
-    
-    saves = query.order_by(SaveGame.updated_at.desc()).all()
-    
-    return [format_save_game_response(db, save) for save in saves]
+
+    # One aggregate row versions the whole list: inserts and deletes move the count/max id,
+    # updates move max(updated_at), appended choices move the newest journal id
+    journal_version = (
+        db.query(func.max(SaveJournalEntry.id))
+        .join(SaveGame, SaveGame.id == SaveJournalEntry.save_id)
+        .filter(SaveGame.user_id == current_user.id)
+    )
+    if story_id:
+        journal_version = journal_version.filter(SaveGame.story_id == story_id)
+    version = query.with_entities(
+        func.count(SaveGame.id),
+        func.max(SaveGame.id),
+        func.max(SaveGame.updated_at),
+        journal_version.scalar_subquery(),
+    ).one()
+    etag = make_etag(
+        "saves", current_user.id, story_id, limit, cursor, autosave_buffer.user_version(current_user.id), *version
+    )
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_etag(response, etag)
+
+    # One joined query for the page: story title and a prefix of the current node's content come
+    # along as projected columns instead of two lookups per save
+    page_query = (
+        query.outerjoin(Story, Story.id == SaveGame.story_id)
+        .outerjoin(StoryNode, StoryNode.id == SaveGame.current_node_id)
+        .with_entities(*_SAVE_LIST_COLUMNS)
+    )
+    if cursor:
+        updated_at, last_id = decode_saves_cursor(cursor)
+        page_query = page_query.filter(or_(
+            SaveGame.updated_at < updated_at,
+            and_(SaveGame.updated_at == updated_at, SaveGame.id < last_id),
+        ))
+    rows = page_query.order_by(SaveGame.updated_at.desc(), SaveGame.id.desc()).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_saves_cursor(rows[-1].updated_at, rows[-1].id)
+
+    # Pending journal entries for the whole page in one query; saves whose current node moved
+    # need that node's preview instead of the joined one
+    states = load_save_states(db, rows)
+    moved = {states[row.id].current_node_id for row in rows if states[row.id].pending_entries}
+    previews = dict(
+        db.query(StoryNode.id, func.substr(StoryNode.content, 1, 101)).filter(StoryNode.id.in_(moved)).all()
+    ) if moved else {}
+
+    graphs = get_story_graphs(db, {row.story_id for row in rows})
+    buffered = autosave_buffer.pending_for_user(current_user.id)
+    return fast_response([
+        _buffered_save_response(buffered[row.id], graphs.get(row.story_id)) if row.id in buffered
+        else _save_row_response(
+            row,
+            states[row.id],
+            graphs.get(row.story_id),
+            previews.get(states[row.id].current_node_id) if states[row.id].pending_entries else row.node_content,
+        )
+        for row in rows
+    ], response)
 
 
 @router.get("/{save_id}", response_model=SaveGameResponse)
 def get_save_game(
     save_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     save = db.query(SaveGame).filter(
@@ -99,15 +215,28 @@ def get_save_game(
     
     if not save:
         raise HTTPException(status_code=404, detail="Save game not found")
-    
-    return format_save_game_response(db, save)
+
+    buffered = autosave_buffer.pending(save.id)
+    if buffered is not None:
+        etag = make_etag("save", save.id, save.created_at, buffered.updated_at, "buffered")
+    else:
+        state = load_save_state(db, save)
+        etag = make_etag("save", save.id, save.created_at, save.updated_at, state.journal_through)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_etag(response, etag)
+
+    if buffered is not None:
+        return fast_response(_buffered_save_response(buffered, get_story_graph(db, save.story_id)), response)
+    return fast_response(format_save_game_response(db, save, state), response)
 
 
 @router.put("/{save_id}", response_model=SaveGameResponse)
 def update_save_game(
     save_id: int,
     save_data: SaveGameUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     save = db.query(SaveGame).filter(
@@ -117,27 +246,34 @@ def update_save_game(
     
     if not save:
         raise HTTPException(status_code=404, detail="Save game not found")
+
+    # Write any buffered autosave and fold pending choices in first so the fields below
+    # overwrite the up-to-date state
+    flushed = autosave_buffer.flush(db, save_id=save.id, commit=False)
+    if compact_save(db, save.id) or flushed:
+        db.refresh(save)
     
     # Update fields
     update_data = save_data.model_dump(exclude_unset=True)
+    if update_data.get("nodes_visited") is not None:
+        update_data.update(visited_columns(get_story_graph(db, save.story_id), update_data.pop("nodes_visited")))
     for field, value in update_data.items():
         setattr(save, field, value)
     
     save.updated_at = datetime.utcnow()
+    # Update user progress if nodes_visited changed, in the same commit as the save
+    if save_data.nodes_visited:
+        update_user_progress(db, current_user.id, save.story_id, save_data.nodes_visited, commit=False)
     db.commit()
     db.refresh(save)
     
-    # Update user progress if nodes_visited changed
-    if save_data.nodes_visited:
-        update_user_progress(db, current_user.id, save.story_id, save_data.nodes_visited)
-    
-    return format_save_game_response(db, save)
+    return fast_response(format_save_game_response(db, save))
 
 
 @router.delete("/{save_id}")
 def delete_save_game(
     save_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     save = db.query(SaveGame).filter(
@@ -148,16 +284,55 @@ def delete_save_game(
     if not save:
         raise HTTPException(status_code=404, detail="Save game not found")
     
+    autosave_buffer.forget(save.id)
+    discard_journal(db, save.id)
     db.delete(save)
     db.commit()
     
     return {"message": "Save game deleted successfully"}
 
 
+@router.post("/{save_id}/choices", response_model=SaveChoiceResponse, status_code=status.HTTP_201_CREATED)
+def append_save_choice(
+    save_id: int,
+    choice: SaveChoiceAppend,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Cheap per-choice write: one journal insert instead of rewriting the save's choice and
+    # visited lists; the compactor folds the journal into the save later
+    owned = db.query(SaveGame.id, SaveGame.story_id).filter(
+        SaveGame.id == save_id,
+        SaveGame.user_id == current_user.id
+    ).first()
+    
+    if not owned:
+        raise HTTPException(status_code=404, detail="Save game not found")
+
+    # Same checks as /advance: both nodes are in the save's story and the edge is a real option
+    _, _, option = resolve_choice(db, owned.story_id, choice.node_id, choice.next_node_id)
+
+    # A buffered autosave snapshot goes first so the new choice lands on top of it
+    autosave_buffer.flush(db, save_id=save_id, commit=False)
+    # ...and the choice has to continue from where the save is
+    require_current_node(db, save_id, choice.node_id)
+    entry = append_choice(
+        db, save_id, choice.node_id, option.get("text", choice.option_text), choice.next_node_id,
+        choice.play_time_minutes
+    )
+    # Progress is a union of visited nodes, so the one new node is all it needs
+    update_user_progress(db, current_user.id, owned.story_id, [choice.next_node_id], commit=False)
+    result = SaveChoiceResponse(save_id=save_id, entry_id=entry.id, current_node_id=choice.next_node_id)
+    db.commit()
+
+    return result
+
+
 @router.post("/{save_id}/load", response_model=ContinueGameResponse)
 def load_save_game(
     save_id: int,
-    current_user: User = Depends(get_current_user),
+    depth: Optional[int] = Query(None, ge=0, le=5, description="only ship nodes this many choices ahead"),
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     save = db.query(SaveGame).filter(
@@ -168,8 +343,33 @@ def load_save_game(
     if not save:
         raise HTTPException(status_code=404, detail="Save game not found")
     
-    # Get complete story data
+    buffered = autosave_buffer.pending(save.id)
+    state = buffered.state() if buffered is not None else load_save_state(db, save)
+    save_response = (
+        _buffered_save_response(buffered, get_story_graph(db, save.story_id)) if buffered is not None
+        else format_save_game_response(db, save, state)
+    )
     story = db.query(Story).filter(Story.id == save.story_id).first()
+
+    # Windowed load: the current node and `depth` levels below it instead of the whole tree
+    if depth is not None:
+        window = load_node_window(db, save.story_id, state.current_node_id, depth)
+        node_dict = {node_id: node.model_dump() for node_id, node in window.nodes.items()} if window else {}
+        story_data = {
+            "id": story.id,
+            "title": story.title,
+            "session_id": story.session_id,
+            "created_at": story.created_at,
+            "all_nodes": node_dict,
+            "frontier": window.frontier if window else []
+        }
+        return fast_response({
+            "save_game": save_response,
+            "story": story_data,
+            "current_node": node_dict.get(state.current_node_id)
+        })
+
+    # Get complete story data
     story_nodes = db.query(StoryNode).filter(StoryNode.story_id == save.story_id).all()
     
     # Build story structure
@@ -198,27 +398,46 @@ def load_save_game(
     }
     
     # Get current node
-    current_node = node_dict.get(save.current_node_id)
+    current_node = node_dict.get(state.current_node_id)
     
-    return {
-        "save_game": format_save_game_response(db, save),
+    return fast_response({
+        "save_game": save_response,
         "story": story_data,
         "current_node": current_node
-    }
+    })
 
 
 @router.get("/progress/stories", response_model=List[UserProgressResponse])
 def get_user_progress(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: UserPrincipal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    progress_records = db.query(UserStoryProgress).filter(
-        UserStoryProgress.user_id == current_user.id
-    ).order_by(UserStoryProgress.last_played_at.desc()).all()
+    query = db.query(UserStoryProgress).filter(UserStoryProgress.user_id == current_user.id)
+
+    version = query.with_entities(
+        func.count(UserStoryProgress.id),
+        func.max(UserStoryProgress.id),
+        func.max(UserStoryProgress.last_played_at),
+        func.sum(UserStoryProgress.total_nodes_visited),
+        func.sum(UserStoryProgress.completion_percentage),
+    ).one()
+    etag = make_etag("progress", current_user.id, *version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    set_etag(response, etag)
+
+    progress_records = (
+        query.outerjoin(Story, Story.id == UserStoryProgress.story_id)
+        .with_entities(UserStoryProgress, Story.title, Story.node_count)
+        .order_by(UserStoryProgress.last_played_at.desc())
+        .all()
+    )
     
     result = []
-    for progress in progress_records:
-        story = db.query(Story).filter(Story.id == progress.story_id).first()
+    for progress, story_title, node_count in progress_records:
         progress_response = UserProgressResponse(
             id=progress.id,
             user_id=progress.user_id,
@@ -228,55 +447,197 @@ def get_user_progress(
             completion_percentage=progress.completion_percentage,
             first_played_at=progress.first_played_at,
             last_played_at=progress.last_played_at,
-            story_title=story.title if story else "Unknown Story"
+            story_title=story_title or "Unknown Story",
+            total_nodes=node_count
         )
         result.append(progress_response)
     
-    return result
+    return fast_response(result, response)
 
 
 # Helper functions
-def format_save_game_response(db: Session, save: SaveGame) -> SaveGameResponse:
+_SAVE_LIST_COLUMNS = (
+    SaveGame.id,
+    SaveGame.user_id,
+    SaveGame.story_id,
+    SaveGame.save_name,
+    SaveGame.current_node_id,
+    SaveGame.choices_made,
+    SaveGame.nodes_visited,
+    SaveGame.visited_bitmap,
+    SaveGame.play_time_minutes,
+    SaveGame.is_auto_save,
+    SaveGame.created_at,
+    SaveGame.updated_at,
+    SaveGame.journal_through,
+    Story.title.label("story_title"),
+    # One character past the preview length tells us whether to add the ellipsis
+    func.substr(StoryNode.content, 1, 101).label("node_content"),
+)
+
+
+def encode_saves_cursor(updated_at: datetime, save_id: int) -> str:
+    raw = json.dumps([updated_at.isoformat(), save_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_saves_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, save_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), int(save_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _content_preview(content: Optional[str]) -> Optional[str]:
+    if content is None:
+        return None
+    return content[:100] + "..." if len(content) > 100 else content
+
+
+def _save_row_response(
+    row, state: SaveState, graph: Optional[StoryGraphIndex], node_content: Optional[str]
+) -> SaveGameResponse:
+    return SaveGameResponse(
+        id=row.id,
+        user_id=row.user_id,
+        story_id=row.story_id,
+        save_name=row.save_name,
+        current_node_id=state.current_node_id,
+        choices_made=state.choices_made,
+        nodes_visited=state.nodes_visited,
+        play_time_minutes=state.play_time_minutes,
+        is_auto_save=row.is_auto_save,
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+        story_title=row.story_title or "Unknown Story",
+        current_node_content=_content_preview(node_content),
+        current_depth=graph.depth_of(state.current_node_id) if graph else None,
+        endings_reachable=graph.endings_reachable_from(state.current_node_id) if graph else None
+    )
+
+
+def _buffered_save_response(entry: BufferedAutosave, graph: Optional[StoryGraphIndex]) -> SaveGameResponse:
+    return SaveGameResponse(
+        id=entry.save_id,
+        user_id=entry.user_id,
+        story_id=entry.story_id,
+        save_name=entry.save_name,
+        current_node_id=entry.current_node_id,
+        choices_made=entry.choices_made,
+        nodes_visited=entry.nodes_visited,
+        play_time_minutes=entry.play_time_minutes,
+        is_auto_save=True,
+        created_at=entry.created_at,
+        updated_at=entry.updated_at,
+        story_title=entry.story_title or "Unknown Story",
+        current_node_content=_content_preview(entry.node_preview),
+        current_depth=graph.depth_of(entry.current_node_id) if graph else None,
+        endings_reachable=graph.endings_reachable_from(entry.current_node_id) if graph else None
+    )
+
+
+def buffer_autosave(db: Session, user_id: int, save_data: SaveGameCreate) -> Optional[BufferedAutosave]:
+    """
+    Puts an autosave into the write-behind buffer. Returns None when there is no autosave row for
+    this (user, story) yet; the caller then inserts one the normal way.
+
+    Costs two queries (the node check and the save's journal watermark) once the row is known
+    to this process.
+    """
+    node = db.query(StoryNode.story_id, func.substr(StoryNode.content, 1, 101)).filter(
+        StoryNode.id == save_data.current_node_id
+    ).first()
+    if not node or node.story_id != save_data.story_id:
+        if not db.query(Story.id).filter(Story.id == save_data.story_id).first():
+            raise HTTPException(status_code=404, detail="Story not found")
+        raise HTTPException(status_code=404, detail="Invalid current node")
+
+    known = autosave_buffer.get(user_id, save_data.story_id)
+    if known is None:
+        row = (
+            db.query(SaveGame.id, SaveGame.created_at, Story.title)
+            .outerjoin(Story, Story.id == SaveGame.story_id)
+            .filter(
+                SaveGame.user_id == user_id,
+                SaveGame.story_id == save_data.story_id,
+                SaveGame.is_auto_save == True
+            )
+            .first()
+        )
+        if row is None:
+            return None
+        save_id, created_at, story_title = row
+    else:
+        save_id, created_at, story_title = known.save_id, known.created_at, known.story_title
+
+    # The snapshot supersedes every journal entry written so far, folded or still pending
+    watermark = (
+        db.query(
+            SaveGame.journal_through,
+            select(func.max(SaveJournalEntry.id)).where(SaveJournalEntry.save_id == SaveGame.id).scalar_subquery(),
+        )
+        .filter(SaveGame.id == save_id)
+        .first()
+    )
+    if watermark is None:
+        # Deleted since it was buffered
+        autosave_buffer.forget(save_id)
+        return None
+
+    entry = BufferedAutosave(
+        save_id=save_id,
+        user_id=user_id,
+        story_id=save_data.story_id,
+        save_name=save_data.save_name,
+        current_node_id=save_data.current_node_id,
+        choices_made=save_data.choices_made,
+        nodes_visited=save_data.nodes_visited,
+        play_time_minutes=save_data.play_time_minutes,
+        created_at=created_at,
+        updated_at=datetime.utcnow(),
+        story_title=story_title,
+        node_preview=node[1],
+        journal_through=max(watermark[0] or 0, watermark[1] or 0),
+    )
+    if autosave_buffer.put(entry) >= settings.AUTOSAVE_FLUSH_MAX_PENDING:
+        autosave_buffer.flush()
+    return entry
+
+
+def fill_missing_updated_at(db: Session) -> None:
+    """
+    Saves created before updated_at was set on insert have it NULL, which would drop them out of
+    the keyset ordering; give them their creation time.
+    """
+    db.query(SaveGame).filter(SaveGame.updated_at.is_(None)).update(
+        {SaveGame.updated_at: SaveGame.created_at}, synchronize_session=False
+    )
+    db.commit()
+
+
+def format_save_game_response(db: Session, save: SaveGame, state: Optional[SaveState] = None) -> SaveGameResponse:
+    if state is None:
+        state = load_save_state(db, save)
     story = db.query(Story).filter(Story.id == save.story_id).first()
-    current_node = db.query(StoryNode).filter(StoryNode.id == save.current_node_id).first()
+    current_node = db.query(StoryNode).filter(StoryNode.id == state.current_node_id).first()
+    graph = get_story_graph(db, save.story_id)
     
     return SaveGameResponse(
         id=save.id,
         user_id=save.user_id,
         story_id=save.story_id,
         save_name=save.save_name,
-        current_node_id=save.current_node_id,
-        choices_made=save.choices_made,
-        nodes_visited=save.nodes_visited,
-        play_time_minutes=save.play_time_minutes,
+        current_node_id=state.current_node_id,
+        choices_made=state.choices_made,
+        nodes_visited=state.nodes_visited,
+        play_time_minutes=state.play_time_minutes,
         is_auto_save=save.is_auto_save,
         created_at=save.created_at,
         updated_at=save.updated_at,
         story_title=story.title if story else "Unknown Story",
-        current_node_content=current_node.content[:100] + "..." if current_node and len(current_node.content) > 100 else current_node.content if current_node else None
+        current_node_content=_content_preview(current_node.content) if current_node else None,
+        current_depth=graph.depth_of(state.current_node_id) if graph else None,
+        endings_reachable=graph.endings_reachable_from(state.current_node_id) if graph else None
     )
-
-
-def update_user_progress(db: Session, user_id: int, story_id: int, nodes_visited: List[int]):
-    progress = db.query(UserStoryProgress).filter(
-        UserStoryProgress.user_id == user_id,
-        UserStoryProgress.story_id == story_id
-    ).first()
-    
-    if not progress:
-        progress = UserStoryProgress(
-            user_id=user_id,
-            story_id=story_id,
-            total_nodes_visited=len(nodes_visited)
-        )
-        db.add(progress)
-    else:
-        progress.total_nodes_visited = max(progress.total_nodes_visited, len(nodes_visited))
-        progress.last_played_at = datetime.utcnow()
-    
-    # Calculate completion percentage (rough estimate)
-    total_story_nodes = db.query(StoryNode).filter(StoryNode.story_id == story_id).count()
-    if total_story_nodes > 0:
-        progress.completion_percentage = min(100, int((len(nodes_visited) / total_story_nodes) * 100))
-    
-    db.commit()
@@ -0,0 +1,17 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class AnalyticsEventIn(BaseModel):
+    story_id: Optional[int] = None
+    event_type: str = Field(min_length=1, max_length=64)
+    payload: Dict[str, Any] = {}
+
+
+class AnalyticsEventBatch(BaseModel):
+    events: List[AnalyticsEventIn]
+
+
+class AnalyticsEventBatchResponse(BaseModel):
+    accepted: int
@@ -19,5 +19,12 @@ class StoryJobResponse(BaseModel):
         from_attributes = True
 
 
+class StoryJobStatusEvent(StoryJobResponse):
+    stage: Optional[str] = None
+    attempts: int = 0
+    # Same value on every replica for the same job state (see core.job_status.snapshot_version)
+    version: int
+
+
 class StoryJobCreate(StoryJobBase):
     pass
\ No newline at end of file
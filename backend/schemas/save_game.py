@@ -1,6 +1,6 @@
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 
 
 class ChoiceMade(BaseModel):
@@ -15,6 +15,7 @@ class SaveGameCreate(BaseModel):
     current_node_id: int
     save_name: str
     choices_made: List[Dict[str, Any]] = []
+    # A set of node ids; the order is not kept (see SaveGameResponse.nodes_visited)
     nodes_visited: List[int] = []
     play_time_minutes: int = 0
     is_auto_save: bool = False
@@ -28,6 +29,19 @@ class SaveGameUpdate(BaseModel):
     play_time_minutes: Optional[int] = None
 
 
+class SaveChoiceAppend(BaseModel):
+    node_id: int
+    option_text: str
+    next_node_id: int
+    play_time_minutes: Optional[int] = None
+
+
+class SaveChoiceResponse(BaseModel):
+    save_id: int
+    entry_id: int
+    current_node_id: int
+
+
 class SaveGameResponse(BaseModel):
     id: int
     user_id: int
@@ -35,7 +49,10 @@ class SaveGameResponse(BaseModel):
     save_name: str
     current_node_id: int
     choices_made: List[Dict[str, Any]]
-    nodes_visited: List[int]
+    # Stored as a bitmap over the story's nodes, so this is a set: the order of play is in choices_made
+    nodes_visited: List[int] = Field(
+        description="Ids of the nodes visited, each once, in ascending id order (not the order they were visited)"
+    )
     play_time_minutes: int
     is_auto_save: bool
     created_at: datetime
@@ -45,6 +62,16 @@ class SaveGameResponse(BaseModel):
     story_title: Optional[str] = None
     current_node_content: Optional[str] = None
 
+    # From the story's graph index
+    current_depth: Optional[int] = None
+    endings_reachable: Optional[int] = None
+
+    @field_validator("nodes_visited")
+    @classmethod
+    def as_id_set(cls, v: List[int]) -> List[int]:
+        # Buffered and journaled saves haven't been through the bitmap yet
+        return sorted(set(v))
+
     class Config:
         from_attributes = True
 
@@ -61,6 +88,7 @@ class UserProgressResponse(BaseModel):
     
     # Story info
     story_title: Optional[str] = None
+    total_nodes: Optional[int] = None
 
     class Config:
         from_attributes = True
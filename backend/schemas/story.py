@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict
+from typing import List, Literal, Optional, Dict
 from datetime import datetime
 from pydantic import BaseModel
 
@@ -33,6 +33,9 @@ class StoryBase(BaseModel):
 
 class CreateStoryRequest(BaseModel):
     theme: str
+    # Scheduling tier; bulk/prewarm jobs run after interactive ones and are shed first under load.
+    # Only admins may ask for anything but interactive (see core.admission.resolve_priority)
+    priority: Literal["interactive", "bulk", "prewarm"] = "interactive"
 
 
 class CompleteStoryResponse(StoryBase):
@@ -42,4 +45,28 @@ class CompleteStoryResponse(StoryBase):
     all_nodes: Dict[int, CompleteStoryNodeResponse]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class StoryNodeWindowResponse(BaseModel):
+    story_id: int
+    node_id: int
+    depth: int
+    nodes: Dict[int, CompleteStoryNodeResponse]
+    # Loaded nodes whose children were cut off by `depth`; fetch them to prefetch further
+    frontier: List[int] = []
+
+
+class StoryAdvanceRequest(BaseModel):
+    from_node_id: int
+    next_node_id: int
+    # Save to append the choice to; defaults to the player's autosave for the story
+    save_id: Optional[int] = None
+    play_time_minutes: Optional[int] = None
+
+
+class StoryAdvanceResponse(BaseModel):
+    story_id: int
+    save_id: int
+    journal_entry_id: Optional[int] = None
+    node: CompleteStoryNodeResponse
+    endings_reachable: Optional[int] = None
@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings and the engine are built at import time, so point them at a scratch directory first
+_work_dir = tempfile.mkdtemp()
+os.makedirs(os.path.join(_work_dir, "generated_images"))
+os.chdir(_work_dir)
+os.environ["DATABASE_URL"] = f"sqlite:///{_work_dir}/test.db"
+os.environ["RUN_EMBEDDED_WORKER"] = "False"
+os.environ["ADMIN_EMAILS"] = "admin@example.com"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from core.models import StoryLLMResponse  # noqa: E402
+from core.story_generator import StoryGenerator  # noqa: E402
+from db.database import SessionLocal  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def auth_headers(client):
+    def login(name: str = "player"):
+        client.post("/api/auth/register", json={"email": f"{name}@example.com", "username": name, "password": "pw12345"})
+        response = client.post("/api/auth/login", json={"email": f"{name}@example.com", "password": "pw12345"})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return login
+
+
+def _node(depth: int) -> dict:
+    prompts = {"image_prompt_1": "a", "image_prompt_2": "b"}
+    if depth == 0:
+        return {"content": "The end.", **prompts, "isEnding": True, "isWinningEnding": True}
+    return {
+        "content": f"Depth {depth}",
+        **prompts,
+        "isEnding": False,
+        "isWinningEnding": False,
+        "options": [{"text": "Left", "nextNode": _node(depth - 1)}, {"text": "Right", "nextNode": _node(depth - 1)}],
+    }
+
+
+@pytest.fixture
+def make_story():
+    """Stores a binary story `depth` choices deep and returns it with its root node."""
+    def make(db, depth: int = 2):
+        story = StoryGenerator.persist_story(
+            db, StoryLLMResponse.model_validate({"title": "T", "rootNode": _node(depth)}), "session", None,
+            generate_images=False,
+        )
+        db.commit()
+        return story, next(node for node in story.nodes if node.is_root)
+
+    return make
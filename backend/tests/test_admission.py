@@ -0,0 +1,18 @@
+from core.job_queue import PRIORITY_BULK
+from models.job import StoryJob
+
+
+def test_only_admins_pick_a_priority_tier(client, db, auth_headers):
+    headers = auth_headers("player")
+    response = client.post("/api/stories/create", json={"theme": "caves", "priority": "bulk"}, headers=headers)
+    assert response.status_code == 403
+
+    response = client.post("/api/stories/create", json={"theme": "caves"}, headers=headers)
+    assert response.status_code == 200
+
+    response = client.post(
+        "/api/stories/create", json={"theme": "caves", "priority": "bulk"}, headers=auth_headers("admin")
+    )
+    assert response.status_code == 200
+    job = db.query(StoryJob).filter(StoryJob.job_id == response.json()["job_id"]).one()
+    assert job.priority == PRIORITY_BULK
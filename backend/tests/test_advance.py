@@ -0,0 +1,37 @@
+from models.story import StoryNode
+
+
+def _advance(client, headers, story, from_id, next_id):
+    return client.post(
+        f"/api/stories/{story.id}/advance",
+        json={"from_node_id": from_id, "next_node_id": next_id},
+        headers=headers,
+    )
+
+
+def _children(db, node_id):
+    node = db.query(StoryNode).filter(StoryNode.id == node_id).one()
+    return [o["node_id"] for o in node.options]
+
+
+def test_advance_only_continues_from_the_saves_current_node(client, db, auth_headers, make_story):
+    headers = auth_headers("walker")
+    story, root = make_story(db)
+    left, right = _children(db, root.id)
+
+    assert _advance(client, headers, story, root.id, left).status_code == 200
+    # Replayed from a node the save already left
+    assert _advance(client, headers, story, root.id, right).status_code == 409
+    # A real edge, but from a node the save never reached
+    assert _advance(client, headers, story, right, _children(db, right)[0]).status_code == 409
+
+    response = _advance(client, headers, story, left, _children(db, left)[0])
+    assert response.status_code == 200
+
+
+def test_a_new_save_starts_at_the_root(client, db, auth_headers, make_story):
+    headers = auth_headers("jumper")
+    story, root = make_story(db)
+    left = _children(db, root.id)[0]
+
+    assert _advance(client, headers, story, left, _children(db, left)[0]).status_code == 409
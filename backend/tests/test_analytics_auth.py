@@ -0,0 +1,18 @@
+import pytest
+
+ADMIN_ONLY = [
+    "/api/analytics/funnel",
+    "/api/analytics/cohorts",
+    "/api/analytics/percentiles",
+    "/api/analytics/stories/{story_id}/heatmap",
+]
+
+
+@pytest.mark.parametrize("path", ADMIN_ONLY)
+def test_analytics_reports_require_an_admin(client, db, auth_headers, make_story, path):
+    story, _ = make_story(db)
+    url = path.format(story_id=story.id)
+
+    assert client.get(url).status_code in (401, 403)
+    assert client.get(url, headers=auth_headers("player")).status_code == 403
+    assert client.get(url, headers=auth_headers("admin")).status_code == 200
@@ -0,0 +1,60 @@
+import threading
+
+from sqlalchemy import func
+
+from core import analytics_engine
+from core.analytics_engine import EventArrayCache
+from core.analytics_writer import event_row, write_events
+from db.database import SessionLocal
+from models.analytics_event import AnalyticsEvent
+
+
+def _start(db, story_id: int, event_id: int) -> None:
+    write_events(db, [{**event_row(None, story_id, "start", {}), "id": event_id}])
+    db.commit()
+
+
+def test_late_committed_event_gets_into_the_arrays(db, make_story):
+    story, _ = make_story(db)
+    base = (db.query(func.max(AnalyticsEvent.id)).scalar() or 0) + 100
+    cache = EventArrayCache(min_refresh_seconds=0)
+
+    _start(db, story.id, base + 10)
+    assert base + 10 in cache.get(db).id
+
+    # A lower id that commits after a higher one was already read
+    _start(db, story.id, base + 5)
+    ids = list(cache.get(db).id)
+    assert ids.count(base + 5) == 1 and ids.count(base + 10) == 1
+
+
+def test_readers_do_not_wait_for_a_refresh(db, monkeypatch):
+    cache = EventArrayCache(min_refresh_seconds=0)
+    previous = cache.get(db)
+
+    loading, release = threading.Event(), threading.Event()
+    load_chunks = analytics_engine._load_chunks
+
+    def slow_load_chunks(*args, **kwargs):
+        loading.set()
+        release.wait(10)
+        return load_chunks(*args, **kwargs)
+
+    monkeypatch.setattr(analytics_engine, "_load_chunks", slow_load_chunks)
+
+    def refresh():
+        session = SessionLocal()
+        try:
+            cache.get(session)
+        finally:
+            session.close()
+
+    refresher = threading.Thread(target=refresh)
+    refresher.start()
+    try:
+        assert loading.wait(10)
+        assert cache.get(db) is previous
+    finally:
+        release.set()
+        refresher.join()
+    assert cache.get(db) is not previous
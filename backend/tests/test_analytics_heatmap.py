@@ -0,0 +1,30 @@
+from sqlalchemy import func
+
+from core import analytics_heatmap
+from core.analytics_heatmap import get_heatmap_counters
+from core.analytics_writer import event_row, write_events
+from core.config import settings
+from models.analytics_event import AnalyticsEvent
+
+
+def _start(db, story_id: int, event_id: int) -> None:
+    write_events(db, [{**event_row(None, story_id, "start", {}), "id": event_id}])
+    db.commit()
+
+
+def test_late_committed_event_is_counted_once(db, make_story, monkeypatch):
+    story, _ = make_story(db)
+    base = (db.query(func.max(AnalyticsEvent.id)).scalar() or 0) + 100
+
+    _start(db, story.id, base + 10)
+    assert get_heatmap_counters(db, story.id).starts == 1
+
+    # A lower id that commits after a higher one was already read
+    _start(db, story.id, base + 5)
+    assert get_heatmap_counters(db, story.id).starts == 2
+
+    # Once settled the events are folded into the cached counters, still once each
+    monkeypatch.setattr(settings, "ANALYTICS_COMMIT_GRACE_SECONDS", 0.0)
+    assert get_heatmap_counters(db, story.id).starts == 2
+    assert get_heatmap_counters(db, story.id).starts == 2
+    assert analytics_heatmap._counters_cache.get(story.id).watermark.settled_id == base + 10
@@ -0,0 +1,15 @@
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from core.analytics_rollup import utc_day
+from models.analytics_event import AnalyticsEvent
+
+
+def test_postgres_days_are_taken_in_utc():
+    dialect = postgresql.dialect()
+    pg_session = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=dialect))
+
+    sql = str(utc_day(pg_session, AnalyticsEvent.created_at).compile(dialect=dialect))
+
+    assert sql.startswith("CAST(timezone(") and sql.endswith("AS DATE)")
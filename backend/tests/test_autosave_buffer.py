@@ -0,0 +1,55 @@
+from core.autosave_buffer import autosave_buffer
+from core.save_journal import append_choice
+from models.save_game import SaveJournalEntry
+
+
+def _autosave(client, headers, story, node_id):
+    return client.post(
+        "/api/saves/",
+        json={
+            "story_id": story.id, "current_node_id": node_id, "save_name": "Autosave",
+            "nodes_visited": [node_id], "is_auto_save": True,
+        },
+        headers=headers,
+    ).json()
+
+
+def test_flush_keeps_choices_appended_after_the_snapshot(client, db, auth_headers, make_story):
+    headers = auth_headers("racer")
+    story, root = make_story(db)
+    save = _autosave(client, headers, story, root.id)
+    child_id = root.options[0]["node_id"]
+    child = next(node for node in story.nodes if node.id == child_id)
+
+    # Buffered, not written yet
+    _autosave(client, headers, story, child_id)
+    assert autosave_buffer.pending(save["id"]) is not None
+    # Another worker journals a choice before the snapshot is flushed
+    entry = append_choice(db, save["id"], child.id, "Left", child.options[0]["node_id"])
+    db.commit()
+
+    assert autosave_buffer.flush() == 1
+
+    db.expire_all()
+    assert db.query(SaveJournalEntry).filter(SaveJournalEntry.id == entry.id).count() == 1
+    state = client.get(f"/api/saves/{save['id']}", headers=headers).json()
+    assert state["current_node_id"] == child.options[0]["node_id"]
+
+
+def test_flush_into_a_callers_transaction_leaves_the_commit_to_it(client, db, auth_headers, make_story):
+    headers = auth_headers("owner")
+    story, root = make_story(db)
+    save = _autosave(client, headers, story, root.id)
+    _autosave(client, headers, story, root.options[0]["node_id"])
+
+    assert autosave_buffer.flush(db, save_id=save["id"], commit=False) == 1
+    assert db.in_transaction()
+    # The caller gives up: the snapshot goes back into the buffer instead of being lost
+    db.rollback()
+    assert autosave_buffer.pending(save["id"]) is not None
+
+    assert autosave_buffer.flush(db, save_id=save["id"], commit=False) == 1
+    db.commit()
+    assert autosave_buffer.pending(save["id"]) is None
+    state = client.get(f"/api/saves/{save['id']}", headers=headers).json()
+    assert state["current_node_id"] == root.options[0]["node_id"]
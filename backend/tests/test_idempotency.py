@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+from core.config import settings
+from core.idempotency import _request_hash
+from models.idempotency_key import IdempotencyKey
+from schemas.save_game import SaveGameCreate
+
+
+def _reserve(db, user_id, key, payload_hash, reserved_at):
+    db.add(IdempotencyKey(
+        user_id=user_id, scope="POST /saves/", key=key, request_hash=payload_hash,
+        reserved_at=reserved_at, expires_at=datetime.now(timezone.utc) + timedelta(days=1),
+    ))
+    db.commit()
+
+
+def _post(client, headers, story, root, key):
+    return client.post(
+        "/api/saves/",
+        json={"story_id": story.id, "current_node_id": root.id, "save_name": "s", "nodes_visited": [root.id]},
+        headers={**headers, "Idempotency-Key": key},
+    )
+
+
+def _user_id(client, headers):
+    return client.get("/api/auth/me", headers=headers).json()["id"]
+
+
+def _payload_hash(story, root):
+    return _request_hash(SaveGameCreate(
+        story_id=story.id, current_node_id=root.id, save_name="s", nodes_visited=[root.id]
+    ))
+
+
+def test_abandoned_reservation_is_taken_over(client, db, auth_headers, make_story):
+    headers = auth_headers("crashed")
+    story, root = make_story(db)
+    stale = datetime.now(timezone.utc) - timedelta(seconds=settings.IDEMPOTENCY_RESERVATION_SECONDS + 5)
+    _reserve(db, _user_id(client, headers), "stale-key", _payload_hash(story, root), stale)
+
+    first = _post(client, headers, story, root, "stale-key")
+    replay = _post(client, headers, story, root, "stale-key")
+
+    assert first.status_code == 200
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["id"] == first.json()["id"]
+
+
+def test_live_reservation_still_conflicts(client, db, auth_headers, make_story):
+    headers = auth_headers("inflight")
+    story, root = make_story(db)
+    _reserve(db, _user_id(client, headers), "busy-key", _payload_hash(story, root), datetime.now(timezone.utc))
+
+    assert _post(client, headers, story, root, "busy-key").status_code == 409
+
+
+def test_failed_request_releases_its_reservation(client, db, auth_headers, make_story):
+    headers = auth_headers("failing")
+    story, root = make_story(db)
+    response = client.post(
+        "/api/saves/",
+        json={"story_id": story.id, "current_node_id": 987654, "save_name": "s", "nodes_visited": []},
+        headers={**headers, "Idempotency-Key": "failing-key"},
+    )
+
+    assert response.status_code == 404
+    assert db.query(IdempotencyKey).filter(IdempotencyKey.key == "failing-key").count() == 0
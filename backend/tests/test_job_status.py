@@ -0,0 +1,65 @@
+import asyncio
+import uuid
+
+from core.job_status import JobStatusBroadcaster, job_snapshot, job_status, poll_watched_jobs, snapshot_version
+from models.job import StoryJob
+
+
+def _snapshot(status, attempts=0, stage=None):
+    return {"job_id": "j", "status": status, "stage": stage, "attempts": attempts}
+
+
+def test_versions_only_grow_as_the_job_moves_on():
+    states = [
+        _snapshot("pending"),
+        _snapshot("processing", 1),
+        _snapshot("processing", 1, "generating_text"),
+        _snapshot("processing", 1, "validating"),
+        _snapshot("processing", 2),  # lease expired and another worker re-claimed it
+        _snapshot("processing", 2, "generating_images"),
+        _snapshot("completed", 2),
+    ]
+    versions = [snapshot_version(s) for s in states]
+    assert versions == sorted(versions)
+    assert len(set(versions)) == len(versions)
+    assert versions[0] > 0
+
+
+def test_publish_ignores_snapshots_that_are_not_newer():
+    broadcaster = JobStatusBroadcaster()
+    with_stage = broadcaster.publish(_snapshot("processing", 1, "validating"), propagate=False)
+    # A row read from the database carries no stage
+    assert broadcaster.publish(_snapshot("processing", 1), propagate=False) is with_stage
+    assert broadcaster.publish(_snapshot("completed", 1), propagate=False)["status"] == "completed"
+
+
+def test_one_poll_wakes_waiters(db):
+    job = StoryJob(job_id=str(uuid.uuid4()), session_id="s", theme="t", status="pending")
+    db.add(job)
+    db.commit()
+    pending = job_status.publish(job_snapshot(job), propagate=False)
+
+    async def scenario():
+        waiter = asyncio.create_task(job_status.wait_for_update(job.job_id, pending["version"], 5.0))
+        await asyncio.sleep(0.05)
+        assert job.job_id in job_status.watched_job_ids()
+        job.status, job.attempts = "processing", 1
+        db.commit()
+        assert await asyncio.to_thread(poll_watched_jobs) >= 1
+        return await waiter
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["status"] == "processing"
+    assert snapshot["version"] > pending["version"]
+    assert job.job_id not in job_status.watched_job_ids()
+
+
+def test_job_endpoint_only_returns_schema_fields(client, db):
+    job = StoryJob(job_id=str(uuid.uuid4()), session_id="s", theme="t", status="completed", attempts=2)
+    db.add(job)
+    db.commit()
+    job_status.publish(job_snapshot(job), propagate=False)
+
+    body = client.get(f"/api/jobs/{job.job_id}").json()
+
+    assert set(body) == {"job_id", "status", "created_at", "story_id", "completed_at", "error"}
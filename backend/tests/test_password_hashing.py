@@ -0,0 +1,22 @@
+import asyncio
+import threading
+
+from core.password_hashing import PasswordHasher
+
+
+def test_pool_does_not_fork_a_threaded_process():
+    # Forking while another thread holds a lock can leave the worker waiting on it forever
+    hasher = PasswordHasher(workers=1, max_pending=4, rounds=4)
+    stop = threading.Event()
+    threading.Thread(target=stop.wait, daemon=True).start()
+
+    async def hash_and_verify():
+        hashed = await asyncio.wait_for(hasher.hash("pw12345"), 30)
+        return await asyncio.wait_for(hasher.verify("pw12345", hashed), 30)
+
+    try:
+        assert asyncio.run(hash_and_verify())
+        assert hasher._pool()._mp_context.get_start_method() != "fork"
+    finally:
+        stop.set()
+        hasher.shutdown()
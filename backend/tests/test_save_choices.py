@@ -0,0 +1,83 @@
+def _save(client, headers, story, root):
+    response = client.post(
+        "/api/saves/",
+        json={"story_id": story.id, "current_node_id": root.id, "save_name": "s", "nodes_visited": [root.id]},
+        headers=headers,
+    )
+    return response.json()
+
+
+def test_append_choice_follows_a_real_option(client, db, auth_headers, make_story):
+    headers = auth_headers("chooser")
+    story, root = make_story(db)
+    save = _save(client, headers, story, root)
+    next_node_id = root.options[0]["node_id"]
+
+    response = client.post(
+        f"/api/saves/{save['id']}/choices",
+        json={"node_id": root.id, "option_text": "Left", "next_node_id": next_node_id},
+        headers=headers,
+    )
+
+    assert response.status_code == 201
+    assert response.json()["current_node_id"] == next_node_id
+
+
+def test_append_choice_rejects_invalid_edges(client, db, auth_headers, make_story):
+    headers = auth_headers("cheater")
+    story, root = make_story(db)
+    other_story, other_root = make_story(db)
+    save = _save(client, headers, story, root)
+    grandchild = next(n for n in story.nodes if n.id not in (root.id, *(o["node_id"] for o in root.options)))
+
+    unknown = client.post(
+        f"/api/saves/{save['id']}/choices",
+        json={"node_id": root.id, "option_text": "x", "next_node_id": 424242},
+        headers=headers,
+    )
+    other = client.post(
+        f"/api/saves/{save['id']}/choices",
+        json={"node_id": root.id, "option_text": "x", "next_node_id": other_root.options[0]["node_id"]},
+        headers=headers,
+    )
+    skipped = client.post(
+        f"/api/saves/{save['id']}/choices",
+        json={"node_id": root.id, "option_text": "x", "next_node_id": grandchild.id},
+        headers=headers,
+    )
+
+    assert unknown.status_code == 404
+    assert other.status_code == 404
+    assert skipped.status_code == 400
+    state = client.get(f"/api/saves/{save['id']}", headers=headers).json()
+    assert state["current_node_id"] == root.id
+    assert state["nodes_visited"] == [root.id]
+
+
+def test_append_choice_continues_from_the_current_node(client, db, auth_headers, make_story):
+    headers = auth_headers("skipper")
+    story, root = make_story(db)
+    save = _save(client, headers, story, root)
+    left, right = (o["node_id"] for o in root.options)
+    right_child = next(n for n in story.nodes if n.id == right).options[0]["node_id"]
+
+    first = client.post(
+        f"/api/saves/{save['id']}/choices",
+        json={"node_id": root.id, "option_text": "Left", "next_node_id": left},
+        headers=headers,
+    )
+    stale = client.post(
+        f"/api/saves/{save['id']}/choices",
+        json={"node_id": root.id, "option_text": "Right", "next_node_id": right},
+        headers=headers,
+    )
+    forged = client.post(
+        f"/api/saves/{save['id']}/choices",
+        json={"node_id": right, "option_text": "Left", "next_node_id": right_child},
+        headers=headers,
+    )
+
+    assert first.status_code == 201
+    assert stale.status_code == 409
+    assert forged.status_code == 409
+    assert client.get(f"/api/saves/{save['id']}", headers=headers).json()["current_node_id"] == left
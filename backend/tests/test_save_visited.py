@@ -0,0 +1,15 @@
+def test_nodes_visited_reads_back_as_a_sorted_set(client, db, auth_headers, make_story):
+    headers = auth_headers("visitor")
+    story, root = make_story(db)
+    child = root.options[1]["node_id"]
+    body = {"story_id": story.id, "current_node_id": child, "nodes_visited": [child, root.id, child]}
+
+    manual = client.post("/api/saves/", json={**body, "save_name": "s"}, headers=headers).json()
+    client.post("/api/saves/", json={**body, "save_name": "Autosave", "is_auto_save": True}, headers=headers)
+    # The second autosave is only in the write-behind buffer
+    buffered = client.post(
+        "/api/saves/", json={**body, "save_name": "Autosave", "is_auto_save": True}, headers=headers
+    ).json()
+
+    assert manual["nodes_visited"] == sorted({root.id, child})
+    assert buffered["nodes_visited"] == sorted({root.id, child})
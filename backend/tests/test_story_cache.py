@@ -0,0 +1,25 @@
+import json
+
+from core import story_cache
+from core.story_cache import get_story_tree_json
+from db.database import SessionLocal
+from models.story import Story
+
+
+def test_tree_backfill_does_not_commit_the_callers_session(db, make_story, monkeypatch):
+    story, root = make_story(db)
+    db.query(Story).filter(Story.id == story.id).update({Story.complete_tree_json: None})
+    db.commit()
+    story_cache._tree_cache.pop(story.id)
+
+    commits = []
+    monkeypatch.setattr(db, "commit", lambda: commits.append(True))
+    payload = get_story_tree_json(db, story.id)
+
+    assert json.loads(payload)["root_node"]["id"] == root.id
+    assert commits == []
+    check = SessionLocal()
+    try:
+        assert check.query(Story.complete_tree_json).filter(Story.id == story.id).scalar() == payload.decode()
+    finally:
+        check.close()
@@ -0,0 +1,11 @@
+def test_complete_story_revalidates_only_existing_stories(client, db, make_story):
+    story, _ = make_story(db)
+
+    first = client.get(f"/api/stories/{story.id}/complete")
+    etag = first.headers["ETag"]
+    again = client.get(f"/api/stories/{story.id}/complete", headers={"If-None-Match": etag})
+    missing = client.get("/api/stories/424242/complete", headers={"If-None-Match": "*"})
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert missing.status_code == 404
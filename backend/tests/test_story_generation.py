@@ -0,0 +1,27 @@
+import core.story_generator as story_generator
+from core.models import StoryLLMResponse
+from core.story_generator import StoryGenerator
+from models.story import Story
+
+
+def test_precompute_failure_keeps_the_generated_story(client, db, monkeypatch):
+    structure = StoryLLMResponse.model_validate({
+        "title": "Saved anyway",
+        "rootNode": {"content": "The end.", "image_prompt_1": "a", "image_prompt_2": "b", "isEnding": True, "isWinningEnding": True},
+    })
+    monkeypatch.setattr(StoryGenerator, "build_story_structure", classmethod(lambda cls, theme, on_progress=None: structure))
+    monkeypatch.setattr(StoryGenerator, "_generate_image_url", classmethod(lambda cls, prompt, *args: prompt))
+
+    def broken_precompute(db, story, commit=True):
+        raise RuntimeError("serializer exploded")
+
+    monkeypatch.setattr(story_generator, "precompute_story_tree", broken_precompute)
+
+    story = StoryGenerator.generate_story(db, "session", "theme")
+
+    assert db.query(Story).filter(Story.id == story.id, Story.title == "Saved anyway").count() == 1
+    monkeypatch.undo()
+    # The read path builds the missing tree
+    response = client.get(f"/api/stories/{story.id}/complete")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Saved anyway"
@@ -0,0 +1,24 @@
+from core import story_graph
+from core.story_graph import GRAPH_INDEX_VERSION, get_story_graph
+from db.database import SessionLocal
+from models.story import Story
+
+
+def test_backfill_does_not_commit_the_callers_session(db, make_story, monkeypatch):
+    story, root = make_story(db)
+    db.query(Story).filter(Story.id == story.id).update({Story.graph_index: None})
+    db.commit()
+    story_graph._graph_cache.pop(story.id)
+
+    commits = []
+    monkeypatch.setattr(db, "commit", lambda: commits.append(True))
+    index = get_story_graph(db, story.id)
+
+    assert index.root_id == root.id
+    assert commits == []
+    check = SessionLocal()
+    try:
+        stored = check.query(Story).filter(Story.id == story.id).one()
+        assert stored.graph_index["v"] == GRAPH_INDEX_VERSION
+    finally:
+        check.close()
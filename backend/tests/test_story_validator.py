@@ -0,0 +1,48 @@
+from core.story_generator import StoryGenerator
+from core.story_validator import DEAD_END, NO_WINNING_ENDING, TOO_SHALLOW, get_node, iter_nodes, validate_tree
+
+
+def _scene(content, *children):
+    return {"content": content, "isEnding": False, "options": [{"text": c["content"], "nextNode": c} for c in children]}
+
+
+def _ending(content, winning=False):
+    return {"content": content, "isEnding": True, "isWinningEnding": winning}
+
+
+def _issues(root, kind):
+    return [issue for issue in validate_tree(root) if issue.kind == kind]
+
+
+def test_no_winning_ending_targets_the_deepest_ending():
+    root = _scene("root", _ending("lose early"), _scene("deeper", _ending("lose late"), _ending("lose too")))
+    assert [issue.path for issue in _issues(root, NO_WINNING_ENDING)] == [(1, 0)]
+
+
+def test_no_winning_ending_without_endings_targets_the_deepest_dead_end_not_the_root():
+    root = _scene("root", _scene("a"), _scene("b", _scene("b1"), _scene("b2")))
+    assert [issue.path for issue in _issues(root, NO_WINNING_ENDING)] == [(1, 0)]
+
+
+def test_too_shallow_is_reported():
+    root = _scene("root", _ending("win", winning=True), _ending("lose"))
+    assert [issue.kind for issue in validate_tree(root)] == [TOO_SHALLOW]
+
+
+def test_repair_keeps_the_root_and_the_repaired_subtrees(monkeypatch):
+    def fake_prompt(llm, theme, history, scene, instruction):
+        if "player wins" in instruction:
+            return _ending(f"{scene}, won", winning=True)
+        return _scene(scene, _ending(f"{scene} / left"), _ending(f"{scene} / right"))
+
+    monkeypatch.setattr(StoryGenerator, "_invoke_node_prompt", classmethod(lambda cls, *args: fake_prompt(*args)))
+    root = _scene("root", _scene("a"), _scene("b"))
+
+    StoryGenerator._repair_structure(None, "theme", root)
+
+    assert root["content"] == "root"
+    assert not _issues(root, DEAD_END) and not _issues(root, NO_WINNING_ENDING)
+    # "a" became the winning ending instead of being continued; "b" was continued with two endings
+    assert get_node(root, (0,)) == _ending("a, won", winning=True)
+    assert [o["nextNode"]["content"] for o in get_node(root, (1,))["options"]] == ["b / left", "b / right"]
+    assert sum(1 for _, node in iter_nodes(root) if node.get("isWinningEnding")) == 1
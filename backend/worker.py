@@ -0,0 +1,85 @@
+"""
+Standalone story generation worker.
+
+Run from the backend directory, as many processes and on as many nodes as needed:
+
+    python -m worker --concurrency 2
+
+Each worker leases jobs from the story_jobs table (see core/job_queue.py), so jobs survive API restarts
+and a crashed worker's job is picked up again once its lease expires.
+"""
+import argparse
+import logging
+import signal
+import threading
+from logging.config import dictConfig
+
+from core.config import settings
+from core.job_queue import make_worker_id, work_once
+from db.database import create_tables
+# Import all models to ensure they're registered with SQLAlchemy
+from models.user import User
+from models.story import Story, StoryNode
+from models.job import StoryJob
+from models.save_game import SaveGame, UserStoryProgress
+
+dictConfig({
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"default": {"format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"}},
+    "handlers": {"console": {"class": "logging.StreamHandler", "formatter": "default", "level": "DEBUG"}},
+    "loggers": {"app": {"handlers": ["console"], "level": "INFO", "propagate": False}},
+    "root": {"handlers": ["console"], "level": "INFO"},
+})
+
+logger = logging.getLogger("app.worker")
+
+
+def run_worker(stop_event: threading.Event, poll_interval: float, once: bool = False) -> None:
+    worker_id = make_worker_id()
+    logger.info("Worker %s started", worker_id)
+    while not stop_event.is_set():
+        try:
+            did_work = work_once(worker_id)
+        except Exception as e:
+            logger.error("Worker %s loop error: %s", worker_id, e, exc_info=True)
+            did_work = False
+        if once:
+            break
+        if not did_work:
+            stop_event.wait(poll_interval)
+    logger.info("Worker %s stopped", worker_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run story generation workers.")
+    parser.add_argument("--concurrency", type=int, default=1, help="worker threads in this process")
+    parser.add_argument("--poll-interval", type=float, default=settings.WORKER_POLL_SECONDS)
+    parser.add_argument("--once", action="store_true", help="process at most one job per thread and exit")
+    args = parser.parse_args()
+
+    create_tables()
+
+    stop_event = threading.Event()
+
+    def _shutdown(signum, frame):
+        # Running jobs finish; nothing new is claimed.
+        logger.info("Received signal %s, shutting down after current jobs", signum)
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    threads = [
+        threading.Thread(target=run_worker, args=(stop_event, args.poll_interval, args.once), name=f"worker-{i}")
+        for i in range(max(1, args.concurrency))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        while t.is_alive():
+            t.join(timeout=1.0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
-import {useState, useEffect} from "react"
+import {useState, useEffect, useRef} from "react"
 import {useNavigate} from "react-router-dom";
 import axios from "axios";
 import ThemeInput from "./themeinput.jsx";
 import LoadingStatus from "./loadingstatus.jsx";
 
 const API_BASE_URL="/api"
+const RETRY_BASE_MS = 1000
+const RETRY_MAX_MS = 30000
+
+// Network errors, timeouts, rate limits and 5xx (e.g. during a deploy): the job keeps running, so poll again
+const isTransient = (e) => {
+    const status = e.response?.status
+    return status === undefined || status === 408 || status === 429 || status >= 500
+}
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
 function StoryGenerator() {
     const navigate = useNavigate()
     const [theme, setTheme] = useState("")
@@ -13,41 +24,49 @@ function StoryGenerator() {
     const [error, setError] = useState(null)
     const [loading, setLoading] = useState(false)
 
-    const pollJobStatus = async (id) => {
-        try {
-            const response = await axios.get(`${API_BASE_URL}/jobs/${id}`)
-            const {status, story_id, error: jobError} = response.data
-            setJobStatus(status)
+    const activeJob = useRef(null)
 
-            if (status === "completed" && story_id) {
-                fetchStory(story_id)
-            } else if (status === "failed" || jobError) {
-                setError(jobError || "Failed to generate story")
-                setLoading(false)
-            }
-        } catch (e) {
-            if (e.response?.status !== 404) {
-                setError(`Failed to check story status: ${e.message}`)
-                setLoading(false)
-            }
+    useEffect(() => {
+        return () => {
+            activeJob.current = null
         }
-    }
+    }, [])
 
-    useEffect(() => {
-        let pollInterval;
+    // Long-poll /jobs/{id}/wait: the server answers as soon as the job moves past `since`.
+    // Only a failed job or a 4xx ends polling with an error; anything else is retried with backoff
+    const waitForJob = async (id) => {
+        activeJob.current = id
+        let version = 0
+        let retries = 0
 
-        if (jobId && jobStatus === "processing") {
-            pollInterval = setInterval(() => {
-                pollJobStatus(jobId)
-            }, 5000)
-        }
+        while (activeJob.current === id) {
+            try {
+                const response = await axios.get(`${API_BASE_URL}/jobs/${id}/wait`, {params: {since: version}})
+                const {status, story_id, error: jobError, version: nextVersion} = response.data
+                version = nextVersion
+                retries = 0
+                setJobStatus(status)
 
-        return () => {
-            if (pollInterval) {
-                clearInterval(pollInterval)
+                if (status === "completed" && story_id) {
+                    fetchStory(story_id)
+                    return
+                } else if (status === "failed") {
+                    setError(jobError || "Failed to generate story")
+                    setLoading(false)
+                    return
+                }
+            } catch (e) {
+                if (!isTransient(e)) {
+                    setError(`Failed to check story status: ${e.message}`)
+                    setLoading(false)
+                    return
+                }
+                const delay = Math.min(RETRY_MAX_MS, RETRY_BASE_MS * 2 ** retries)
+                retries += 1
+                await sleep(delay / 2 + Math.random() * delay / 2)
             }
         }
-    }, [jobId, jobStatus])
+    }
 
     const generateStory = async (theme) => {
         setLoading(true)
@@ -60,7 +79,7 @@ function StoryGenerator() {
             setJobId(job_id)
             setJobStatus(status)
 
-            pollJobStatus(job_id)
+            waitForJob(job_id)
         } catch (e) {
             setLoading(false)
             setError(`Failed to generate story: ${e.message}`)
@@ -79,6 +98,7 @@ function StoryGenerator() {
     }
 
     const reset = () => {
+        activeJob.current = null
         setJobId(null)
         setJobStatus(null)
         setError(null)
@@ -1,13 +1,61 @@
 import axios from "axios";
 
-export const logEvent = async ({ storyId, eventType, payload }) => {
+const FLUSH_INTERVAL_MS = 2000;
+const FLUSH_MAX_EVENTS = 20;
+const MAX_QUEUED_EVENTS = 500;
+
+let queue = [];
+let timer = null;
+
+const takeBatch = () => {
+  const events = queue;
+  queue = [];
+  if (timer) {
+    clearTimeout(timer);
+    timer = null;
+  }
+  return events;
+};
+
+export const flushEvents = async () => {
+  const events = takeBatch();
+  if (!events.length) return;
   try {
-    await axios.post("/api/analytics/event", {
-      story_id: storyId,
-      event_type: eventType,
-      payload
-    });
+    await axios.post("/api/analytics/events", { events });
   } catch (err) {
+    // Keep the batch for the next flush when the server pushes back
+    if (err.response?.status === 503) {
+      queue = events.concat(queue).slice(-MAX_QUEUED_EVENTS);
+      timer = setTimeout(flushEvents, FLUSH_INTERVAL_MS);
+    }
     console.error("Analytics log failed:", err);
   }
 };
+
+// Events queued when the tab goes away are sent with keepalive so the request outlives the page
+const flushOnExit = () => {
+  const events = takeBatch();
+  if (!events.length) return;
+  fetch("/api/analytics/events", {
+    method: "POST",
+    keepalive: true,
+    headers: {
+      "Content-Type": "application/json",
+      Authorization: axios.defaults.headers.common["Authorization"] || ""
+    },
+    body: JSON.stringify({ events })
+  }).catch(() => {});
+};
+
+if (typeof window !== "undefined") {
+  window.addEventListener("pagehide", flushOnExit);
+}
+
+export const logEvent = ({ storyId, eventType, payload }) => {
+  queue.push({ story_id: storyId, event_type: eventType, payload: payload || {} });
+  if (queue.length >= FLUSH_MAX_EVENTS) {
+    flushEvents();
+  } else if (!timer) {
+    timer = setTimeout(flushEvents, FLUSH_INTERVAL_MS);
+  }
+};